@@ -0,0 +1,92 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+import ipaddress
+import os
+import random
+import sys
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from ecsplorerconfigurator import ECSplorerConfigurator
+
+
+def format_ipv4_prefix(network, length):
+    return f'{network >> 24 & 255}.{network >> 16 & 255}.{network >> 8 & 255}.{network & 255}/{length}'
+
+
+def build_config(workdir, num_prefixes, spl, limits, logger, ignore_response_scope=True, scan_all_bgp=False, more_specifics=0):
+    """Writes a config and a synthetic IPv4 prefix list to workdir and loads them.
+
+    With more_specifics, every prefix shorter than /24 gets up to that many announced
+    more-specific prefixes, like aggregates and their deaggregates in a full table."""
+    rng = random.Random(0)
+    prefixes = set()
+    while len(prefixes) < num_prefixes:
+        length = rng.choice([16, 18, 20, 22, 24])
+        network = rng.getrandbits(length) << (32 - length)
+        prefixes.add(format_ipv4_prefix(network, length))
+        for _ in range(more_specifics if length < 24 else 0):
+            sub_length = rng.randint(length + 1, 24)
+            sub_network = network | (rng.getrandbits(sub_length - length) << (32 - sub_length))
+            prefixes.add(format_ipv4_prefix(sub_network, sub_length))
+
+    return load_config(workdir, prefixes, 1, spl, limits, logger, ignore_response_scope, scan_all_bgp)
+
+
+def build_dense_config(workdir, parent_length, spl, limits, logger, ignore_response_scope=True, scan_all_bgp=False):
+    """Writes a config and an IPv4 prefix list announcing every subnet of source prefix length
+    below a single, itself unannounced /parent_length to workdir and loads them."""
+    network = 10 << 24
+    prefixes = set()
+    for index in range(1 << (spl - parent_length)):
+        prefixes.add(format_ipv4_prefix(network | (index << (32 - spl)), spl))
+    return load_config(workdir, prefixes, 1, spl, limits, logger, ignore_response_scope, scan_all_bgp)
+
+
+def build_ipv6_config(workdir, num_prefixes, spl, limits, logger, ignore_response_scope=True):
+    """Writes a config and a synthetic, sparse IPv6 prefix list (/29 to /48 out of 2000::/3)
+    to workdir and loads them."""
+    rng = random.Random(0)
+    prefixes = set()
+    while len(prefixes) < num_prefixes:
+        length = rng.choice([29, 32, 32, 36, 40, 44, 48])
+        network = (0b001 << (length - 3) | rng.getrandbits(length - 3)) << (128 - length)
+        prefixes.add(str(ipaddress.IPv6Network((network, length))))
+    return load_config(workdir, prefixes, 2, spl, limits, logger, ignore_response_scope, False)
+
+
+def load_config(workdir, prefixes, family, spl, limits, logger, ignore_response_scope, scan_all_bgp):
+    prefixes_fpath = os.path.join(workdir, 'prefixes.list')
+    with open(prefixes_fpath, 'w') as file:
+        file.write('\n'.join(sorted(prefixes)))
+
+    config_fpath = os.path.join(workdir, 'config.yaml')
+    with open(config_fpath, 'w') as file:
+        yaml.safe_dump({
+            'address_family_number': family,
+            'source_prefix_length': spl,
+            'per_prefix_probe_limit': limits,
+            'use_ark_vantage_points': ['bench'],
+            'max_parallel_domains': 1,
+        }, file)
+
+    config = ECSplorerConfigurator(logger, config_fpath, None, prefixes_fpath, workdir, ignore_response_scope, scan_all_bgp)
+    config.load_config_file()
+    return config
@@ -0,0 +1,70 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+# Compares the trie backends on a sparse IPv6 source address space.
+# usage: python benchmarks/ipv6_sparse.py [--prefixes N] [--queries N] [--spl N]
+
+import argparse
+import logging
+import random
+import tempfile
+import time
+import tracemalloc
+
+from bench_config import build_ipv6_config
+from root_element import Root
+from arena_trie import ArenaRoot
+from patricia_trie import PatriciaRoot
+
+
+def run(backend, config, num_queries, logger):
+    random.seed(1)
+    tracemalloc.start()
+    start = time.perf_counter()
+    trie = backend(config)
+    queries = 0
+    while queries < num_queries and trie.get_new_parameters(logger) is not None:
+        queries += 1
+    elapsed = time.perf_counter() - start
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return queries, traced, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trie backends on a sparse IPv6 source address space.")
+    parser.add_argument('--prefixes', type=int, default=20000, help='Number of synthetic IPv6 prefixes.')
+    parser.add_argument('--queries', type=int, default=20000, help='Number of subnets drawn from each trie.')
+    parser.add_argument('--spl', type=int, default=48, help='Source prefix length.')
+    args = parser.parse_args()
+
+    logger = logging.getLogger('benchmark')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    with tempfile.TemporaryDirectory() as workdir:
+        config = build_ipv6_config(workdir, args.prefixes, args.spl, {32: 16}, logger)
+        print(f'{args.prefixes} prefixes, /{args.spl} SPL, up to {args.queries} queries')
+        print(f'{"backend":<9} {"queries":>8} {"bytes":>12} {"seconds":>8} {"us/query":>9}')
+        for name, backend in (('object', Root), ('arena', ArenaRoot), ('patricia', PatriciaRoot)):
+            queries, traced, elapsed = run(backend, config, args.queries, logger)
+            print(f'{name:<9} {queries:>8} {traced:>12} {elapsed:>8.2f} {elapsed / max(queries, 1) * 1e6:>9.1f}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+# Compares the bulk prefix list ingest with the per-prefix parsing on a synthetic full table.
+# usage: python benchmarks/prefix_ingest.py [--prefixes N] [--skip-legacy]
+
+import argparse
+import gzip
+import logging
+import os
+import random
+import tempfile
+import time
+import yaml
+
+from bench_config import format_ipv4_prefix
+from ecsplorerconfigurator import ECSplorerConfigurator
+import prefix_loader
+
+
+def write_files(workdir, num_prefixes):
+    rng = random.Random(0)
+    lines = []
+    for _ in range(num_prefixes):
+        length = rng.choice([16, 18, 20, 22, 24, 24, 24])
+        lines.append(format_ipv4_prefix(rng.getrandbits(length) << (32 - length), length))
+    text = '\n'.join(lines) + '\n'
+
+    fpaths = {'plain': os.path.join(workdir, 'prefixes.list')}
+    with open(fpaths['plain'], 'w') as file:
+        file.write(text)
+    fpaths['gzip'] = fpaths['plain'] + '.gz'
+    with gzip.open(fpaths['gzip'], 'wt') as file:
+        file.write(text)
+    if prefix_loader.zstandard is not None:
+        fpaths['zstd'] = fpaths['plain'] + '.zst'
+        with open(fpaths['zstd'], 'wb') as file:
+            file.write(prefix_loader.zstandard.ZstdCompressor().compress(text.encode()))
+
+    config_fpath = os.path.join(workdir, 'config.yaml')
+    with open(config_fpath, 'w') as file:
+        yaml.safe_dump({
+            'address_family_number': 1,
+            'source_prefix_length': 24,
+            'per_prefix_probe_limit': {16: 256},
+            'use_ark_vantage_points': ['bench'],
+            'max_parallel_domains': 1,
+        }, file)
+    return config_fpath, fpaths
+
+
+def load(config_fpath, prefixes_fpath, workdir, logger):
+    start = time.perf_counter()
+    config = ECSplorerConfigurator(logger, config_fpath, None, prefixes_fpath, workdir, True, False)
+    config.load_config_file()
+    return config, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk prefix list ingest on a synthetic full table.")
+    parser.add_argument('--prefixes', type=int, default=1000000, help='Number of synthetic IPv4 prefixes.')
+    parser.add_argument('--skip-legacy', action='store_true', help='Do not time the per-prefix parsing.')
+    args = parser.parse_args()
+
+    logger = logging.getLogger('benchmark')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    if not prefix_loader.bulk_ingest_available():
+        print('numpy is not installed, only the per-prefix parsing is available')
+
+    with tempfile.TemporaryDirectory() as workdir:
+        config_fpath, fpaths = write_files(workdir, args.prefixes)
+        print(f'{args.prefixes} lines')
+        print(f'{"loader":<8} {"file":<6} {"prefixes":>9} {"rows":>9} {"seconds":>8}')
+        runs = [('bulk', name) for name in fpaths] if prefix_loader.bulk_ingest_available() else []
+        if not args.skip_legacy:
+            runs.append(('legacy', 'plain'))
+        for loader, name in runs:
+            numpy = prefix_loader.np
+            if loader == 'legacy':
+                prefix_loader.np = None
+            try:
+                config, elapsed = load(config_fpath, fpaths[name], workdir, logger)
+            finally:
+                prefix_loader.np = numpy
+            index = config.get_source_prefix_index()
+            print(f'{loader:<8} {name:<6} {len(index):>9} {len(index.flags):>9} {elapsed:>8.2f}')
+
+
+if __name__ == "__main__":
+    main()
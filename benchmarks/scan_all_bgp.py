@@ -0,0 +1,138 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+# Measures subnet selection under --scan-all-bgp with a large prefix list and scoped responses,
+# then asks every live trie node whether unfinished BGP subnets are left below it.
+# --recursive swaps in the former recursive subtree walk for "unfinished BGP subnets left".
+# --dense replaces the prefix list by one aggregate with all its /24s announced, the case in which
+# the recursive walk skips ever more scanned subnets below the aggregate.
+# usage: python benchmarks/scan_all_bgp.py [--prefixes N] [--queries N] [--dense LENGTH] [--recursive]
+
+import argparse
+import logging
+import random
+import tempfile
+import time
+
+from bench_config import build_config, build_dense_config
+from root_element import Root
+from node_element import Node
+from leaf_element import Leaf
+from utils import Prefix, ROOT_PREFIX
+
+
+def recursive_bgp_subnets_left(node, prefix_up_to_this):
+    if node.is_bgp_prefix() and not node.was_scanned():
+        return True
+    elif not node.has_bgp_subnet():
+        return False
+    if prefix_up_to_this.length == node.config.get_config_spl():
+        return False
+    for index, child in enumerate(node.children):
+        if child is not None and not isinstance(child, Leaf):
+            if recursive_bgp_subnets_left(child, prefix_up_to_this.child(index, node.config.get_config_address_bits())):
+                return True
+    return False
+
+
+def dense_aggregate(trie, length, address_bits):
+    # the parent of the subnets of build_dense_config is 10.0.0.0/length
+    aggregate_prefix = Prefix(10 << 24, length)
+    element, prefix = trie, ROOT_PREFIX
+    while prefix.length < length:
+        index = aggregate_prefix.bit_at(prefix.length, address_bits)
+        element = element.get_child(prefix, index)
+        prefix = prefix.child(index, address_bits)
+    return element, prefix
+
+
+def check_all_nodes(element, prefix, address_bits):
+    checks = 0
+    children = element.childs if isinstance(element, Root) else element.children
+    for index, child in enumerate(children):
+        if isinstance(child, Node):
+            child_prefix = prefix.child(index, address_bits)
+            child.any_not_finished_bgp_subnets_left(child_prefix)
+            checks += 1 + check_all_nodes(child, child_prefix, address_bits)
+    return checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of --scan-all-bgp subnet selection.")
+    parser.add_argument('--prefixes', type=int, default=100000, help='Number of synthetic prefixes, more-specifics included.')
+    parser.add_argument('--more-specifics', type=int, default=8, help='More-specific prefixes per aggregate.')
+    parser.add_argument('--queries', type=int, default=20000, help='Number of subnets drawn from the trie.')
+    parser.add_argument('--dense', type=int, help='Announce a single aggregate of this length and all /24s below it instead.')
+    parser.add_argument('--recursive', action='store_true', help='Use the recursive subtree walk instead of the counters.')
+    args = parser.parse_args()
+
+    logger = logging.getLogger('benchmark')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    if args.recursive:
+        Node.any_not_finished_bgp_subnets_left = recursive_bgp_subnets_left
+
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        if args.dense is not None:
+            config = build_dense_config(workdir, args.dense, 24, {args.dense: 1 << (24 - args.dense)}, logger, ignore_response_scope=False, scan_all_bgp=True)
+        else:
+            config = build_config(workdir, args.prefixes, 24, {16: 64}, logger, ignore_response_scope=False,
+                                  scan_all_bgp=True, more_specifics=args.more_specifics)
+        print(f'{len(config.get_source_prefix_index())} prefixes loaded in {time.perf_counter() - start:.2f}s')
+
+        rng = random.Random(1)
+        random.seed(1)
+        trie = Root(config)
+        if args.dense is not None:
+            aggregate, aggregate_prefix = dense_aggregate(trie, args.dense, config.get_config_address_bits())
+            aggregate_checks = 0.0
+        queries = 0
+        start = time.perf_counter()
+        while queries < args.queries:
+            prefix = trie.get_new_parameters(logger)
+            if prefix is None:
+                break
+            queries += 1
+            if args.dense is not None:
+                # every announced /24 answers on its own, and the aggregate is asked for the ones left
+                # after each of them, as get_scanning_mode does for a limited or marked aggregate
+                trie.root_handle_response(prefix)
+                check_start = time.perf_counter()
+                aggregate.any_not_finished_bgp_subnets_left(aggregate_prefix)
+                aggregate_checks += time.perf_counter() - check_start
+                continue
+            scope = rng.randint(max(prefix.length - 6, 1), prefix.length)
+            trie.root_handle_response(prefix.truncate(scope, config.get_config_address_bits()))
+        elapsed = time.perf_counter() - start
+        print(f'{"recursive walk" if args.recursive else "counters"}: {queries} queries in {elapsed:.2f}s, '
+              f'{elapsed / max(queries, 1) * 1e6:.1f} us/query')
+        if args.dense is not None:
+            print(f'{"recursive walk" if args.recursive else "counters"}: {queries} checks of the /{args.dense} in {aggregate_checks:.3f}s, '
+                  f'{aggregate_checks / max(queries, 1) * 1e6:.2f} us/check')
+
+        start = time.perf_counter()
+        checks = check_all_nodes(trie, ROOT_PREFIX, config.get_config_address_bits())
+        elapsed = time.perf_counter() - start
+        print(f'{"recursive walk" if args.recursive else "counters"}: {checks} node checks in {elapsed:.2f}s, '
+              f'{elapsed / max(checks, 1) * 1e6:.1f} us/check')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+# Compares the memory footprint of the trie backends.
+# usage: python benchmarks/trie_memory.py [--prefixes N] [--queries N]
+
+import argparse
+import logging
+import random
+import tempfile
+import time
+import tracemalloc
+
+from bench_config import build_config
+from root_element import Root
+from arena_trie import ArenaRoot
+from patricia_trie import PatriciaRoot
+
+
+def count_object_nodes(element):
+    children = getattr(element, 'childs', None) or getattr(element, 'children', None) or []
+    return 1 + sum(count_object_nodes(child) for child in children if child is not None)
+
+
+def run(backend, config, num_queries, logger):
+    random.seed(1)
+    tracemalloc.start()
+    start = time.perf_counter()
+    trie = backend(config)
+    queries = 0
+    while queries < num_queries and trie.get_new_parameters(logger) is not None:
+        queries += 1
+    elapsed = time.perf_counter() - start
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if isinstance(trie, ArenaRoot):
+        nodes = trie.live_rows()
+    elif isinstance(trie, PatriciaRoot):
+        nodes = count_object_nodes(trie.root)
+    else:
+        nodes = count_object_nodes(trie)
+    return queries, nodes, traced, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trie backend memory benchmark.")
+    parser.add_argument('--prefixes', type=int, default=2000, help='Number of synthetic source prefixes.')
+    parser.add_argument('--queries', type=int, default=20000, help='Number of subnets drawn from each trie.')
+    parser.add_argument('--spl', type=int, default=24, help='Source prefix length.')
+    args = parser.parse_args()
+
+    logger = logging.getLogger('benchmark')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    with tempfile.TemporaryDirectory() as workdir:
+        config = build_config(workdir, args.prefixes, args.spl, {16: 256}, logger)
+        print(f'{args.prefixes} prefixes, /{args.spl} SPL, up to {args.queries} queries')
+        print(f'{"backend":<8} {"queries":>8} {"nodes":>9} {"bytes":>12} {"bytes/node":>11} {"seconds":>8}')
+        for name, backend in (('object', Root), ('arena', ArenaRoot), ('patricia', PatriciaRoot)):
+            queries, nodes, traced, elapsed = run(backend, config, args.queries, logger)
+            print(f'{name:<8} {queries:>8} {nodes:>9} {traced:>12} {traced / nodes:>11.1f} {elapsed:>8.2f}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+
+# the window is multiplied by this factor on a congestion signal
+BACKOFF_FACTOR = 0.5
+
+
+class AdmissionWindow:
+    """Additive-increase, multiplicative-decrease window over the number of domains scanned in parallel.
+
+    The window starts at the minimum and doubles every round trip, until the first congestion
+    signal: a response that took longer than the latency threshold or that carries an error.
+    Each signal halves the window. After that it grows by one domain per round trip, that is,
+    once as many healthy queries have completed as domains are admitted. The queries in flight
+    at a decrease were sent with the larger window, their signals do not shrink it again.
+    """
+
+    def __init__(self, minimum: int, maximum: int, latency_threshold: float, logger):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_threshold = latency_threshold
+        self.logger = logger
+        self.size = float(minimum)
+        self.slow_start = True
+        # completed queries that were still in flight at the last decrease
+        self.pending_after_decrease = 0
+
+    def limit(self) -> int:
+        return int(self.size)
+
+    def on_query_completed(self, latency: float, has_error: bool, queries_in_flight: int):
+        if self.pending_after_decrease > 0:
+            self.pending_after_decrease -= 1
+        if has_error or latency > self.latency_threshold:
+            self.decrease(latency, has_error, queries_in_flight)
+        else:
+            self.increase()
+
+    def increase(self):
+        if self.size >= self.maximum:
+            return
+        previous_limit = self.limit()
+        self.size = min(float(self.maximum), self.size + (1.0 if self.slow_start else 1.0 / self.size))
+        if self.limit() != previous_limit:
+            self.logger.info('admission window grew to {} parallel domains'.format(self.limit()))
+
+    def decrease(self, latency: float, has_error: bool, queries_in_flight: int):
+        if self.pending_after_decrease > 0:
+            return
+        self.slow_start = False
+        self.pending_after_decrease = queries_in_flight
+        previous_limit = self.limit()
+        self.size = max(float(self.minimum), self.size * BACKOFF_FACTOR)
+        if self.limit() != previous_limit:
+            self.logger.info('admission window shrank to {} parallel domains ({})'.format(
+                self.limit(), 'error response' if has_error else 'response latency {:.2f}s'.format(latency)))
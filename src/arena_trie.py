@@ -0,0 +1,285 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+from array import array
+from utils import ScanningMode, Prefix, convert_prefix_to_net_ip
+from prefix_index import ROOT as SKELETON_ROOT
+
+import logging
+import random
+
+# Node 0 is the root. It is never anybody's child, so a child slot of 0 means "not created yet".
+ROOT = 0
+NOT_CREATED = 0
+FINISHED = -1
+
+FLAG_VALUE = 1
+FLAG_ANNOUNCED = 2
+
+
+class ArenaRoot:
+    """Trie backend storing all nodes of a domain in struct-of-arrays columns.
+
+    Offers the same interface to the IP generator as Root, but a node is a row index
+    into a handful of typed arrays instead of a Node object. Static BGP facts are read
+    from the shared source prefix index through each node's skeleton row. Finished
+    subtrees are released to a free list and their rows are reused.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.index = config.get_source_prefix_index()
+        self.address_bits = config.get_config_address_bits()
+        self.scope_zero_observed = 0
+        self.children = (array('i'), array('i'))
+        self.skeleton_rows = array('i')
+        self.node_scans = array('I')
+        self.scans_announced = array('I')
+        self.scans_unannounced = array('I')
+        self.counter_returned_as_scope = array('I')
+        self.bgp_subnets_left = array('i')
+        self.flags = bytearray()
+        self.free_rows = array('i')
+        self._allocate(SKELETON_ROOT if len(self.index) > 0 else -1, 0)
+
+    def _allocate(self, skeleton_row: int, flags: int) -> int:
+        if self.free_rows:
+            row = self.free_rows.pop()
+            self.children[0][row] = NOT_CREATED
+            self.children[1][row] = NOT_CREATED
+            self.skeleton_rows[row] = skeleton_row
+            self.node_scans[row] = 0
+            self.scans_announced[row] = 0
+            self.scans_unannounced[row] = 0
+            self.counter_returned_as_scope[row] = 0
+            self.bgp_subnets_left[row] = self.index.subtree_prefixes_row(skeleton_row)
+            self.flags[row] = flags
+            return row
+        self.children[0].append(NOT_CREATED)
+        self.children[1].append(NOT_CREATED)
+        self.skeleton_rows.append(skeleton_row)
+        self.node_scans.append(0)
+        self.scans_announced.append(0)
+        self.scans_unannounced.append(0)
+        self.counter_returned_as_scope.append(0)
+        self.bgp_subnets_left.append(self.index.subtree_prefixes_row(skeleton_row))
+        self.flags.append(flags)
+        return len(self.flags) - 1
+
+    def _release_subtree(self, row: int):
+        stack = [row]
+        while stack:
+            row = stack.pop()
+            for column in self.children:
+                if column[row] > 0:
+                    stack.append(column[row])
+            self.free_rows.append(row)
+
+    def allocated_rows(self) -> int:
+        return len(self.flags)
+
+    def live_rows(self) -> int:
+        return len(self.flags) - len(self.free_rows)
+
+    def column_bytes(self) -> int:
+        columns = [*self.children, self.skeleton_rows, self.node_scans, self.scans_announced, self.scans_unannounced,
+                   self.counter_returned_as_scope, self.bgp_subnets_left, self.free_rows]
+        return sum(column.itemsize * len(column) for column in columns) + len(self.flags)
+
+    def get_child(self, row: int, current_prefix: Prefix, index_value: int) -> int:
+        child = self.children[index_value][row]
+        if child == NOT_CREATED:
+            skeleton_row = self.index.child_row(self.skeleton_rows[row], index_value)
+            flags = index_value * FLAG_VALUE
+            if self.flags[row] & FLAG_ANNOUNCED or self.index.is_announced_row(skeleton_row):
+                flags |= FLAG_ANNOUNCED
+            child = self._allocate(skeleton_row, flags)
+            self.children[index_value][row] = child
+        return child
+
+    def finish_child_element(self, row: int, index: int):
+        child = self.children[index][row]
+        if child > 0:
+            self.bgp_subnets_left[row] -= self.bgp_subnets_left[child]
+            self._release_subtree(child)
+            self.children[index][row] = FINISHED
+
+    def was_scanned(self, row: int) -> bool:
+        return row != ROOT and self.node_scans[row] >= 1
+
+    def set_scanned(self, row: int):
+        if self.node_scans[row] == 0 and self.is_bgp_prefix(row):
+            self.bgp_subnets_left[row] -= 1
+        self.node_scans[row] += 1
+        if self.is_bgp_prefix(row):
+            self.scans_announced[row] += 1
+        else:
+            self.scans_unannounced[row] += 1
+
+    def set_child_scanned(self, row: int, is_bgp_announced: bool):
+        if row == ROOT:
+            return
+        if is_bgp_announced or self.is_bgp_prefix(row):
+            self.scans_announced[row] += 1
+        else:
+            self.scans_unannounced[row] += 1
+
+    def is_bgp_prefix(self, row: int) -> bool:
+        return row != ROOT and self.index.is_announced_row(self.skeleton_rows[row])
+
+    def has_bgp_subnet(self, row: int) -> bool:
+        return self.skeleton_rows[row] >= 0
+
+    def is_in_announced_space(self, row: int) -> bool:
+        return bool(self.flags[row] & FLAG_ANNOUNCED)
+
+    def any_not_finished_bgp_subnets_left(self, row: int) -> bool:
+        return self.bgp_subnets_left[row] > 0
+
+    def get_scanning_mode(self, row: int, current_prefix_up_to_this: Prefix) -> ScanningMode:
+        if row == ROOT:
+            return ScanningMode.SAMPLE_MODE
+        depth = current_prefix_up_to_this.length
+        default_mode = ScanningMode.BGP_MODE
+
+        if self.counter_returned_as_scope[row] >= 1:
+            if self.any_not_finished_bgp_subnets_left(row) and self.config.scan_all_bgp:
+                return ScanningMode.BGP_PREFIX_MODE
+            else:
+                logging.getLogger(__name__).debug(f"trie: finish scanning as marked in response {convert_prefix_to_net_ip(current_prefix_up_to_this, self.config.get_config_is_ipv6())}/{depth}")
+                return ScanningMode.FINISHED_SCANNING
+
+        probe_limits = self.config.get_probe_limits()
+        if not probe_limits.is_limited(depth):
+            return default_mode
+
+        if probe_limits.limit_hit(depth, self.scans_announced[row], self.scans_unannounced[row]):
+            if self.any_not_finished_bgp_subnets_left(row) and self.config.scan_all_bgp:
+                return ScanningMode.BGP_PREFIX_MODE
+            else:
+                logging.getLogger(__name__).debug(f"trie: finish scanning - limit hit --- {convert_prefix_to_net_ip(current_prefix_up_to_this, self.config.get_config_is_ipv6())}/{depth}")
+                return ScanningMode.FINISHED_SCANNING
+        else:
+            return default_mode
+
+    def root_handle_response(self, shortened_last_client_ip: Prefix) -> bool:
+        if shortened_last_client_ip.length > 0:
+            return self._handle_response(ROOT, shortened_last_client_ip, 0)
+        else:
+            self.scope_zero_observed += 1
+            max_num_scope_zeros = 0
+            return max_num_scope_zeros > 0 and self.scope_zero_observed >= max_num_scope_zeros
+
+    def _handle_response(self, row: int, shortened_last_client_ip: Prefix, depth: int) -> bool:
+        if row == FINISHED:
+            # a finished subtree keeps answering "marked" for itself and ignores everything below
+            return shortened_last_client_ip.length == depth
+        if shortened_last_client_ip.length == depth:
+            self.counter_returned_as_scope[row] += 1
+            return True
+        prefix_up_to_this = shortened_last_client_ip.truncate(depth, self.address_bits)
+        child = self.get_child(row, prefix_up_to_this, shortened_last_client_ip.bit_at(depth, self.address_bits))
+        if self._handle_response(child, shortened_last_client_ip, depth + 1):
+            return self.get_scanning_mode(row, prefix_up_to_this) == ScanningMode.FINISHED_SCANNING
+        return False
+
+    def get_new_parameters(self, logger) -> Prefix | None:
+        prefix, _ = self._get_new_parameters_with_mode(ROOT, Prefix(0, 0), ScanningMode.BGP_MODE, logger)
+        return prefix
+
+    def _get_new_parameters_with_mode(self, row: int, current_prefix_slice: Prefix, scanning_mode: ScanningMode, logger):
+        length_of_current_prefix = current_prefix_slice.length
+        node_scanning_mode = self.get_scanning_mode(row, current_prefix_slice)
+
+        if node_scanning_mode == ScanningMode.FINISHED_SCANNING:
+            logger.debug('finished scanning mode')
+            return None, False
+
+        if node_scanning_mode.value > scanning_mode.value:
+            scanning_mode = node_scanning_mode
+
+        if scanning_mode == ScanningMode.BGP_PREFIX_MODE:
+            logger.debug('BGP prefix mode')
+            return None, False
+
+        if scanning_mode == ScanningMode.BGP_MODE and not self.has_bgp_subnet(row) and not self.is_in_announced_space(row):
+            logger.debug('BGP Mode without bgp prefixes left')
+            return None, False
+
+        # Depth to scan with is reached
+        if length_of_current_prefix == self.config.get_config_spl():
+            if self.was_scanned(row):
+                logger.debug('was scanned')
+                return None, False
+            elif scanning_mode == ScanningMode.SAMPLE_MODE or (scanning_mode == ScanningMode.BGP_MODE and self.is_in_announced_space(row)):
+                self.set_scanned(row)
+                return current_prefix_slice, self.is_bgp_prefix(row)
+            else:
+                return None, False
+
+        first_child_index = random.randint(0, 1)
+        second_child_index = 1 - first_child_index
+        search_order = [None, None]
+        child_available = False
+        only_second_child_has_bgp = True
+
+        for slice_index, child_index in enumerate((first_child_index, second_child_index)):
+            child = self.get_child(row, current_prefix_slice, child_index)
+            if child == FINISHED:
+                continue
+            if scanning_mode == ScanningMode.BGP_PREFIX_MODE and not self.is_bgp_prefix(child) and not self.has_bgp_subnet(child):
+                logger.debug('finishing child as it has no BGP')
+                self.finish_child_element(row, child_index)
+            elif self.was_scanned(child):
+                logger.debug('finishing after child has been scanned')
+                self.finish_child_element(row, child_index)
+            else:
+                child_has_bgp = self.has_bgp_subnet(child) or self.is_in_announced_space(child)
+                if (slice_index == 0 and child_has_bgp) or (slice_index == 1 and not child_has_bgp):
+                    only_second_child_has_bgp = False
+                search_order[slice_index] = child_index
+                child_available = True
+
+        if child_available:
+            if only_second_child_has_bgp:
+                search_order = [search_order[1], search_order[0]]
+
+            for child_index in search_order:
+                if child_index is None:
+                    continue
+                child = self.children[child_index][row]
+                child_prefix = current_prefix_slice.child(child_index, self.address_bits)
+                bgp_subnets_left_before = self.bgp_subnets_left[child]
+                new_prefix, isannounced = self._get_new_parameters_with_mode(child, child_prefix, scanning_mode, logger)
+                self.bgp_subnets_left[row] += self.bgp_subnets_left[child] - bgp_subnets_left_before
+                if new_prefix is not None:
+                    if self.config.get_probe_limits().is_limited(current_prefix_slice.length):
+                        self.set_child_scanned(row, isannounced)
+                    if self.was_scanned(child):
+                        # the child returned itself, nothing is left to do below it
+                        self.finish_child_element(row, child_index)
+                    return new_prefix, isannounced or self.is_bgp_prefix(row)
+                else:
+                    logger.debug(f"trie: finish child because it told us no more scans to do {convert_prefix_to_net_ip(child_prefix, self.config.get_config_is_ipv6())}/{child_prefix.length} scanning mode {scanning_mode}")
+                    self.finish_child_element(row, child_index)
+
+        if self.is_bgp_prefix(row):
+            self.set_scanned(row)
+            return current_prefix_slice, True
+
+        return None, False
@@ -27,6 +27,10 @@ import uuid
 from ecsplorerconfigurator import ECSplorerConfigurator
 from ecsplorerauthnsresolver import ECSplorerAuthNSResolver
 from controller import Controller
+from async_controller import AsyncController
+from domain_stream import ResolvedDomainStream
+from resolution_cache import ResolutionCache
+from checkpoint import checkpoint_exists
 
 
 def init_logger(logs_basedir):
@@ -69,11 +73,12 @@ def main():
     parser = argparse.ArgumentParser(description="Response Aware EDNS Client Subnet Scanner.")
     parser.add_argument("--config", type=str, required=True, help="Path to the YAML config file.")
     parser.add_argument("--domains_list", type=str, required=True, help="File that contains list of input domain names.")
-    parser.add_argument("--prefixes_list", type=str, required=False, help="File that contains list of prefixes. If set the config file entries are ignored.")
+    parser.add_argument("--prefixes_list", type=str, required=False, help="File that contains list of prefixes (optionally .gz or .zst compressed). If set the config file entries are ignored.")
     parser.add_argument("--output_basedir", type=str, required=True, help="Base directory for output data")
     parser.add_argument("--mux", type=str, required=True, help="The multiplexing socket for Scamper Control.")
     parser.add_argument('--ignore-response-scope', action='store_true', help='if set code will ignore the scope prefix lengt when scheduling measurements')
     parser.add_argument('--scan-all-bgp', action='store_true', help='Force the scan of all prefixes from the prefix list as client subnet')
+    parser.add_argument('--resume', action='store_true', help='Continue from the checkpoint in the output directory, if there is one')
     args = parser.parse_args()
 
 	# Init logging
@@ -84,22 +89,44 @@ def main():
     ecs_c.load_config_file()
     ecs_c.load_domains_list_file()
 
-    # Create ECSplorer Auth NS resolver
-    ecs_nsa = ECSplorerAuthNSResolver(logger, ecs_c.get_domains_list(), ecs_c.get_config_ark_vps(), args.mux, args.output_basedir)
-    ecs_nsa.resolve_authoritative_nameservers()
+    resolution_cache = None
+    if ecs_c.get_config_resolution_cache() is not None:
+        resolution_cache = ResolutionCache(ecs_c.get_config_resolution_cache(), ecs_c.get_config_resolution_cache_max_age(), ecs_c.get_config_resolution_cache_use_ttl())
+
+    domain_stream = None
+    if ecs_c.get_config_stream_domains_chunk_size() > 0:
+        # the controller starts the stream, at the domains list line of the checkpoint when resuming
+        ecs_nsa = ECSplorerAuthNSResolver(logger, None, ecs_c.get_config_ark_vps(), args.mux, args.output_basedir,
+                                          ecs_c.get_config_resolver_queries_in_flight_per_vp(), resolution_cache)
+        domain_stream = ResolvedDomainStream(ecs_nsa, ecs_c, logger)
+
+    if args.resume and checkpoint_exists(args.output_basedir):
+        # the checkpoint holds the resolved NS pairs
+        logger.info("Resuming from the checkpoint in '{}'.".format(args.output_basedir))
+        domain_ns_pairs = None
+    elif domain_stream is not None:
+        domain_ns_pairs = []
+    else:
+        # Create ECSplorer Auth NS resolver
+        ecs_nsa = ECSplorerAuthNSResolver(logger, ecs_c.get_domains_list(), ecs_c.get_config_ark_vps(), args.mux, args.output_basedir,
+                                          ecs_c.get_config_resolver_queries_in_flight_per_vp(), resolution_cache)
+        ecs_nsa.resolve_authoritative_nameservers()
+        domain_ns_pairs = ecs_nsa.get_resolution_results()
 
     ## DEBUG
     #pprint.pprint(ecs_nsa.get_resolution_results())
     print(ecs_c.get_config_ark_vps()) # list of strings (full name, incl. ark.caida.org)
     #print(ecs_c.get_config_address_family()) # 1 (ipv4) or 2 (ipv6)
     #print(ecs_c.get_config_spl()) # int
-    # print(ecs_c.get_source_prefix_list()) # list of strings
     print(ecs_c.get_config_prefix_limits()) # { length : limit }
     #print(ecs_c.get_config_max_parallel_domains()) # int
 
     # TODO
     # Create ECSplorer Scanner
-    controller = Controller(ecs_nsa.get_resolution_results(), args.mux, ecs_c.get_config_ark_vps(), args, ecs_c, logger)
+    if ecs_c.get_config_controller_event_loop() == 'asyncio':
+        controller = AsyncController(domain_ns_pairs, args.mux, ecs_c.get_config_ark_vps(), args, ecs_c, logger, domain_stream)
+    else:
+        controller = Controller(domain_ns_pairs, args.mux, ecs_c.get_config_ark_vps(), args, ecs_c, logger, domain_stream)
     controller.start()
     # ecsps = ECSplorerScanner(ecspa.get_resolution_results(), args.mux, args.output_basedir, args.config)
 
@@ -0,0 +1,139 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+from concurrent.futures import ThreadPoolExecutor
+from controller import Controller
+from helpers import QueryRequest
+
+import asyncio
+import collections
+import datetime
+import queue
+
+# Only bounds how long the checkpoint timer and shutdown wait for a quiet scamper socket
+POLL_TIMEOUT = datetime.timedelta(seconds=1)
+# Responses the reader may poll ahead of the dispatcher
+RESPONSE_QUEUE_SIZE = 64
+
+
+class AsyncController(Controller):
+    """Controller running the scan on an asyncio event loop.
+
+    All scamper calls happen in one thread that owns the control socket. Each hop of the reader
+    task submits the queued queries and then polls for the next response. The response goes to
+    a dispatcher task, which updates the domain's trie while the reader polls for the next one.
+    That yields the follow-up queries, which are submitted with the next hop. The reader only
+    waits for the dispatcher when the response queue is full or when it has nothing to submit.
+    Result rows are queued for a writer task, which runs while the reader waits for scamper.
+    Other stages can be added to the same loop as further tasks.
+    """
+
+    def __init__(self, domain_ns_pairs, mux, vps, args, config, logger, domain_stream=None):
+        super().__init__(domain_ns_pairs, mux, vps, args, config, logger, domain_stream)
+        # queries waiting for the next hop to the scamper thread
+        self.submissions = collections.deque()
+        self.responses = None
+        self.results = None
+
+    def submit_query(self, query_request: QueryRequest):
+        self.submissions.append(query_request)
+
+    def write_results(self, query_request: QueryRequest, responses: list):
+        self.results.put_nowait((query_request, responses))
+
+    def write_checkpoint(self):
+        # the checkpoint offset has to cover the rows of every completed query
+        if self.results is not None:
+            while not self.results.empty():
+                query_request, responses = self.results.get_nowait()
+                super().write_results(query_request, responses)
+                self.results.task_done()
+        super().write_checkpoint()
+
+    def exchange(self, queries: list, timeout: datetime.timedelta):
+        """Runs in the scamper thread: sends the queries, then waits for one response."""
+        for query_request in queries:
+            self.ecsplorer.initiate_scan(query_request)
+        response = self.ecsplorer.ctrl.poll(timeout=timeout)
+        return response, list(self.ecsplorer.ctrl.exceptions())
+
+    async def read_responses(self, scamper_thread: ThreadPoolExecutor):
+        loop = asyncio.get_running_loop()
+        while True:
+            self.expire_queries()
+            self.release_deferred_queries()
+            if not self.submissions:
+                # the queued responses may still yield follow-up queries or finish the last domains
+                await self.responses.join()
+            if not self.currently_scanned_domains:
+                if self.no_more_domains:
+                    break
+                # the domain stream resolves the next chunk, the event loop keeps running meanwhile
+                try:
+                    chunk = await loop.run_in_executor(None, self.domain_stream.next_chunk, POLL_TIMEOUT.total_seconds())
+                except queue.Empty:
+                    self.checkpoint_if_due()
+                    continue
+                self.take_domain_chunk(chunk)
+                self.admit_domains()
+                continue
+            # domains the domain stream had not resolved when a scan finished
+            self.admit_domains()
+            queries = list(self.submissions)
+            self.submissions.clear()
+            response, exceptions = await loop.run_in_executor(scamper_thread, self.exchange, queries, self.response_timeout(POLL_TIMEOUT))
+            self.handle_exceptions(exceptions)
+            if response is not None:
+                await self.responses.put(response)
+            self.checkpoint_if_due()
+
+    async def dispatch_responses(self):
+        while True:
+            response = await self.responses.get()
+            try:
+                self.handle_new_response(response)
+            finally:
+                self.responses.task_done()
+
+    async def write_result_rows(self):
+        while True:
+            query_request, responses = await self.results.get()
+            super().write_results(query_request, responses)
+            self.results.task_done()
+
+    async def run(self):
+        self.responses = asyncio.Queue(maxsize=RESPONSE_QUEUE_SIZE)
+        self.results = asyncio.Queue()
+        tasks = [asyncio.create_task(self.dispatch_responses()), asyncio.create_task(self.write_result_rows())]
+        scamper_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scamper')
+        try:
+            self.send_initial_queries()
+            await self.read_responses(scamper_thread)
+            await self.results.join()
+        finally:
+            for task in tasks:
+                task.cancel()
+            scamper_thread.shutdown(wait=False)
+
+    def start(self):
+        try:
+            asyncio.run(self.run())
+        except KeyboardInterrupt:
+            self.write_checkpoint()
+            raise
+        self.write_checkpoint()
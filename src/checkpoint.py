@@ -0,0 +1,87 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+import os
+import pickle
+
+CHECKPOINT_FILENAME = 'checkpoint.pickle'
+CHECKPOINT_VERSION = 8
+
+
+def checkpoint_path(output_basedir: str) -> str:
+    return os.path.join(output_basedir, CHECKPOINT_FILENAME)
+
+
+def checkpoint_exists(output_basedir: str) -> bool:
+    return os.path.exists(checkpoint_path(output_basedir))
+
+
+class CheckpointPickler(pickle.Pickler):
+    """Pickles the controller progress without the objects that belong to a run: the
+    configurator (with its shared prefix index) and the scamper instances are referenced
+    by name and resolved against the objects of the resuming run."""
+
+    def __init__(self, file, config, instances):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.config = config
+        self.source_prefix_index = config.get_source_prefix_index()
+        self.instance_names = {id(inst): inst.shortname for inst in instances}
+
+    def persistent_id(self, obj):
+        if obj is self.config:
+            return 'config'
+        if obj is self.source_prefix_index:
+            return 'source_prefix_index'
+        if id(obj) in self.instance_names:
+            return 'vp', self.instance_names[id(obj)]
+        return None
+
+
+class CheckpointUnpickler(pickle.Unpickler):
+
+    def __init__(self, file, config, instances):
+        super().__init__(file)
+        self.config = config
+        self.instances = {inst.shortname: inst for inst in instances}
+
+    def persistent_load(self, pid):
+        if pid == 'config':
+            return self.config
+        if pid == 'source_prefix_index':
+            return self.config.get_source_prefix_index()
+        if pid[0] == 'vp':
+            if pid[1] not in self.instances:
+                raise pickle.UnpicklingError(f'vantage point {pid[1]} of the checkpoint is not available')
+            return self.instances[pid[1]]
+        raise pickle.UnpicklingError(f'unknown persistent id {pid}')
+
+
+def write_checkpoint(output_basedir: str, progress: dict, config, instances):
+    # write next to the old checkpoint and swap, so a crash while writing keeps the old one
+    path = checkpoint_path(output_basedir)
+    with open(path + '.tmp', 'wb') as file:
+        CheckpointPickler(file, config, instances).dump({'version': CHECKPOINT_VERSION, **progress})
+    os.replace(path + '.tmp', path)
+
+
+def read_checkpoint(output_basedir: str, config, instances) -> dict:
+    with open(checkpoint_path(output_basedir), 'rb') as file:
+        progress = CheckpointUnpickler(file, config, instances).load()
+    if progress.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f'unsupported checkpoint version {progress.get("version")}')
+    return progress
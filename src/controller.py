@@ -16,89 +16,343 @@
 # limitations under the License.
 # -----------------------------------------------------------------------------
 
+import collections
 import datetime
+import queue
+import random
 import sys
+import time
 
 from helpers import *
 from utils import *
 from root_element import *
+from arena_trie import ArenaRoot
+from patricia_trie import PatriciaRoot
+from frontier_cursor import FrontierCursor
+from scan_plan import ScanPlan
+from admission_window import AdmissionWindow
+from nameserver_rate_limiter import NameserverRateLimiter
+from domain_order import interleave_nameservers, order_by_cost
+from trie_workers import TrieWorkerPool
+from domain_stream import ResolvedDomainStream
+from scope_map_cache import ScopeMapCache
+from checkpoint import read_checkpoint, write_checkpoint
 from ecsplorer import ECSplorer, handle_response
 from ecsresult_writer import ECSResultWriter, VantagePointWriter
 from ecsplorerconfigurator import ECSplorerConfigurator
 
 
+TRIE_BACKENDS = {
+    'object': Root,
+    'arena': ArenaRoot,
+    'patricia': PatriciaRoot,
+}
+
+RESPONSE_TIMEOUT = datetime.timedelta(seconds=10)
+
+
 class Controller:
-    def __init__(self, domain_ns_pairs, mux, vps, args, config, logger):
+    def __init__(self, domain_ns_pairs, mux, vps, args, config, logger, domain_stream: ResolvedDomainStream = None):
         self.no_more_domains = False
         self.currently_scanned_domains = {}
+        # number of domain states in currently_scanned_domains per domain identifier
+        self.scanned_domain_states = collections.Counter()
         self.currently_cached_responses = {}
         self.vps = vps
         self.ecsplorer = ECSplorer(mux, vps)
         vpwriter = VantagePointWriter(args.output_basedir)
         vpwriter.add_vps(self.ecsplorer.ctrl.instances())
         vpwriter.close()
+        self.output_basedir = args.output_basedir
+        self.config = config
+        self.logger = logger
+        # queries of a resumed checkpoint that are sent again when the scan starts
+        self.resumed_queries = []
+        self.last_checkpoint = time.monotonic()
+        self.admission_window = None
+        if config.get_config_adaptive_parallel_domains():
+            self.admission_window = AdmissionWindow(config.get_config_min_parallel_domains(), config.get_config_max_parallel_domains(),
+                                                    config.get_config_adaptive_latency_threshold(), logger)
+        self.rate_limiter = None
+        if config.get_config_max_queries_per_second_per_nameserver() > 0:
+            self.rate_limiter = NameserverRateLimiter(config.get_config_max_queries_per_second_per_nameserver(), config.get_config_nameserver_query_burst())
+        # (deadline, query id) of the sent queries in the order they were sent
+        self.query_deadlines = collections.deque()
+        self.late_responses = 0
+        self.trie_workers = None
+        if config.get_config_trie_workers() > 0:
+            self.trie_workers = TrieWorkerPool(config.get_config_trie_workers(), config, logger, get_next_trie_request)
+        self.domain_stream = domain_stream
+
+        if domain_ns_pairs is None:
+            self.restore_checkpoint(read_checkpoint(args.output_basedir, config, self.ecsplorer.ctrl.instances()))
+            self.start_domain_stream()
+            return
+
         self.ecswriter = ECSResultWriter(args.output_basedir)
-        self.domain_ns_pairs = []
+        self.domain_ns_pairs = self.prepare_domain_ns_pairs(domain_ns_pairs)
+        self.domain_index = 0
+        # with a domain stream, domain_ns_pairs only holds the current chunk, which starts at this domain index
+        self.domain_ns_pairs_start = 0
+        # line of the domains list after the current chunk, None without a domain stream
+        self.domains_line = None if domain_stream is None else 0
+        self.start_domain_stream()
+        # correlation id of the next query, scamper hands it back as the userid of the response
+        self.next_query_id = 0
+        self.scope_map_cache = None
+        if config.get_config_scope_map_cache() and not config.ignore_response_scope:
+            self.scope_map_cache = ScopeMapCache(config.get_config_address_bits(), config.get_config_scope_map_confirmation_probes(), config.get_config_scope_map_key_nsid(),
+                                                 config.get_config_scope_map_cache_size())
+
+    def write_checkpoint(self):
+        if self.trie_workers is not None:
+            # the completed queries have to reach the tries before these are saved
+            self.run_trie_workers()
+            self.collect_worker_states()
+        self.logger.debug(f'writing checkpoint at domain index {self.domain_index} ({self.late_responses} late responses dropped)')
+        progress = {
+            'domain_ns_pairs': self.domain_ns_pairs,
+            'domain_ns_pairs_start': self.domain_ns_pairs_start,
+            'domains_line': self.domains_line,
+            'domain_index': self.domain_index,
+            'no_more_domains': self.no_more_domains,
+            'next_query_id': self.next_query_id,
+            'currently_scanned_domains': self.currently_scanned_domains,
+            # responses of unfinished queries are not written yet, the queries are sent again on resume
+            'queries_in_flight': [cached['query_request'] for cached in self.currently_cached_responses.values()] + self.resumed_queries,
+            'scope_map_cache': self.scope_map_cache,
+            'results_offset': self.ecswriter.tell(),
+            'random_state': random.getstate(),
+            # the wall clock of the admissions only counts while the scan runs
+            'written': time.time(),
+        }
+        write_checkpoint(self.output_basedir, progress, self.config, self.ecsplorer.ctrl.instances())
+        self.last_checkpoint = time.monotonic()
+        if self.trie_workers is not None:
+            self.release_worker_states()
+
+    def collect_worker_states(self):
+        for key, worker_state in self.trie_workers.snapshot().items():
+            domain_state = self.currently_scanned_domains[key]
+            vp = domain_state.vp
+            vars(domain_state).update(vars(worker_state))
+            domain_state.vp = vp
+
+    def release_worker_states(self):
+        for domain_state in self.currently_scanned_domains.values():
+            domain_state.state = None
+            domain_state.frontier = None
+
+    def restore_checkpoint(self, progress: dict):
+        self.ecswriter = ECSResultWriter(self.output_basedir, progress['results_offset'])
+        self.domain_ns_pairs = progress['domain_ns_pairs']
+        self.domain_ns_pairs_start = progress['domain_ns_pairs_start']
+        self.domains_line = progress['domains_line']
+        self.domain_index = progress['domain_index']
+        self.no_more_domains = progress['no_more_domains']
+        self.next_query_id = progress['next_query_id']
+        self.currently_scanned_domains = progress['currently_scanned_domains']
+        self.scanned_domain_states = collections.Counter(domain_state.identifier for domain_state in self.currently_scanned_domains.values())
+        # the time between the checkpoint and the resume does not count towards max_seconds_per_domain
+        downtime = time.time() - progress['written']
+        for domain_state in self.currently_scanned_domains.values():
+            domain_state.admitted += downtime
+        self.resumed_queries = progress['queries_in_flight']
+        self.scope_map_cache = progress['scope_map_cache']
+        random.setstate(progress['random_state'])
+        if self.trie_workers is not None:
+            for domain_state in self.currently_scanned_domains.values():
+                self.trie_workers.adopt(domain_state)
+            self.release_worker_states()
+        self.logger.info(f'resuming at domain {self.domain_index} of {self.domain_ns_pairs_start + len(self.domain_ns_pairs)} with '
+                         f'{self.num_scanned_domains()} domains in progress and {len(self.resumed_queries)} queries to send again')
+
+    def prepare_domain_ns_pairs(self, domain_ns_pairs) -> list:
+        prepared_pairs = []
         domains = set()
         for domain, _, ns in domain_ns_pairs:
             if domain not in domains:
                 domains.add(domain)
-                self.domain_ns_pairs.append((domain, ns))
-        logger.debug(f'using the follwoing domain ns pairs: {self.domain_ns_pairs}')
-        self.domain_index = 0
-        self.config = config
-        self.logger = logger
+                prepared_pairs.append((domain, ns))
+        if self.config.get_config_domain_order() == 'nameserver_interleaved':
+            prepared_pairs = interleave_nameservers(prepared_pairs)
+        elif self.config.get_config_domain_order() == 'cost':
+            prepared_pairs = order_by_cost(prepared_pairs, self.config.get_domain_costs())
+        self.logger.debug(f'using the follwoing domain ns pairs: {prepared_pairs}')
+        return prepared_pairs
+
+    def start_domain_stream(self):
+        if self.domain_stream is not None and self.domains_line is None:
+            self.logger.warning('the checkpoint was written without a domain stream, not streaming the domains list')
+            self.domain_stream = None
+        elif self.domain_stream is None and self.domains_line is not None:
+            self.logger.warning('the checkpoint was written with a domain stream, only its current chunk is scanned')
+        if self.domain_stream is not None:
+            self.domain_stream.start(self.domains_line)
+
+    def next_domain_chunk(self) -> bool:
+        if self.domain_stream is None:
+            return False
+        # raises queue.Empty while the chunk is resolved, the domains in flight are scanned meanwhile
+        return self.take_domain_chunk(self.domain_stream.next_chunk())
+
+    def take_domain_chunk(self, chunk) -> bool:
+        if chunk is None:
+            return False
+        domain_ns_pairs, self.domains_line = chunk
+        self.domain_ns_pairs = self.prepare_domain_ns_pairs(domain_ns_pairs)
+        self.domain_ns_pairs_start = self.domain_index
+        return True
 
-    def next_domain_state(self):
-        if self.domain_index >= len(self.domain_ns_pairs):
-            return None
-        domain, nameserver_ip = self.domain_ns_pairs[self.domain_index]
+    def next_domain_states(self):
+        while self.domain_index - self.domain_ns_pairs_start >= len(self.domain_ns_pairs):
+            if not self.next_domain_chunk():
+                return None
+        domain, nameserver_ip = self.domain_ns_pairs[self.domain_index - self.domain_ns_pairs_start]
         self.logger.debug(f'next domain: {domain} {nameserver_ip}')
-        domain_state = DomainState(domain, nameserver_ip, self.domain_index)
+        if self.config.get_config_vp_scan_progression() == 'independent':
+            # one trie and query stream per vantage point
+            domain_states = [DomainState(domain, nameserver_ip, self.domain_index, vp) for vp in self.ecsplorer.ctrl.instances()]
+        else:
+            domain_states = [DomainState(domain, nameserver_ip, self.domain_index)]
         self.domain_index += 1
-        return domain_state
+        return domain_states
 
-    def initiate_next_domain(self):
+    def initiate_next_domain(self) -> bool:
+        """Starts the scan of the next domain. Returns False if the domain stream has not resolved
+        the next domain yet."""
         if self.no_more_domains:
-            return
-        domain_state = self.next_domain_state()
-        if domain_state is None:
+            return True
+        try:
+            domain_states = self.next_domain_states()
+        except queue.Empty:
+            self.logger.debug('Controller: waiting for the domain stream to resolve the next domains')
+            return False
+        if domain_states is None:
             self.logger.debug("Controller: no more domains available to scan")
             self.no_more_domains = True
         else:
             self.logger.debug('scanning next domain')
-            self.currently_scanned_domains[domain_state.identifier] = domain_state
-            ip_generator_result = self.trie_request(domain_state, None)
-            self.handle_new_ecs_request(ip_generator_result)
+            for domain_state in domain_states:
+                self.currently_scanned_domains[domain_state.key] = domain_state
+                self.scanned_domain_states[domain_state.identifier] += 1
+            for domain_state in domain_states:
+                self.fill_query_window(domain_state, None)
+        return True
+
+    def num_scanned_domains(self) -> int:
+        return len(self.scanned_domain_states)
+
+    def max_scanned_domains(self) -> int:
+        if self.admission_window is not None:
+            return self.admission_window.limit()
+        return self.config.get_config_max_parallel_domains()
+
+    def admit_domains(self):
+        while self.num_scanned_domains() < self.max_scanned_domains() and not self.no_more_domains:
+            if not self.initiate_next_domain():
+                return
+
+    def wait_for_domain_chunk(self, timeout: float):
+        """Waits for the domain stream when no domain is left to scan and admits the domains of the
+        next chunk."""
+        try:
+            self.take_domain_chunk(self.domain_stream.next_chunk(timeout))
+        except queue.Empty:
+            return
+        self.admit_domains()
 
     def trie_request(self, domain_state, last_scan: QueryResponse):
         new_request = IPGeneratorRequest(domain_state, last_scan)
         self.logger.debug("CONTROLLER: Request to IP Generator will be sent for %s", domain_state.domain)
 
-        return get_next_trie_request(new_request, self.config, self.logger)
+        return get_next_trie_request(new_request, self.config, self.logger, self.scope_map_cache)
+
+    def fill_query_window(self, domain_state, last_scan: QueryResponse):
+        if self.trie_workers is not None:
+            # answered in run_trie_workers
+            self.trie_workers.request(domain_state, last_scan)
+            return
+        ip_generator_result = self.trie_request(domain_state, last_scan)
+        self.handle_new_ecs_request(ip_generator_result)
+        # every further subnet is reserved in the trie until its response comes back
+        while isinstance(ip_generator_result, QueryRequest) and domain_state.queries_in_flight < self.config.get_config_max_queries_in_flight_per_domain():
+            ip_generator_result = self.trie_request(domain_state, None)
+            self.handle_new_ecs_request(ip_generator_result)
+
+    def send_initial_queries(self):
+        while self.resumed_queries:
+            self.send_query(self.resumed_queries.pop())
 
-    def start(self):
         # Add new requests to the queue
-        while len(self.currently_scanned_domains) < self.config.get_config_max_parallel_domains() and not self.no_more_domains:
-            self.initiate_next_domain()
+        self.admit_domains()
+
+    def run_trie_workers(self):
+        if self.trie_workers is None:
+            return
+        # finished domains admit new ones, whose first subnets take another exchange
+        while self.trie_workers.has_pending():
+            for key, subnets, finished in self.trie_workers.exchange():
+                domain_state = self.currently_scanned_domains[key]
+                for client_ip, source_prefix_length in subnets:
+                    self.handle_new_ecs_request(QueryRequest(client_ip, source_prefix_length, self.config.get_config_address_family(), domain_state))
+                if finished:
+                    self.handle_new_ecs_request(DomainScanFinished(domain_state))
+
+    def handle_exceptions(self, exceptions: list):
+        for exc in exceptions:
+            self.logger.exception('logging exception: %s', exc)
+        if exceptions and self.admission_window is not None:
+            # with an adaptive window a failing scamper is a congestion signal, the scan goes on with fewer domains
+            self.admission_window.decrease(0.0, True, len(self.currently_cached_responses))
+        elif exceptions:
+            self.logger.debug(f'exiting due to exceptions {len(exceptions)}')
+            self.write_checkpoint()
+            sys.exit(1)
+
+    def checkpoint_if_due(self):
+        checkpoint_interval = self.config.get_config_checkpoint_interval()
+        if checkpoint_interval > 0 and time.monotonic() - self.last_checkpoint >= checkpoint_interval:
+            self.write_checkpoint()
+
+    def start(self):
+        self.send_initial_queries()
 
         # scamper controller
-        while self.currently_scanned_domains:
-            for response in self.ecsplorer.ctrl.responses(timeout=datetime.timedelta(seconds=10)):
-                self.handle_new_response(response)
-            exceptions = list(self.ecsplorer.ctrl.exceptions())
-            for exc in exceptions:
-                self.logger.exception('logging exception: %s', exc)
-            if exceptions:
-                self.logger.debug(f'exiting due to exceptions {len(exceptions)}')
-                sys.exit(1)
+        try:
+            while self.currently_scanned_domains or not self.no_more_domains:
+                if not self.currently_scanned_domains:
+                    self.wait_for_domain_chunk(RESPONSE_TIMEOUT.total_seconds())
+                    self.checkpoint_if_due()
+                    continue
+                # domains the domain stream had not resolved when a scan finished
+                self.admit_domains()
+                self.expire_queries()
+                self.run_trie_workers()
+                self.release_deferred_queries()
+                for response in self.ecsplorer.ctrl.responses(timeout=self.response_timeout(RESPONSE_TIMEOUT)):
+                    self.handle_new_response(response)
+                self.handle_exceptions(list(self.ecsplorer.ctrl.exceptions()))
+                self.checkpoint_if_due()
+        except KeyboardInterrupt:
+            self.write_checkpoint()
+            raise
+        self.write_checkpoint()
+        if self.trie_workers is not None:
+            self.trie_workers.close()
 
     def handle_new_ecs_request(self, new_request: IPGeneratorRequest):
         if isinstance(new_request, DomainScanFinished):
             self.logger.debug("CONTROLLER: We have finished scanning for Domain %s", new_request.domain_state.domain)
             # print_domain_result(new_request.domain_state)
-            del self.currently_scanned_domains[new_request.domain_state.identifier]
-            self.initiate_next_domain()
+            if self.scope_map_cache is not None:
+                self.write_inferred_results(new_request.domain_state)
+                self.scope_map_cache.store(new_request.domain_state)
+            del self.currently_scanned_domains[new_request.domain_state.key]
+            self.scanned_domain_states[new_request.domain_state.identifier] -= 1
+            if self.scanned_domain_states[new_request.domain_state.identifier] == 0:
+                del self.scanned_domain_states[new_request.domain_state.identifier]
+                self.admit_domains()
         elif isinstance(new_request, WaitingForMoreResults):
             self.logger.debug("CONTROLLER: Waiting for more results for %s", new_request.domain_state.domain)
         elif isinstance(new_request, QueryRequest):
@@ -107,40 +361,136 @@ class Controller:
                         new_request.ip_address_client,
                         new_request.source_prefix_length)
             self.logger.debug("CONTROLLER: We now send the new Request to the scannerHandler")
-            self.currently_cached_responses[new_request.domain_state.identifier] = {
-                'query_request': new_request,
-                'responses': []
-            }
-            self.ecsplorer.initiate_scan(new_request)
+            new_request.domain_state.queries_in_flight += 1
+            new_request.domain_state.queries_sent += 1
+            self.send_query(new_request)
+
+    def send_query(self, query_request: QueryRequest):
+        query_request.query_id = self.next_query_id
+        self.next_query_id += 1
+        self.currently_cached_responses[query_request.query_id] = {
+            'query_request': query_request,
+            'num_instances': len(self.ecsplorer.query_instances(query_request.domain_state)),
+            'responses': [],
+            'sent': None,
+        }
+        self.dispatch_query(query_request)
+
+    def dispatch_query(self, query_request: QueryRequest):
+        cached = self.currently_cached_responses[query_request.query_id]
+        if self.rate_limiter is not None:
+            nameserver_ip = query_request.domain_state.nameserver_ip
+            if not self.rate_limiter.acquire(nameserver_ip, cached['num_instances']):
+                self.rate_limiter.defer(nameserver_ip, query_request, cached['num_instances'])
+                return
+        self.mark_sent(query_request)
+        self.submit_query(query_request)
+
+    def release_deferred_queries(self):
+        if self.rate_limiter is None:
+            return
+        for query_request in self.rate_limiter.release():
+            self.mark_sent(query_request)
+            self.submit_query(query_request)
+
+    def mark_sent(self, query_request: QueryRequest):
+        now = time.monotonic()
+        self.currently_cached_responses[query_request.query_id]['sent'] = now
+        query_timeout = self.config.get_config_query_timeout()
+        if query_timeout > 0:
+            self.query_deadlines.append((now + query_timeout, query_request.query_id))
+
+    def expire_queries(self):
+        now = time.monotonic()
+        while self.query_deadlines and self.query_deadlines[0][0] <= now:
+            _, query_id = self.query_deadlines.popleft()
+            cached = self.currently_cached_responses.get(query_id)
+            if cached is None:
+                continue
+            query_request = cached['query_request']
+            answered = {inst_resp.vp.name for inst_resp in cached['responses']}
+            for inst in self.ecsplorer.query_instances(query_request.domain_state):
+                if inst.shortname not in answered:
+                    cached['responses'].append(InstQueryResponse([], 0, 'timeout', VantagePoint(inst), [], ''))
+            self.logger.info(f'query {query_id} of {query_request.domain_state.domain} expired with '
+                             f'{len(answered)} of {cached["num_instances"]} responses')
+            self.complete_query(query_id)
+
+    def response_timeout(self, timeout: datetime.timedelta) -> datetime.timedelta:
+        # wake up in time for the next query the rate limiter holds back and the next deadline
+        delays = [timeout.total_seconds()]
+        if self.rate_limiter is not None:
+            delay = self.rate_limiter.next_release_delay()
+            if delay is not None:
+                delays.append(delay)
+        if self.query_deadlines:
+            delays.append(max(0.0, self.query_deadlines[0][0] - time.monotonic()))
+        return datetime.timedelta(seconds=min(delays))
+
+    def submit_query(self, query_request: QueryRequest):
+        self.ecsplorer.initiate_scan(query_request)
+
+    def write_results(self, query_request: QueryRequest, responses: list):
+        for response in responses:
+            self.ecswriter.add_result(query_request, response)
+
+    def write_inferred_results(self, domain_state: DomainState):
+        for block in domain_state.inferred_scope_blocks:
+            self.ecswriter.add_inferred_result(domain_state, convert_prefix_to_net_ip(block, self.config.get_config_is_ipv6()),
+                                               self.config.get_config_spl(), block.length)
 
     def handle_new_response(self, response):
-        identifier, inst_query_response = handle_response(response)
-        self.currently_cached_responses[identifier]['responses'].append(inst_query_response)
+        query_id, inst_query_response = handle_response(response)
+        if query_id not in self.currently_cached_responses:
+            # the query expired before this response arrived
+            self.late_responses += 1
+            self.logger.debug(f'dropping late response to query {query_id} from vp {inst_query_response.vp.name}')
+            return
+        self.currently_cached_responses[query_id]['responses'].append(inst_query_response)
 
         # Check if all responses are here
-        if len(self.currently_cached_responses[identifier]['responses']) == self.ecsplorer.num_vps:
-            domain_state = self.currently_scanned_domains[identifier]
-            query_request = self.currently_cached_responses[identifier]['query_request']
-            for response in self.currently_cached_responses[identifier]['responses']:
-                self.ecswriter.add_result(query_request, response)
-            query_response = QueryResponse(query_request, self.currently_cached_responses[identifier]['responses'])
-            del self.currently_cached_responses[identifier]
-            ip_generator_result = self.trie_request(domain_state, query_response)
-            self.handle_new_ecs_request(ip_generator_result)
+        if len(self.currently_cached_responses[query_id]['responses']) == self.currently_cached_responses[query_id]['num_instances']:
+            self.complete_query(query_id)
+
+    def complete_query(self, query_id: int):
+        query_request = self.currently_cached_responses[query_id]['query_request']
+        domain_state = query_request.domain_state
+        self.write_results(query_request, self.currently_cached_responses[query_id]['responses'])
+        query_response = QueryResponse(query_request, self.currently_cached_responses[query_id]['responses'])
+        sent = self.currently_cached_responses[query_id]['sent']
+        del self.currently_cached_responses[query_id]
+        domain_state.queries_in_flight -= 1
+        if self.admission_window is not None:
+            self.update_admission_window(query_response, time.monotonic() - sent)
+        self.fill_query_window(domain_state, query_response)
+        if self.admission_window is not None:
+            self.admit_domains()
 
+    def update_admission_window(self, query_response: QueryResponse, latency: float):
+        has_error = any(inst_resp.error is not None for inst_resp in query_response.ins_responses)
+        self.admission_window.on_query_completed(latency, has_error, len(self.currently_cached_responses))
 
-def get_next_trie_request(received_request: IPGeneratorRequest, config, logger):
+
+def get_next_trie_request(received_request: IPGeneratorRequest, config, logger, scope_map_cache: ScopeMapCache = None):
     logger.debug("IPGenerator: Received request for %s.", received_request.domain_state)
 
     last_scan_client_ip = None
     last_scan_scope = 0
     new_result = None
 
-    if received_request.last_scan is None:
-        logger.debug("IPGenerator: Received request for new domain initializing new trie")
-        new_root = Root(config)
-        received_request.domain_state.state = new_root
-    else:
+    if received_request.domain_state.state is None:
+        if config.get_config_next_subnet_selection() == 'plan':
+            logger.debug("IPGenerator: Received request for new domain initializing new scan plan")
+            received_request.domain_state.state = ScanPlan(config)
+        else:
+            logger.debug("IPGenerator: Received request for new domain initializing new trie")
+            new_root = TRIE_BACKENDS[config.get_config_trie_backend()](config)
+            received_request.domain_state.state = new_root
+            if config.get_config_next_subnet_selection() == 'frontier':
+                received_request.domain_state.frontier = FrontierCursor(new_root, config)
+    elif received_request.domain_state.scan_finished:
+        new_result = finish_domain_scan(received_request.domain_state)
+    elif received_request.last_scan is not None:
         last_scan = received_request.last_scan
         has_error = sum([1 for resp in last_scan.ins_responses if resp.error is not None]) > 0
         if not has_error and not config.ignore_response_scope:
@@ -151,24 +501,31 @@ def get_next_trie_request(received_request: IPGeneratorRequest, config, logger):
             if last_scan.request.source_prefix_length < last_scan_scope:
                 last_scan_scope = last_scan.request.source_prefix_length
 
-            last_scan_client_ip_shortened = first_bits_of_ip_as_field(
-                last_scan_scope, convert_ip_from_net_ip_to_field(last_scan_client_ip)
-            )
+            last_scan_client_ip_shortened = convert_ip_from_net_ip_to_prefix(last_scan_client_ip, last_scan_scope)
 
-            if received_request.domain_state.state.root_handle_response(last_scan_client_ip_shortened) == ScanningMode.FINISHED_SCANNING:
-                new_result = DomainScanFinished(domain_state=received_request.domain_state)
+            if domain_trie(received_request.domain_state).root_handle_response(last_scan_client_ip_shortened) == ScanningMode.FINISHED_SCANNING:
+                new_result = finish_domain_scan(received_request.domain_state)
+            elif scope_map_cache is not None:
+                last_scan_prefix = convert_ip_from_net_ip_to_prefix(last_scan_client_ip, last_scan.request.source_prefix_length)
+                scope_map_cache.observe_response(received_request.domain_state, last_scan, last_scan_prefix, last_scan_client_ip_shortened,
+                                                 domain_trie(received_request.domain_state), logger)
 
     if new_result is None:
         if received_request.domain_state.perm_error or received_request.domain_state.temp_errors > 0:
             logger.debug("IPGENERATOR: Too many errors on domain %s, finishing scanning", received_request.domain_state.domain)
-            new_result = DomainScanFinished(domain_state=received_request.domain_state)
+            new_result = finish_domain_scan(received_request.domain_state)
+        elif domain_budget_exhausted(received_request.domain_state, config):
+            logger.info("IPGENERATOR: Domain %s exhausted its budget after %d queries, finishing scanning",
+                        received_request.domain_state.domain, received_request.domain_state.queries_sent)
+            received_request.domain_state.budget_exhausted = True
+            new_result = finish_domain_scan(received_request.domain_state)
         else:
             logger.debug("IPGENERATOR: Calculating new ECS parameters")
-            new_ip_for_new_scope, new_source_prefix, finished = calculate_next_parameters(received_request.domain_state.state, config, logger)
+            new_ip_for_new_scope, new_source_prefix, finished = calculate_next_parameters(domain_trie(received_request.domain_state), config, logger)
 
             logger.debug(f'IPGenerator: next param {new_ip_for_new_scope} - finished {finished}')
             if finished:
-                new_result = DomainScanFinished(domain_state=received_request.domain_state)
+                new_result = finish_domain_scan(received_request.domain_state)
             else:
                 family = 1 if not config.get_config_address_family() == 6 else 2
                 new_result = QueryRequest(
@@ -181,12 +538,27 @@ def get_next_trie_request(received_request: IPGeneratorRequest, config, logger):
     return new_result
 
 
+def domain_budget_exhausted(domain_state: DomainState, config) -> bool:
+    max_queries = config.get_config_max_queries_per_domain()
+    max_seconds = config.get_config_max_seconds_per_domain()
+    return (max_queries > 0 and domain_state.queries_sent >= max_queries) or (max_seconds > 0 and time.time() - domain_state.admitted >= max_seconds)
+
+
+def finish_domain_scan(domain_state: DomainState):
+    domain_state.scan_finished = True
+    if domain_state.queries_in_flight > 0:
+        return WaitingForMoreResults(domain_state=domain_state)
+    return DomainScanFinished(domain_state=domain_state)
+
+
+def domain_trie(domain_state: DomainState):
+    return domain_state.frontier if domain_state.frontier is not None else domain_state.state
+
+
 def calculate_next_parameters(trie, config, logger):
-    new_net = get_new_parameters(trie, [], config, logger)
+    new_net = trie.get_new_parameters(logger)
 
     if new_net is None:
         return None, 0, True
     else:
-        new_source = len(new_net)
-        new_ip_help = convert_ip_from_field_to_net_ip(new_net, config.get_config_address_family() == 6)
-        return ensure_concatenating_with_zeros(new_ip_help, new_source, config.get_config_address_family() == 6), new_source, False
+        return convert_prefix_to_net_ip(new_net, config.get_config_is_ipv6()), new_net.length, False
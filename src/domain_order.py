@@ -0,0 +1,51 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+
+import collections
+import csv
+import itertools
+
+
+def interleave_nameservers(domain_ns_pairs: list) -> list:
+    """Orders the domains round robin over their nameserver IPs, so that consecutive domains
+    query different nameservers. The nameservers keep the order of their first domain."""
+    domains_per_nameserver = collections.defaultdict(list)
+    for domain, nameserver_ip in domain_ns_pairs:
+        domains_per_nameserver[nameserver_ip].append((domain, nameserver_ip))
+    return [pair for pairs in itertools.zip_longest(*domains_per_nameserver.values()) for pair in pairs if pair is not None]
+
+
+
+def read_domain_costs(fpath: str) -> dict:
+    """Counts the probed result rows per domain in the ecsresults.csv of a previous run."""
+    costs = collections.Counter()
+    with open(fpath, newline='') as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            # inferred scope blocks cost no queries, results of older runs have no inferred column
+            if row.get('inferred') != 'True':
+                costs[row['domain']] += 1
+    return costs
+
+
+def order_by_cost(domain_ns_pairs: list, costs: dict) -> list:
+    """Orders the domains by descending expected cost, so that the expensive domains do not end
+    up in the tail of the scan. Domains without a known cost are expected to cost the average."""
+    default_cost = sum(costs.values()) / len(costs) if costs else 0
+    return sorted(domain_ns_pairs, key=lambda pair: costs.get(pair[0], default_cost), reverse=True)
@@ -0,0 +1,74 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+
+import itertools
+import queue
+import threading
+
+# resolved chunks waiting for the controller
+BUFFERED_CHUNKS = 2
+
+
+class ResolvedDomainStream:
+    """Resolves the domains list chunk by chunk in a background thread.
+
+    The scan of the first domains starts while later chunks are still resolved. At most
+    BUFFERED_CHUNKS resolved chunks wait for the controller, so the memory does not grow with
+    the length of the domains list.
+    """
+
+    def __init__(self, resolver, config, logger):
+        self.resolver = resolver
+        self.config = config
+        self.logger = logger
+        self.chunks = queue.Queue(maxsize=BUFFERED_CHUNKS)
+        self.error = None
+
+    def start(self, first_line: int):
+        threading.Thread(target=self.resolve_chunks, args=(first_line,), name='domain-stream', daemon=True).start()
+
+    def resolve_chunks(self, first_line: int):
+        chunk_size = self.config.get_config_stream_domains_chunk_size()
+        try:
+            domains = self.config.iter_domains_list(first_line)
+            next_line = first_line
+            while True:
+                chunk = list(itertools.islice(domains, chunk_size))
+                if not chunk:
+                    break
+                self.logger.info("Resolving the nameservers of domains {} to {}.".format(next_line, next_line + len(chunk) - 1))
+                next_line += len(chunk)
+                self.chunks.put((list(self.resolver.resolve_domains(chunk)), next_line))
+        except BaseException as e:
+            # the resolver exits on configuration errors, which has to happen in the main thread
+            self.error = e
+        finally:
+            self.resolver.close()
+            self.chunks.put(None)
+
+    def next_chunk(self, timeout: float = 0) -> tuple | None:
+        """Returns the (domain, NS name, NS IP) tuples of the next resolved chunk and the domains
+        list line after the chunk, or None once the list is done. Raises queue.Empty if the chunk
+        is not resolved within timeout seconds."""
+        chunk = self.chunks.get(timeout=timeout) if timeout > 0 else self.chunks.get_nowait()
+        if chunk is None:
+            self.chunks.put(None)
+            if self.error is not None:
+                raise self.error
+        return chunk
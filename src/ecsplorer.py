@@ -33,9 +33,12 @@ class ECSplorer:
             query_request.domain_state.domain,
             query_request.domain_state.nameserver_ip,
             ecs=f'{query_request.ip_address_client}/{query_request.source_prefix_length}',
-            userid=query_request.domain_state.identifier,
+            userid=query_request.query_id,
             nsid=True,
-            inst=self.ctrl.instances())
+            inst=self.query_instances(query_request.domain_state))
+
+    def query_instances(self, domain_state: DomainState) -> list:
+        return self.ctrl.instances() if domain_state.vp is None else [domain_state.vp]
 
 def handle_response(scamper_resp):
     userid = scamper_resp.userid
@@ -16,6 +16,7 @@
 # limitations under the License.
 # -----------------------------------------------------------------------------
 
+import collections
 import datetime
 import os
 import pprint
@@ -24,210 +25,256 @@ import random
 import scamper
 import sys
 
+# The query types the resolver issues, by RR type number
+QTYPE_NAMES = {1 : "A", 2 : "NS"}
+
 class ECSplorerAuthNSResolver:
 
-    def __init__(self, logger, domains_list, configured_vps_list, mux, output_basedir):
+    def __init__(self, logger, domains_list, configured_vps_list, mux, output_basedir, queries_in_flight_per_vp=0, resolution_cache=None):
 
         self.logger = logger
         self.domains_list = domains_list
         self.configured_vps_list = configured_vps_list
         self.output_basedir = output_basedir
         self.mux = mux
+        # Outstanding queries per VP, 0 issues one query whenever scamper asks a VP for more
+        self.queries_in_flight_per_vp = queries_in_flight_per_vp
+        # Optional ResolutionCache, only misses and expired entries are queried
+        self.resolution_cache = resolution_cache
+        # One controller and work queue for the NS and A queries of all resolve_domains() calls
+        self.ctrl = None
+        self.state = self._new_resolution_state()
         
         # https://raw.githubusercontent.com/publicsuffix/list/refs/heads/main/public_suffix_list.dat 
         with open("public_suffix_list.dat", "rb") as f:
             self.psl = publicsuffixlist.PublicSuffixList(f)     
 
     def resolve_authoritative_nameservers(self):
+        self.results_domains_to_ns_a = self.resolve_domains(self.domains_list)
+        self.close()
 
-        ## State dicts for selected VPs
-        # { vpid : list<string> of registered domains to resolve NS RR for }
-        selected_vps_state_ns = {}
-        # { vpid : list<string> of FQDN to resolve A RR for }
-        selected_vps_state_a = {}
-
-        ### PHASE 1: Get NS RRs for domains list -----------------------------------------------------------------------
+    def resolve_domains(self, domains_list):
+        """Resolves the NS names and their addresses for the domains, returns (domain, NS name, NS IP) tuples.
 
-        # Create Scamper Controller
-        ctrl = scamper.ScamperCtrl(morecb=self._ctrl_callback_do_dns_ns, param=selected_vps_state_ns, mux=self.mux)
-        # List the currently available VPs from mux
-        active_vps = ctrl.vps()
+        NS and A queries share one controller and work queue: the A query of an NS name is issued as soon
+        as the first NS answer that contains the name arrives. The controller is kept for later calls.
+        """
 
-        # Add configured VPs to controller
-        active_vps_nmap = { i.name : i for i in active_vps }
-        for i_configured_vp_name in self.configured_vps_list:
-            if i_configured_vp_name in active_vps_nmap:
+        # The mapping between the name targeted with an NS query and domain names
+        # For, e.g., www.foo.bar.org, the name targeted may be foo.bar.org
+        queried_name_to_domains_mapping = {}
+        for i_domain_name in domains_list:
+            # We consider the NS of the registered domain name, which may in fact be a parent NS that resolves to a subdomain authoritative
+            _target_name = self.psl.privateparts(i_domain_name)[-1]
+            if _target_name not in queried_name_to_domains_mapping:
+                queried_name_to_domains_mapping[_target_name] = []
+            queried_name_to_domains_mapping[_target_name].append(i_domain_name)
+
+        results_domains_to_ns = {} # { 'domain' : set<string> of NS names }
+        results_domains_to_a = {} # { 'fqdn' : set<string> of usable A addresses }
+        # NS names that were looked up in the cache or queued for an A query
+        distinct_ns = set()
+
+        def add_nameservers(ns_names):
+            for i_ns in ns_names:
+                if i_ns in distinct_ns:
+                    continue
+                distinct_ns.add(i_ns)
+                cached_a = None if self.resolution_cache is None else self.resolution_cache.get_addresses(i_ns)
+                if cached_a is None:
+                    # ahead of the NS queries, so the addresses do not wait for the last NS answer
+                    self.state["work_queue"].appendleft((i_ns, "A"))
+                else:
+                    results_domains_to_a[i_ns] = set(cached_a)
 
-                self.logger.debug("Adding VP {} to controller for auth NS resolution.".format(i_configured_vp_name))
-                ctrl.add_vps(active_vps_nmap[i_configured_vp_name])
+        # Populate the work queue, every VP pulls from it until it is empty
+        for i_target_name, i_domains in queried_name_to_domains_mapping.items():
+            cached_ns = None if self.resolution_cache is None else self.resolution_cache.get_nameservers(i_target_name)
+            if cached_ns is None:
+                self.state["work_queue"].append((i_target_name, "NS"))
             else:
-                self.logger.error("Configured VP '{}' is not active.".format(i_configured_vp_name))
-                sys.exit(os.EX_SOFTWARE)
+                for i_domain in i_domains:
+                    results_domains_to_ns[i_domain] = set(cached_ns)
+                add_nameservers(cached_ns)
+        self.logger.info("Querying NS RRs for {} of {} registered domains.".format(
+            sum(1 for _, i_qtype in self.state["work_queue"] if i_qtype == "NS"), len(queried_name_to_domains_mapping)))
+
+        ## Issue NS and A RR measurements, no controller is needed if the cache had everything
+        if self.state["work_queue"]:
+            ctrl = self._get_ctrl()
+            self._dispatch_work(ctrl)
+
+            while self.state["work_queue"] or self.state["pending"]:
+                scamperHost = None
+                try:
+                    scamperHost = ctrl.poll(timeout=datetime.timedelta(seconds=60))
+
+                    # If ctrl.poll() returned None, the call timed out
+                    if scamperHost is None:
+                        self.logger.warning("Poll timed out, giving up {} unanswered queries.".format(len(self.state["pending"])))
+                        self._give_up_pending_queries()
+                        self._dispatch_work(ctrl)
+                        continue
+
+                except Exception as e:
+                    self.logger.error("Got exception from ScamperCtrl: {}.".format(e))
+                    continue
+
+                qtype = self._query_completed(ctrl, scamperHost)
+                if qtype is None:
+                    self.logger.debug("Dropping late answer for {} from VP {}.".format(scamperHost.qname, scamperHost.inst.name))
+
+                elif scamperHost.ancount == 0:
+                    self.logger.debug("Got 0 answer records and RCODE {} for {} from VP {}.".format(scamperHost.rcode, scamperHost.qname, scamperHost.inst.name))
+
+                # Iterate NS resource records in ANSWER section
+                elif qtype == "NS":
+                    self.logger.debug("Got ({}) and RCODE {} for {} from VP {}.".format(
+                        ",".join(["'{}'".format(i_ns) for i_ns in scamperHost.ans_nses()]),
+                            scamperHost.rcode, scamperHost.qname, scamperHost.inst.name))
+
+                    for i_domain in queried_name_to_domains_mapping[scamperHost.qname]:
+                        if i_domain not in results_domains_to_ns:
+                            results_domains_to_ns[i_domain] = set(scamperHost.ans_nses())
+                    if self.resolution_cache is not None:
+                        self.resolution_cache.put_nameservers(scamperHost.qname, scamperHost.ans_nses(), self._min_ttl(scamperHost, "ns"))
+                    add_nameservers(scamperHost.ans_nses())
+                    self._dispatch_work(ctrl)
 
-        self.logger.info("Using {} VP(s) for auth NS resolution.".format(len(ctrl.instances())))
-
-        # Populate state dict in (near-)equal slices from the domains list
-        avg_slice_size = len(self.domains_list) // len(ctrl.instances()) # avg size of a slize
-        remainder = len(self.domains_list) % len(ctrl.instances()) # no. slices with an extra entry
-        slice_start = 0
-        slices_done = 0
-        for i_vp_inst in ctrl.instances():
-            slice_end = slice_start + avg_slice_size + (1 if slices_done < remainder else 0)
-            selected_vps_state_ns[i_vp_inst] = {
-                # The list of input domains, of arbitrary depth
-                "domains_list" : self.domains_list[slice_start:slice_end],
-                # The mapping between the name targeted with an NS query and domain names
-                # For, e.g., www.foo.bar.org, the name targeted may be foo.bar.org
-                "queried_name_to_domains_mapping" : {}
-            }
-
-            slice_start = slice_end # move slice window
-            slices_done += 1        # incr. no. slices done
-
-        ## Issue NS RR measurements
-        results_domains_to_ns = {} # { 'registered_domain' : set<string> of NS names }
-        while not ctrl.is_done():
-            scamperHost = None
-            try:
-                scamperHost = ctrl.poll(timeout=datetime.timedelta(seconds=60))
-
-                # If ctrl.poll() returned None, either all measurements are completed or the call timed out
-                if scamperHost is None:
-                    if ctrl.is_done():
-                        self.logger.info("Measurements are done.")
-                    else:
-                        self.logger.warning("Poll timed out.")
-                    break
-
-            except Exception as e:
-                self.logger.error("Got exception from ScamperCtrl: {}.".format(e))
-                continue
-
-            # Iterate NS resource records in ANSWER section
-            if scamperHost.ancount > 0:
-                self.logger.debug("Got ({}) and RCODE {} for {} from VP {}.".format(
-                    ",".join(["'{}'".format(i_ns) for i_ns in scamperHost.ans_nses()]),
-                        scamperHost.rcode, scamperHost.qname, scamperHost.inst.name))
-
-                for i_domain in selected_vps_state_ns[scamperHost.inst]["queried_name_to_domains_mapping"][scamperHost.qname]:
-                    if i_domain not in results_domains_to_ns:
-                        results_domains_to_ns[i_domain] = set(scamperHost.ans_nses())
-            else:
-                self.logger.debug("Got 0 answer records and RCODE {} for {} from VP {}.".format(scamperHost.rcode, scamperHost.qname, scamperHost.inst.name))
+                else:
+                    self.logger.debug("Got ({}) and RCODE {} for {} from VP {}.".format(
+                        ",".join(["'{}'".format(i_a) for i_a in scamperHost.ans_addrs()]),
+                            scamperHost.rcode, scamperHost.qname, scamperHost.inst.name))
 
-        # Create set of (distinct) NS names to resolve
-        results_distinct_ns = set()
-        for i_d_ns in results_domains_to_ns.values():
-            results_distinct_ns = results_distinct_ns.union(i_d_ns)
+                    results_domains_to_a[scamperHost.qname] = {str(i_a) for i_a in scamperHost.ans_addrs()
+                                                                if not i_a.is_linklocal() and not i_a.is_reserved() and not i_a.is_rfc1918()}
+                    if self.resolution_cache is not None:
+                        self.resolution_cache.put_addresses(scamperHost.qname, results_domains_to_a[scamperHost.qname], self._min_ttl(scamperHost, "a"))
 
-        # Destroy the Controller
-        ctrl.done()
-        ctrl = None
+        self.logger.info("Resolved the addresses of {} of {} NS names.".format(len(results_domains_to_a), len(distinct_ns)))
 
-        ### PHASE 2: Get A RRs for NS names ----------------------------------------------------------------------------
+        # Construct registered_domain -> NS IPv4 address
+        results_domains_to_ns_a = set()
+        for i_domain in results_domains_to_ns.keys():
+            for i_ns in results_domains_to_ns[i_domain]:
+                if i_ns in results_domains_to_a:
+                    for i_a in results_domains_to_a[i_ns]:
+                        results_domains_to_ns_a.add((i_domain, i_ns, i_a))
+                else:
+                    self.logger.warning("Could not find '{}' in address resolution results.".format(i_ns))
 
-        ## We recreate a Scamper Controller, with a new CB and state param, and new set of VPs
-        ## In the future, we may be able to reuse the controller (and VP selection) by setting a new morecb and param
+        if self.resolution_cache is not None:
+            self.resolution_cache.commit()
 
-        # Create new Controller
-        ctrl = scamper.ScamperCtrl(morecb=self._ctrl_callback_do_dns_a, param=selected_vps_state_a, mux=self.mux)
+        return results_domains_to_ns_a
+
+    def close(self):
+        if self.ctrl is not None:
+            self.ctrl.done()
+            self.ctrl = None
+
+    def _get_ctrl(self):
+        if self.ctrl is not None:
+            return self.ctrl
+
+        # Create Scamper Controller
+        self.ctrl = scamper.ScamperCtrl(morecb=self._ctrl_callback_do_dns, param=self.state, mux=self.mux)
         # List the currently available VPs from mux
-        active_vps = ctrl.vps()
+        active_vps = self.ctrl.vps()
 
         # Add configured VPs to controller
         active_vps_nmap = { i.name : i for i in active_vps }
         for i_configured_vp_name in self.configured_vps_list:
             if i_configured_vp_name in active_vps_nmap:
 
-                self.logger.debug("Adding VP {} to controller for A resolution.".format(i_configured_vp_name))
-                ctrl.add_vps(active_vps_nmap[i_configured_vp_name])
+                self.logger.debug("Adding VP {} to controller for auth NS resolution.".format(i_configured_vp_name))
+                self.ctrl.add_vps(active_vps_nmap[i_configured_vp_name])
             else:
                 self.logger.error("Configured VP '{}' is not active.".format(i_configured_vp_name))
                 sys.exit(os.EX_SOFTWARE)
 
-        self.logger.info("Using {} VP(s) for A resolution.".format(len(ctrl.instances())))
-
-        # Populate state dict in (near-)equal slices from the nameservers list
-        avg_slice_size = len(results_distinct_ns) // len(ctrl.instances()) # avg size of a slize
-        remainder = len(results_distinct_ns) % len(ctrl.instances()) # no. slices with an extra entry
-        slice_start = 0
-        slices_done = 0
-        for i_vp_inst in ctrl.instances():
-            slice_end = slice_start + avg_slice_size + (1 if slices_done < remainder else 0)
-            selected_vps_state_a[i_vp_inst] = list(results_distinct_ns)[slice_start:slice_end]
-
-            slice_start = slice_end # move slice window
-            slices_done += 1        # incr. no. slices done
-
-        ## Issue A RR measurements
-        results_domains_to_a = {} # { 'fqdn' : set<string> of A addresses }
-        while not ctrl.is_done():
-            scamperHost = None
-            try:
-                scamperHost = ctrl.poll(timeout=datetime.timedelta(seconds=60))
-
-                # If ctrl.poll() returned None, either all measurements are completed or the call timed out
-                if scamperHost is None:
-                    if ctrl.is_done():
-                        self.logger.info("Measurements are done.")
-                    else:
-                        self.logger.warning("Poll timed out.")
-                    break
-
-            except Exception as e:
-                self.logger.error("Got exception from ScamperCtrl: {}.".format(e))
-                continue
-
-            # Iterate NS resource records in ANSWER section
-            if scamperHost.ancount > 0:
-                self.logger.debug("Got ({}) and RCODE {} for {} from VP {}.".format(
-                    ",".join(["'{}'".format(i_a) for i_a in scamperHost.ans_addrs()]),
-                        scamperHost.rcode, scamperHost.qname, scamperHost.inst.name))
-
-                results_domains_to_a[scamperHost.qname] = set(scamperHost.ans_addrs())
-            else:
-                self.logger.debug("Got 0 answer records and RCODE {} for {} from VP {}.".format(scamperHost.rcode, scamperHost.qname, scamperHost.inst.name))
-
-
-        # Construct registered_domain -> NS IPv4 address
-        self.results_domains_to_ns_a = set()
-        for i_domain in results_domains_to_ns.keys():
-            for i_ns in results_domains_to_ns[i_domain]:
-                if i_ns in results_domains_to_a:
-                    for i_a in results_domains_to_a[i_ns]:
-                        if not i_a.is_linklocal() and not i_a.is_reserved() and not i_a.is_rfc1918():
-                            self.results_domains_to_ns_a.add((i_domain, i_ns, str(i_a)))
-                else:
-                    self.logger.warning("Could not find '{}' in address resolution results.".format(i_ns))
-
-    # Callback handler to do_ns query
-    def _ctrl_callback_do_dns_ns(self, ctrl, vp_inst, state):
-        # If there are no registered domains left in the VP's state
-        if len(state[vp_inst]["domains_list"]) == 0:
-            self.logger.debug("Marking VP '{}' as done.".format(vp_inst.name))
-            vp_inst.done()
-        else:
-            _domain_name = state[vp_inst]["domains_list"].pop(0)
-            # We consider the NS of the registered domain name, which may in fact be a parent NS that resolves to a subdomain authoritative
-            _target_name = self.psl.privateparts(_domain_name)[-1] 
-
-            if _target_name not in state[vp_inst]["queried_name_to_domains_mapping"]:
-                state[vp_inst]["queried_name_to_domains_mapping"][_target_name] = []
-            state[vp_inst]["queried_name_to_domains_mapping"][_target_name].append(_domain_name)
-
-            self.logger.debug("Issuing NS query for {}".format(_target_name))
-            ctrl.do_dns(_target_name, qtype="NS", rd=True, wait_timeout=3, inst=vp_inst, sync=False)
-
-    # Callback handler to do_a query
-    def _ctrl_callback_do_dns_a(self, ctrl, vp_inst, state):
-        # If there are no registered domains left in the VP's state
-        if len(state[vp_inst]) == 0:
-            self.logger.debug("Marking VP '{}' as done.".format(vp_inst.name))
-            vp_inst.done()
+        self.logger.info("Using {} VP(s) for auth NS resolution.".format(len(self.ctrl.instances())))
+        for i_vp_inst in self.ctrl.instances():
+            self.state["in_flight"][i_vp_inst] = 0
+        return self.ctrl
+
+    @staticmethod
+    def _min_ttl(scamperHost, rrtype):
+        ttls = [i_rr.ttl for i_rr in scamperHost.ans(rrtypes=[rrtype])]
+        return min(ttls) if ttls else None
+
+    @staticmethod
+    def _response_qtype(scamperHost):
+        # An NS name may also be a registered domain, so the name alone does not identify the query
+        qtype = scamperHost.qtype
+        if isinstance(qtype, int):
+            return QTYPE_NAMES.get(qtype)
+        return str(qtype).upper()
+
+    @staticmethod
+    def _new_resolution_state():
+        return {
+            # (name, qtype) still to query, shared by all VPs
+            "work_queue" : collections.deque(),
+            # { (name, qtype) : vpid } of the queries sent and not answered yet
+            "pending" : {},
+            # { vpid : no. outstanding queries }
+            "in_flight" : {},
+            # VPs that asked for more while the work queue was empty
+            "idle_vps" : set(),
+        }
+
+    # Callback handler, scamper asks the VP for more queries
+    def _ctrl_callback_do_dns(self, ctrl, vp_inst, state):
+        if self.queries_in_flight_per_vp == 0:
+            if self._issue_queries(ctrl, vp_inst, 1) == 0:
+                state["idle_vps"].add(vp_inst)
         else:
-            _target_name = state[vp_inst].pop(0)
-            self.logger.debug("Issuing A query for {}".format(_target_name))
-            ctrl.do_dns(_target_name, qtype="A", rd=True, wait_timeout=3, inst=vp_inst, sync=False)
+            self._issue_queries(ctrl, vp_inst, self.queries_in_flight_per_vp - state["in_flight"][vp_inst])
+
+    def _give_up_pending_queries(self):
+        # Names that were not answered are given up, like NS names without addresses. The windows of
+        # the VPs start empty again, scamper will not ask them for more on its own.
+        self.state["pending"].clear()
+        for i_vp_inst in self.state["in_flight"]:
+            self.state["in_flight"][i_vp_inst] = 0
+        self.state["idle_vps"] = set(self.state["in_flight"])
+
+    def _dispatch_work(self, ctrl):
+        # Hand new names to the VPs scamper will not ask again
+        for i_vp_inst in list(self.state["in_flight"]):
+            if self.queries_in_flight_per_vp > 0:
+                self._issue_queries(ctrl, i_vp_inst, self.queries_in_flight_per_vp - self.state["in_flight"][i_vp_inst])
+            elif i_vp_inst in self.state["idle_vps"]:
+                self._issue_queries(ctrl, i_vp_inst, 1)
+
+    def _query_completed(self, ctrl, scamperHost):
+        """Returns the qtype of the answered query, or None if it was given up before."""
+        vp_inst = scamperHost.inst
+        qtype = self._response_qtype(scamperHost)
+        # Late answers to queries given up after a poll timeout no longer count for the VP
+        if self.state["pending"].get((scamperHost.qname, qtype)) is not vp_inst:
+            return None
+        del self.state["pending"][(scamperHost.qname, qtype)]
+        self.state["in_flight"][vp_inst] -= 1
+        # Top up the VP's window, independent of scamper asking for more
+        if self.queries_in_flight_per_vp > 0:
+            self._issue_queries(ctrl, vp_inst, self.queries_in_flight_per_vp - self.state["in_flight"][vp_inst])
+        return qtype
+
+    def _issue_queries(self, ctrl, vp_inst, num_queries):
+        num_issued = 0
+        while num_issued < num_queries and self.state["work_queue"]:
+            _target_name, _qtype = self.state["work_queue"].popleft()
+            self.logger.debug("Issuing {} query for {}".format(_qtype, _target_name))
+            ctrl.do_dns(_target_name, qtype=_qtype, rd=True, wait_timeout=3, inst=vp_inst, sync=False)
+            self.state["pending"][(_target_name, _qtype)] = vp_inst
+            self.state["in_flight"][vp_inst] += 1
+            num_issued += 1
+
+        if num_issued > 0:
+            self.state["idle_vps"].discard(vp_inst)
+        return num_issued
 
     def get_resolution_results(self):
         return self.results_domains_to_ns_a
@@ -18,6 +18,7 @@
 
 import ipaddress
 import collections
+import itertools
 import logging
 import math
 import os
@@ -25,6 +26,11 @@ import re
 import sys
 import yaml
 
+from prefix_index import PrefixIndex
+from probe_limits import ProbeLimits
+import prefix_loader
+import domain_order
+
 MIN_SOURCE_PREFIX_LENGTH = {
     1: 8,  # IPv4
     2: 12, # IPv6
@@ -33,6 +39,15 @@ MAX_SOURCE_PREFIX_LENGTH = {
     1: 32,  # IPv4
     2: 64,  # IPv6
 }
+TRIE_BACKENDS = ['object', 'arena', 'patricia']
+SUBNET_SELECTIONS = ['random_walk', 'frontier', 'plan']
+VP_SCAN_PROGRESSIONS = ['joint', 'independent']
+CONTROLLER_EVENT_LOOPS = ['blocking', 'asyncio']
+DOMAIN_ORDERS = ['list', 'nameserver_interleaved', 'cost']
+MAX_ADDRESS_BITS = {
+    1: 32,  # IPv4
+    2: 128, # IPv6
+}
 
 class ECSplorerConfigurator:
 
@@ -48,13 +63,36 @@ class ECSplorerConfigurator:
         self.prefixes_fpath = prefixes_fpath
         # Path to base directory of measurement output
         self.output_basedir = output_basedir
-        self.source_prefix_list = []
-        self.source_prefixes = collections.defaultdict(list)
+        self.source_prefix_index = None
+        self.probe_limits = None
+        # result rows per domain of a previous run, only loaded for the 'cost' domain order
+        self.domain_costs = None
         self.ignore_response_scope = ignore_response_scope
         self.scan_all_bgp = scan_all_bgp
 
     def load_domains_list_file(self):
         """Loads domain names from the domains list file."""
+        # Regular expression for validating domain name
+        domain_name_pattern = r"^(?!-)(?:[A-Za-z0-9-]{1,63})(?:(?:[.][A-Za-z0-9-]{1,63})+)[.]?$"
+
+        if self.config_data["stream_domains_chunk_size"] > 0:
+            # Only validate, the names are read again chunk by chunk while scanning
+            self.domains_list = None
+            num_domains = 0
+            try:
+                for i_fqdn in self.iter_domains_list():
+                    if re.match(domain_name_pattern, i_fqdn) is None:
+                        self.logger.error("Domains list entry '{}' is not a valid domain name.".format(i_fqdn))
+                        sys.exit(os.EX_CONFIG)
+                    num_domains += 1
+            except FileNotFoundError:
+                self.logger.error("The domains list file '{}' was not found.".format(self.domains_fpath))
+                sys.exit(os.EX_CONFIG)
+
+            self.logger.info("Validated {} domains in file '{}', resolving them in chunks of {}.".format(
+                num_domains, self.domains_fpath, self.config_data["stream_domains_chunk_size"]))
+            return
+
         try:
             with open(self.domains_fpath, "r") as file:
                 self._fqdns = file.read().splitlines()
@@ -63,8 +101,6 @@ class ECSplorerConfigurator:
             sys.exit(os.EX_CONFIG)
 
         ## Validate names
-        # Regular expression for validating domain name
-        domain_name_pattern = r"^(?!-)(?:[A-Za-z0-9-]{1,63})(?:(?:[.][A-Za-z0-9-]{1,63})+)[.]?$"
         self.domains_list = []
         for i_fqdn in self._fqdns:
             # Do re-based validity check
@@ -76,6 +112,12 @@ class ECSplorerConfigurator:
 
         self.logger.info("Read {} domains from file '{}'.".format(len(self.domains_list), self.domains_fpath))
 
+    def iter_domains_list(self, first_line=0):
+        """Reads the domain names of the domains list file lazily, starting at the given line."""
+        with open(self.domains_fpath, "r") as file:
+            for i_line in itertools.islice(file, first_line, None):
+                yield i_line.rstrip("\r\n")
+
     def load_config_file(self):
         """Loads and parses the YAML configuration file."""
         self.config_data = None
@@ -136,11 +178,26 @@ class ECSplorerConfigurator:
             else:
 
                 try:
-                    with open(self.prefixes_fpath, "r") as file:
+                    with prefix_loader.open_prefix_list(self.prefixes_fpath) as file:
                         _process_prefixes = file.read().splitlines()
                 except FileNotFoundError:
                     self.logger.error("The prefixes list file '{}' was not found.".format(self.prefixes_fpath))
                     sys.exit(os.EX_CONFIG)
+                except (OSError, ValueError) as e:
+                    self.logger.error("The prefixes list file '{}' could not be read: {}.".format(self.prefixes_fpath, e))
+                    sys.exit(os.EX_CONFIG)
+
+            if prefix_loader.bulk_ingest_available():
+                # Full routing tables: parse, validate and index all prefixes with array operations
+                try:
+                    _source_prefix_arrays = prefix_loader.parse_prefixes(_process_prefixes, self.config_data["address_family_number"])
+                except ValueError as e:
+                    self.logger.error(str(e))
+                    sys.exit(os.EX_CONFIG)
+                self.source_prefix_index = prefix_loader.build_prefix_index(_source_prefix_arrays, self.config_data["source_prefix_length"])
+                _process_prefixes = []
+
+            _source_prefixes = collections.defaultdict(list)
 
             for i_prefix in _process_prefixes:
 
@@ -151,7 +208,7 @@ class ECSplorerConfigurator:
                     if (_ipX_network.version == 4 and self.config_data["address_family_number"] != 1) or (_ipX_network.version == 6 and self.config_data["address_family_number"] != 2):
                         self.logger.error("Invalid prefix in 'source_address_space': {} is not of configured address family.".format(i_prefix))
                         sys.exit(os.EX_CONFIG)
-                    self.source_prefixes[int(_ipX_network.network_address)].append(_ipX_network.prefixlen)
+                    _source_prefixes[int(_ipX_network.network_address)].append(_ipX_network.prefixlen)
                 except Exception as e:
                     self.logger.error("Invalid prefix '{}' configured: {}.".format(i_prefix, e))
                     sys.exit(os.EX_CONFIG)
@@ -160,31 +217,49 @@ class ECSplorerConfigurator:
                 # self.logger.debug("Configured prefix {}.".format(i_prefix))
 
                 # self.logger.info("Configured source prefixes consisting of {} prefixes.".format(len(self.source_prefix_list)))
-            self.source_prefix_list = sorted(self.source_prefixes.keys())
+            if self.source_prefix_index is None:
+                # One shared index answers the BGP questions of every domain's trie
+                self.source_prefix_index = PrefixIndex.from_source_prefixes(_source_prefixes, MAX_ADDRESS_BITS[self.config_data["address_family_number"]], self.config_data["source_prefix_length"])
+            self.logger.info("Using {} source prefixes.".format(len(self.source_prefix_index)))
 
-            # Check per-prefix probe limit configuration
+            # Check per-prefix probe limit configuration, the limits for unannounced space are optional
             if "per_prefix_probe_limit" not in self.config_data:
                 self.logger.error("'per_prefix_probe_limit' not present in config.")
                 sys.exit(os.EX_CONFIG)
-            else:
+            elif type(self.config_data["per_prefix_probe_limit"]) != dict or len(self.config_data["per_prefix_probe_limit"]) == 0:
+                self.logger.error("Invalid 'per_prefix_probe_limit'. Needs to be non-empty dict with 'length: limit' items.")
+                sys.exit(os.EX_CONFIG)
 
-                if type(self.config_data["per_prefix_probe_limit"]) != dict or len(self.config_data["per_prefix_probe_limit"]) == 0:
-                    self.logger.error("Invalid 'per_prefix_probe_limit'. Needs to be non-empty dict with 'length: limit' items.")
-                    sys.exit(os.EX_CONFIG)
-                else:
-                    for i_prefix_len, i_probe_limit in self.config_data["per_prefix_probe_limit"].items():
-                        if type(i_prefix_len) != int or type(i_probe_limit) != int:
-                            self.logger.error("Invalid limit in 'per_prefix_probe_limit': '{}: {}' has non-integer.".format(i_prefix_len, i_probe_limit))
+            if "per_prefix_probe_limit_unannounced" not in self.config_data:
+                self.config_data["per_prefix_probe_limit_unannounced"] = {}
+            elif type(self.config_data["per_prefix_probe_limit_unannounced"]) != dict:
+                self.logger.error("Invalid 'per_prefix_probe_limit_unannounced'. Needs to be dict with 'length: limit' items.")
+                sys.exit(os.EX_CONFIG)
+
+            for i_limits_key in ("per_prefix_probe_limit", "per_prefix_probe_limit_unannounced"):
+                for i_prefix_len, i_probe_limit in self.config_data[i_limits_key].items():
+                    if type(i_prefix_len) != int or type(i_probe_limit) != int:
+                        self.logger.error("Invalid limit in '{}': '{}: {}' has non-integer.".format(i_limits_key, i_prefix_len, i_probe_limit))
+                        sys.exit(os.EX_CONFIG)
+                    elif i_prefix_len < 1:
+                        # the trie root is never limited, it stands for the whole source address space
+                        self.logger.error("Invalid limit in '{}': /{} is not a prefix length that can be limited.".format(i_limits_key, i_prefix_len))
+                        sys.exit(os.EX_CONFIG)
+                    else:
+                        # Calculate max number of probes possible for the configured address family and source prefix length, for the iterated
+                        # prefix length to which to apply a limit
+                        # e.g., a prefix of /20 to which to apply a limit can have at most 2^(24 - 20) = 16 queries of SPL /24
+                        i_scope_and_spl_limit = int(math.pow(2, (self.config_data["source_prefix_length"] - i_prefix_len)))
+
+                        if i_probe_limit < 1 or i_probe_limit > i_scope_and_spl_limit:
+                            self.logger.error("Invalid limit in '{}': a limit of {} probes with /{} SPL per /{} is not within the sensible boundaries of [1, {}].".format(i_limits_key, i_probe_limit, self.config_data["source_prefix_length"], i_prefix_len, i_scope_and_spl_limit))
                             sys.exit(os.EX_CONFIG)
-                        else:
-                            # Calculate max number of probes possible for the configured address family and source prefix length, for the iterated
-                            # prefix length to which to apply a limit
-                            # e.g., a prefix of /20 to which to apply a limit can have at most 2^(24 - 20) = 16 queries of SPL /24
-                            i_scope_and_spl_limit = int(math.pow(2, (self.config_data["source_prefix_length"] - i_prefix_len)))
 
-                            if i_probe_limit < 1 or i_probe_limit > i_scope_and_spl_limit:
-                                self.logger.error("Invalid limit in 'per_prefix_probe_limit': a limit of {} probes with /{} SPL per /{} is not within the sensible boundaries of [1, {}].".format(i_probe_limit, self.config_data["source_prefix_length"], i_prefix_len, i_scope_and_spl_limit))
-                                sys.exit(os.EX_CONFIG)
+            if self.config_data["per_prefix_probe_limit_unannounced"]:
+                self.logger.info("Using 'per_prefix_probe_limit_unannounced' {}.".format(self.config_data["per_prefix_probe_limit_unannounced"]))
+            # Compiled once, the tries look the limits up by prefix length
+            self.probe_limits = ProbeLimits(MAX_ADDRESS_BITS[self.config_data["address_family_number"]],
+                                            self.config_data["per_prefix_probe_limit"], self.config_data["per_prefix_probe_limit_unannounced"])
 
             # Check if the Ark vantage point selection is configured
             if "use_ark_vantage_points" not in self.config_data:
@@ -199,6 +274,46 @@ class ECSplorerConfigurator:
                 for i_config_vp_name in self.config_data["use_ark_vantage_points"]:
                     self.logger.info("Configured Ark VP '{}'.".format(i_config_vp_name))
 
+            # Check the optional window of outstanding NS/A queries per VP during the auth NS resolution
+            if "resolver_queries_in_flight_per_vp" not in self.config_data:
+                self.config_data["resolver_queries_in_flight_per_vp"] = 0
+            elif type(self.config_data["resolver_queries_in_flight_per_vp"]) != int or self.config_data["resolver_queries_in_flight_per_vp"] < 0:
+                self.logger.error("Invalid 'resolver_queries_in_flight_per_vp' in config.")
+                sys.exit(os.EX_CONFIG)
+
+            self.logger.info("Using 'resolver_queries_in_flight_per_vp' {}.".format(self.config_data["resolver_queries_in_flight_per_vp"]))
+
+            # Check the optional persistent cache of the auth NS resolution
+            if "resolution_cache" not in self.config_data:
+                self.config_data["resolution_cache"] = None
+            elif type(self.config_data["resolution_cache"]) != str:
+                self.logger.error("Invalid 'resolution_cache' in config. Needs to be a file path.")
+                sys.exit(os.EX_CONFIG)
+
+            if "resolution_cache_max_age_seconds" not in self.config_data:
+                self.config_data["resolution_cache_max_age_seconds"] = 86400
+            elif type(self.config_data["resolution_cache_max_age_seconds"]) != int or self.config_data["resolution_cache_max_age_seconds"] < 1:
+                self.logger.error("Invalid 'resolution_cache_max_age_seconds' in config.")
+                sys.exit(os.EX_CONFIG)
+
+            if "resolution_cache_use_ttl" not in self.config_data:
+                self.config_data["resolution_cache_use_ttl"] = True
+            elif type(self.config_data["resolution_cache_use_ttl"]) != bool:
+                self.logger.error("Invalid 'resolution_cache_use_ttl' in config. Needs to be true or false.")
+                sys.exit(os.EX_CONFIG)
+
+            if self.config_data["resolution_cache"] is not None:
+                self.logger.info("Using resolution cache '{}' with a max age of {}s{}.".format(
+                    self.config_data["resolution_cache"], self.config_data["resolution_cache_max_age_seconds"],
+                    " or the record TTL" if self.config_data["resolution_cache_use_ttl"] else ""))
+
+            # Check the optional streaming of the domains list
+            if "stream_domains_chunk_size" not in self.config_data:
+                self.config_data["stream_domains_chunk_size"] = 0
+            elif type(self.config_data["stream_domains_chunk_size"]) != int or self.config_data["stream_domains_chunk_size"] < 0:
+                self.logger.error("Invalid 'stream_domains_chunk_size' in config.")
+                sys.exit(os.EX_CONFIG)
+
             # Check if max parallel domains is configured and valid
             if "max_parallel_domains" not in self.config_data:
                 self.logger.error("'max_parallel_domains' not present in config.")
@@ -211,6 +326,193 @@ class ECSplorerConfigurator:
 
                 self.logger.info("Using 'max_parallel_domains' {}.".format(self.config_data["max_parallel_domains"]))
 
+            # Check the optional per-domain window of outstanding queries
+            if "max_queries_in_flight_per_domain" not in self.config_data:
+                self.config_data["max_queries_in_flight_per_domain"] = 1
+            elif type(self.config_data["max_queries_in_flight_per_domain"]) != int or self.config_data["max_queries_in_flight_per_domain"] < 1:
+                self.logger.error("Invalid 'max_queries_in_flight_per_domain' in config.")
+                sys.exit(os.EX_CONFIG)
+
+            self.logger.info("Using 'max_queries_in_flight_per_domain' {}.".format(self.config_data["max_queries_in_flight_per_domain"]))
+
+            # Check the optional query deadline
+            if "query_timeout_seconds" not in self.config_data:
+                self.config_data["query_timeout_seconds"] = 60
+            elif type(self.config_data["query_timeout_seconds"]) not in (int, float) or self.config_data["query_timeout_seconds"] < 0:
+                self.logger.error("Invalid 'query_timeout_seconds' in config.")
+                sys.exit(os.EX_CONFIG)
+
+            self.logger.info("Using 'query_timeout_seconds' {}.".format(self.config_data["query_timeout_seconds"]))
+
+            # Check the optional adaptive admission of parallel domains
+            if "adaptive_parallel_domains" not in self.config_data:
+                self.config_data["adaptive_parallel_domains"] = False
+            elif type(self.config_data["adaptive_parallel_domains"]) != bool:
+                self.logger.error("Invalid 'adaptive_parallel_domains' in config. Needs to be true or false.")
+                sys.exit(os.EX_CONFIG)
+
+            if "min_parallel_domains" not in self.config_data:
+                self.config_data["min_parallel_domains"] = 1
+            elif type(self.config_data["min_parallel_domains"]) != int or not 1 <= self.config_data["min_parallel_domains"] <= self.config_data["max_parallel_domains"]:
+                self.logger.error("Invalid 'min_parallel_domains' in config. Needs to be between 1 and 'max_parallel_domains'.")
+                sys.exit(os.EX_CONFIG)
+
+            if "adaptive_latency_threshold_seconds" not in self.config_data:
+                self.config_data["adaptive_latency_threshold_seconds"] = 3
+            elif type(self.config_data["adaptive_latency_threshold_seconds"]) not in (int, float) or self.config_data["adaptive_latency_threshold_seconds"] <= 0:
+                self.logger.error("Invalid 'adaptive_latency_threshold_seconds' in config.")
+                sys.exit(os.EX_CONFIG)
+
+            if self.config_data["adaptive_parallel_domains"]:
+                self.logger.info("Using adaptive parallel domains between {} and {} with a latency threshold of {}s.".format(
+                    self.config_data["min_parallel_domains"], self.config_data["max_parallel_domains"], self.config_data["adaptive_latency_threshold_seconds"]))
+
+            # Check the optional order in which the domains are admitted
+            if "domain_order" not in self.config_data:
+                self.config_data["domain_order"] = DOMAIN_ORDERS[0]
+            elif self.config_data["domain_order"] not in DOMAIN_ORDERS:
+                self.logger.error("Invalid 'domain_order' in config. Needs to be one of {}.".format(", ".join(DOMAIN_ORDERS)))
+                sys.exit(os.EX_CONFIG)
+
+            if self.config_data["domain_order"] == "cost":
+                if type(self.config_data.get("domain_cost_file")) != str:
+                    self.logger.error("'domain_order' cost needs the results of a previous run as 'domain_cost_file'.")
+                    sys.exit(os.EX_CONFIG)
+                try:
+                    self.domain_costs = domain_order.read_domain_costs(self.config_data["domain_cost_file"])
+                except OSError as e:
+                    self.logger.error("The domain cost file '{}' could not be read: {}.".format(self.config_data["domain_cost_file"], e))
+                    sys.exit(os.EX_CONFIG)
+                self.logger.info("Read the costs of {} domains from '{}'.".format(len(self.domain_costs), self.config_data["domain_cost_file"]))
+
+            self.logger.info("Using 'domain_order' {}.".format(self.config_data["domain_order"]))
+
+            # Check the optional per-domain budgets
+            if "max_queries_per_domain" not in self.config_data:
+                self.config_data["max_queries_per_domain"] = 0
+            elif type(self.config_data["max_queries_per_domain"]) != int or self.config_data["max_queries_per_domain"] < 0:
+                self.logger.error("Invalid 'max_queries_per_domain' in config.")
+                sys.exit(os.EX_CONFIG)
+
+            if "max_seconds_per_domain" not in self.config_data:
+                self.config_data["max_seconds_per_domain"] = 0
+            elif type(self.config_data["max_seconds_per_domain"]) not in (int, float) or self.config_data["max_seconds_per_domain"] < 0:
+                self.logger.error("Invalid 'max_seconds_per_domain' in config.")
+                sys.exit(os.EX_CONFIG)
+
+            self.logger.info("Using 'max_queries_per_domain' {} and 'max_seconds_per_domain' {}.".format(
+                self.config_data["max_queries_per_domain"], self.config_data["max_seconds_per_domain"]))
+
+            # Check the optional query rate limit per authoritative nameserver
+            if "max_queries_per_second_per_nameserver" not in self.config_data:
+                self.config_data["max_queries_per_second_per_nameserver"] = 0
+            elif type(self.config_data["max_queries_per_second_per_nameserver"]) not in (int, float) or self.config_data["max_queries_per_second_per_nameserver"] < 0:
+                self.logger.error("Invalid 'max_queries_per_second_per_nameserver' in config.")
+                sys.exit(os.EX_CONFIG)
+
+            if "nameserver_query_burst" not in self.config_data:
+                self.config_data["nameserver_query_burst"] = max(1, math.ceil(self.config_data["max_queries_per_second_per_nameserver"]))
+            elif type(self.config_data["nameserver_query_burst"]) != int or self.config_data["nameserver_query_burst"] < 1:
+                self.logger.error("Invalid 'nameserver_query_burst' in config.")
+                sys.exit(os.EX_CONFIG)
+
+            if self.config_data["max_queries_per_second_per_nameserver"] > 0:
+                self.logger.info("Using at most {} queries per second per nameserver with bursts of {}.".format(
+                    self.config_data["max_queries_per_second_per_nameserver"], self.config_data["nameserver_query_burst"]))
+
+            # Check the optional progression of the vantage points through a domain
+            if "vp_scan_progression" not in self.config_data:
+                self.config_data["vp_scan_progression"] = VP_SCAN_PROGRESSIONS[0]
+            elif self.config_data["vp_scan_progression"] not in VP_SCAN_PROGRESSIONS:
+                self.logger.error("Invalid 'vp_scan_progression' in config. Needs to be one of {}.".format(", ".join(VP_SCAN_PROGRESSIONS)))
+                sys.exit(os.EX_CONFIG)
+
+            self.logger.info("Using 'vp_scan_progression' {}.".format(self.config_data["vp_scan_progression"]))
+
+            # Check the optional scope map cache settings
+            for i_key, i_default in (("scope_map_cache", False), ("scope_map_key_nsid", False)):
+                if i_key not in self.config_data:
+                    self.config_data[i_key] = i_default
+                elif type(self.config_data[i_key]) != bool:
+                    self.logger.error("Invalid '{}' in config. Needs to be true or false.".format(i_key))
+                    sys.exit(os.EX_CONFIG)
+
+            if "scope_map_confirmation_probes" not in self.config_data:
+                self.config_data["scope_map_confirmation_probes"] = 3
+            elif type(self.config_data["scope_map_confirmation_probes"]) != int or self.config_data["scope_map_confirmation_probes"] < 1:
+                self.logger.error("Invalid 'scope_map_confirmation_probes' in config.")
+                sys.exit(os.EX_CONFIG)
+
+            if "scope_map_cache_size" not in self.config_data:
+                self.config_data["scope_map_cache_size"] = 1000
+            elif type(self.config_data["scope_map_cache_size"]) != int or self.config_data["scope_map_cache_size"] < 1:
+                self.logger.error("Invalid 'scope_map_cache_size' in config.")
+                sys.exit(os.EX_CONFIG)
+
+            if self.config_data["scope_map_cache"]:
+                if self.ignore_response_scope:
+                    self.logger.warning("'scope_map_cache' has no effect when the response scope is ignored.")
+                self.logger.info("Using scope map cache of {} nameservers with {} confirmation probes{}.".format(
+                    self.config_data["scope_map_cache_size"], self.config_data["scope_map_confirmation_probes"],
+                    ", keyed by NSID" if self.config_data["scope_map_key_nsid"] else ""))
+
+            # Check the optional checkpoint interval
+            if "checkpoint_interval_seconds" not in self.config_data:
+                self.config_data["checkpoint_interval_seconds"] = 0
+            elif type(self.config_data["checkpoint_interval_seconds"]) != int or self.config_data["checkpoint_interval_seconds"] < 0:
+                self.logger.error("Invalid 'checkpoint_interval_seconds' in config.")
+                sys.exit(os.EX_CONFIG)
+
+            self.logger.info("Using 'checkpoint_interval_seconds' {}.".format(self.config_data["checkpoint_interval_seconds"]))
+
+            # Check the optional trie backend selection
+            if "trie_backend" not in self.config_data:
+                self.config_data["trie_backend"] = TRIE_BACKENDS[0]
+            elif self.config_data["trie_backend"] not in TRIE_BACKENDS:
+                self.logger.error("Invalid 'trie_backend' in config. Needs to be one of {}.".format(", ".join(TRIE_BACKENDS)))
+                sys.exit(os.EX_CONFIG)
+
+            self.logger.info("Using 'trie_backend' {}.".format(self.config_data["trie_backend"]))
+
+            # Check the optional next subnet selection strategy
+            if "next_subnet_selection" not in self.config_data:
+                self.config_data["next_subnet_selection"] = SUBNET_SELECTIONS[0]
+            elif self.config_data["next_subnet_selection"] not in SUBNET_SELECTIONS:
+                self.logger.error("Invalid 'next_subnet_selection' in config. Needs to be one of {}.".format(", ".join(SUBNET_SELECTIONS)))
+                sys.exit(os.EX_CONFIG)
+            elif self.config_data["next_subnet_selection"] == "frontier" and self.config_data["trie_backend"] != "object":
+                self.logger.error("'next_subnet_selection' frontier is only available with the 'object' trie backend.")
+                sys.exit(os.EX_CONFIG)
+            elif self.config_data["next_subnet_selection"] == "plan" and not self.ignore_response_scope:
+                self.logger.error("'next_subnet_selection' plan is only available when the response scope is ignored.")
+                sys.exit(os.EX_CONFIG)
+
+            self.logger.info("Using 'next_subnet_selection' {}.".format(self.config_data["next_subnet_selection"]))
+
+            # Check the optional controller event loop
+            if "controller_event_loop" not in self.config_data:
+                self.config_data["controller_event_loop"] = CONTROLLER_EVENT_LOOPS[0]
+            elif self.config_data["controller_event_loop"] not in CONTROLLER_EVENT_LOOPS:
+                self.logger.error("Invalid 'controller_event_loop' in config. Needs to be one of {}.".format(", ".join(CONTROLLER_EVENT_LOOPS)))
+                sys.exit(os.EX_CONFIG)
+
+            self.logger.info("Using 'controller_event_loop' {}.".format(self.config_data["controller_event_loop"]))
+
+            # Check the optional number of trie worker processes
+            if "trie_workers" not in self.config_data:
+                self.config_data["trie_workers"] = 0
+            elif type(self.config_data["trie_workers"]) != int or self.config_data["trie_workers"] < 0:
+                self.logger.error("Invalid 'trie_workers' in config.")
+                sys.exit(os.EX_CONFIG)
+            elif self.config_data["trie_workers"] > 0 and self.config_data["controller_event_loop"] != "blocking":
+                self.logger.error("'trie_workers' are only available with the 'blocking' controller event loop.")
+                sys.exit(os.EX_CONFIG)
+            elif self.config_data["trie_workers"] > 0 and self.config_data["scope_map_cache"] and not self.ignore_response_scope:
+                self.logger.error("'trie_workers' can not be combined with the 'scope_map_cache'.")
+                sys.exit(os.EX_CONFIG)
+
+            self.logger.info("Using 'trie_workers' {}.".format(self.config_data["trie_workers"]))
+
 
         else:
             self.logger.error("No configuration data to process.")
@@ -225,20 +527,101 @@ class ECSplorerConfigurator:
     def get_config_address_family(self) -> int:
         return self.config_data["address_family_number"]
 
+    def get_config_is_ipv6(self) -> bool:
+        return self.config_data["address_family_number"] == 2
+
+    def get_config_address_bits(self) -> int:
+        return MAX_ADDRESS_BITS[self.config_data["address_family_number"]]
+
     def get_config_spl(self) -> int:
         return self.config_data["source_prefix_length"]
 
+    def get_config_resolution_cache(self) -> str | None:
+        return self.config_data["resolution_cache"]
+
+    def get_config_resolution_cache_max_age(self) -> int:
+        return self.config_data["resolution_cache_max_age_seconds"]
+
+    def get_config_resolution_cache_use_ttl(self) -> bool:
+        return self.config_data["resolution_cache_use_ttl"]
+
+    def get_config_stream_domains_chunk_size(self) -> int:
+        return self.config_data["stream_domains_chunk_size"]
+
+    def get_config_resolver_queries_in_flight_per_vp(self) -> int:
+        return self.config_data["resolver_queries_in_flight_per_vp"]
+
     def get_config_max_parallel_domains(self) -> int:
         return self.config_data["max_parallel_domains"]
 
-    def get_config_source_address_space(self) -> list:
-        return self.config_data["source_address_space"]
+    def get_config_max_queries_in_flight_per_domain(self) -> int:
+        return self.config_data["max_queries_in_flight_per_domain"]
+
+    def get_config_query_timeout(self) -> float:
+        return self.config_data["query_timeout_seconds"]
+
+    def get_config_adaptive_parallel_domains(self) -> bool:
+        return self.config_data["adaptive_parallel_domains"]
+
+    def get_config_min_parallel_domains(self) -> int:
+        return self.config_data["min_parallel_domains"]
+
+    def get_config_adaptive_latency_threshold(self) -> float:
+        return self.config_data["adaptive_latency_threshold_seconds"]
+
+    def get_config_domain_order(self) -> str:
+        return self.config_data["domain_order"]
 
-    def get_source_prefix_list(self) -> list:
-        return self.source_prefix_list
+    def get_domain_costs(self) -> dict:
+        return self.domain_costs
 
-    def get_source_prefixes(self) -> list:
-        return self.source_prefixes
+    def get_config_max_queries_per_domain(self) -> int:
+        return self.config_data["max_queries_per_domain"]
+
+    def get_config_max_seconds_per_domain(self) -> float:
+        return self.config_data["max_seconds_per_domain"]
+
+    def get_config_max_queries_per_second_per_nameserver(self) -> float:
+        return self.config_data["max_queries_per_second_per_nameserver"]
+
+    def get_config_nameserver_query_burst(self) -> int:
+        return self.config_data["nameserver_query_burst"]
+
+    def get_config_vp_scan_progression(self) -> str:
+        return self.config_data["vp_scan_progression"]
+
+    def get_config_scope_map_cache(self) -> bool:
+        return self.config_data["scope_map_cache"]
+
+    def get_config_scope_map_confirmation_probes(self) -> int:
+        return self.config_data["scope_map_confirmation_probes"]
+
+    def get_config_scope_map_key_nsid(self) -> bool:
+        return self.config_data["scope_map_key_nsid"]
+
+    def get_config_scope_map_cache_size(self) -> int:
+        return self.config_data["scope_map_cache_size"]
+
+    def get_config_checkpoint_interval(self) -> int:
+        return self.config_data["checkpoint_interval_seconds"]
+
+    def get_config_trie_backend(self) -> str:
+        return self.config_data["trie_backend"]
+
+    def get_config_next_subnet_selection(self) -> str:
+        return self.config_data["next_subnet_selection"]
+
+    def get_config_controller_event_loop(self) -> str:
+        return self.config_data["controller_event_loop"]
+
+    def get_config_trie_workers(self) -> int:
+        return self.config_data["trie_workers"]
+
+    def get_source_prefix_index(self) -> PrefixIndex:
+        return self.source_prefix_index
 
     def get_config_prefix_limits(self) -> dict:
         return self.config_data["per_prefix_probe_limit"]
+
+    def get_probe_limits(self) -> ProbeLimits:
+        return self.probe_limits
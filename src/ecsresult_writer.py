@@ -17,19 +17,36 @@
 # -----------------------------------------------------------------------------
 
 import csv
+import datetime
 import os
 
-from helpers import InstQueryResponse, QueryRequest
+from helpers import DomainState, InstQueryResponse, QueryRequest
 
 class ECSResultWriter:
 
-    def __init__(self, outputpath):
-        self.outfile = open(os.path.join(outputpath, 'ecsresults.csv'), 'w')
+    def __init__(self, outputpath, resume_offset=None):
+        path = os.path.join(outputpath, 'ecsresults.csv')
+        if resume_offset is not None:
+            # drop the rows written after the checkpoint, their subnets are probed again
+            os.truncate(path, resume_offset)
+            self.outfile = open(path, 'a')
+            self.writer = csv.writer(self.outfile)
+            return
+        self.outfile = open(path, 'w')
         self.writer = csv.writer(self.outfile)
-        self.writer.writerow(['domain', 'nameserver_ip', 'vp_name', 'client_subnet', 'source_pl', 'scope_pl', 'error', 'nsid', 'answers', 'cnames', 'scan_timestamp'])
+        self.writer.writerow(['domain', 'nameserver_ip', 'vp_name', 'client_subnet', 'source_pl', 'scope_pl', 'error', 'nsid', 'answers', 'cnames', 'scan_timestamp', 'inferred'])
 
     def add_result(self, query_request: QueryRequest, inst_query_response: InstQueryResponse):
-        self.writer.writerow([query_request.domain_state.domain, query_request.domain_state.nameserver_ip, inst_query_response.vp.name, query_request.ip_address_client, query_request.source_prefix_length, inst_query_response.scope_prefix_length, inst_query_response.error is not None, inst_query_response.nsid, sorted(inst_query_response.answers), sorted(inst_query_response.cnames), inst_query_response.scan_timestamp])
+        self.writer.writerow([query_request.domain_state.domain, query_request.domain_state.nameserver_ip, inst_query_response.vp.name, query_request.ip_address_client, query_request.source_prefix_length, inst_query_response.scope_prefix_length, inst_query_response.error is not None, inst_query_response.nsid, sorted(inst_query_response.answers), sorted(inst_query_response.cnames), inst_query_response.scan_timestamp, False])
+
+    def add_inferred_result(self, domain_state: DomainState, client_subnet: str, source_prefix_length: int, scope_prefix_length: int):
+        # a scope block taken over from the scope map cache, it was not probed
+        scan_timestamp = int(datetime.datetime.now(datetime.timezone.utc).timestamp())
+        self.writer.writerow([domain_state.domain, domain_state.nameserver_ip, '', client_subnet, source_prefix_length, scope_prefix_length, False, '', [], [], scan_timestamp, True])
+
+    def tell(self) -> int:
+        self.outfile.flush()
+        return self.outfile.tell()
 
     def close(self):
         self.outfile.close()
@@ -0,0 +1,52 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+from bisect import bisect_left, bisect_right
+from utils import Prefix
+
+
+class FinishedRanges:
+    """Sorted set of the address ranges of a domain whose subtrees are finished.
+
+    Touching or overlapping ranges are merged on insert, so two finished sibling subtrees
+    take up a single range. starts and ends are parallel sorted lists, ends are exclusive.
+    """
+
+    def __init__(self, address_bits: int):
+        self.address_bits = address_bits
+        self.starts = []
+        self.ends = []
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def add(self, prefix: Prefix):
+        start = prefix.network
+        end = start + (1 << (self.address_bits - prefix.length))
+        # all ranges from first to last touch or overlap the new one
+        first = bisect_left(self.ends, start)
+        last = bisect_right(self.starts, end)
+        if first < last:
+            start = min(start, self.starts[first])
+            end = max(end, self.ends[last - 1])
+        self.starts[first:last] = [start]
+        self.ends[first:last] = [end]
+
+    def covers(self, prefix: Prefix) -> bool:
+        position = bisect_right(self.starts, prefix.network) - 1
+        return position >= 0 and self.ends[position] >= prefix.network + (1 << (self.address_bits - prefix.length))
@@ -0,0 +1,206 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+from utils import ScanningMode, Prefix, ROOT_PREFIX
+from leaf_element import Leaf
+from root_element import finish_child
+
+import random
+
+
+class Frame:
+    __slots__ = ('node', 'prefix', 'mode', 'pending', 'current', 'deepest_bgp')
+
+    def __init__(self, node, prefix: Prefix, mode: ScanningMode, pending: list, deepest_bgp: int):
+        self.node = node
+        self.prefix = prefix
+        self.mode = mode
+        # child indexes still to descend into, the next one is at the end
+        self.pending = pending
+        # child index we descended into last; it is finished when we come back to this frame
+        self.current = None
+        # depth of the deepest BGP prefix on the path from the root down to this frame (-1 if none)
+        self.deepest_bgp = deepest_bgp
+
+
+class FrontierCursor:
+    """Depth-first work stack over a domain's Root that resumes where the last subnet was found.
+
+    The stack holds the path from the root to the parent of the last returned subnet, so the
+    next subnet is found without descending from the root again. Scan counts are only charged
+    to frames at depths with a configured probe limit, as no other depth ever reads them.
+    Below the shallowest limited frame the stack is dropped after every subnet and the child
+    order drawn again, so the limited subtrees are sampled like the random walk samples them.
+    Changes of the unfinished BGP subnet counts are passed up to every frame, which only
+    happens when a BGP prefix is scanned or dropped. Responses marking a node on the current
+    path cut the stack at that node.
+    """
+
+    def __init__(self, root, config):
+        self.root = root
+        self.config = config
+        self.address_bits = config.get_config_address_bits()
+        self.spl = config.get_config_spl()
+        self.probe_limits = config.get_probe_limits()
+        self.stack = []
+        # stack indexes of the frames sitting at a limited depth
+        self.limited_frames = []
+        self.exhausted = False
+
+    def root_handle_response(self, shortened_last_client_ip: Prefix) -> bool:
+        result = self.root.root_handle_response(shortened_last_client_ip)
+        depth = shortened_last_client_ip.length
+        if 0 < depth < len(self.stack) and self.stack[depth].prefix == shortened_last_client_ip:
+            self._truncate(depth)
+        return result
+
+    def get_new_parameters(self, logger) -> Prefix | None:
+        if self.exhausted:
+            return None
+        if not self.stack:
+            self._enter(self.root, ROOT_PREFIX, ScanningMode.BGP_MODE, -1, logger)
+
+        while self.stack:
+            frame = self.stack[-1]
+            if frame.current is not None:
+                bgp_subnets_left_before = frame.node.count_bgp_subnets_left()
+                finish_child(frame.node, frame.prefix, frame.current, self.root.finished_ranges, self.address_bits)
+                self._pass_up_bgp_subnets_change(frame.node.count_bgp_subnets_left() - bgp_subnets_left_before, len(self.stack) - 1)
+                frame.current = None
+
+            if frame.pending:
+                child_index = frame.pending.pop()
+                frame.current = child_index
+                child = frame.node.get_child(frame.prefix, child_index)
+                if isinstance(child, Leaf):
+                    continue
+                prefix = self._enter(child, frame.prefix.child(child_index, self.address_bits), frame.mode, frame.deepest_bgp, logger)
+                if prefix is not None:
+                    deepest_bgp = prefix.length if child.is_bgp_prefix() else frame.deepest_bgp
+                    self._charge_limited_frames(deepest_bgp)
+                    self._restart_at_limited_frame(logger)
+                    return prefix
+            else:
+                self._truncate(len(self.stack) - 1)
+                if frame.node.is_bgp_prefix():
+                    bgp_subnets_left_before = frame.node.count_bgp_subnets_left()
+                    frame.node.set_scanned()
+                    self._pass_up_bgp_subnets_change(frame.node.count_bgp_subnets_left() - bgp_subnets_left_before, len(self.stack))
+                    self._charge_limited_frames(frame.prefix.length)
+                    self._restart_at_limited_frame(logger)
+                    return frame.prefix
+
+        self.exhausted = True
+        return None
+
+    def _enter(self, node, prefix: Prefix, scanning_mode: ScanningMode, deepest_bgp: int, logger) -> Prefix | None:
+        """Checks a node like get_new_parameters_with_mode does. Returns the prefix if the node
+        itself is the next subnet, pushes a frame if its children have to be searched."""
+        node_scanning_mode = node.get_scanning_mode(prefix)
+        if node_scanning_mode == ScanningMode.FINISHED_SCANNING:
+            logger.debug('finished scanning mode')
+            return None
+
+        if node_scanning_mode.value > scanning_mode.value:
+            scanning_mode = node_scanning_mode
+
+        if scanning_mode == ScanningMode.BGP_PREFIX_MODE:
+            logger.debug('BGP prefix mode')
+            return None
+
+        if scanning_mode == ScanningMode.BGP_MODE and not node.has_bgp_subnet() and not node.is_in_announced_space():
+            logger.debug('BGP Mode without bgp prefixes left')
+            return None
+
+        if prefix.length == self.spl:
+            if node.was_scanned():
+                logger.debug('was scanned')
+            elif scanning_mode == ScanningMode.SAMPLE_MODE or (scanning_mode == ScanningMode.BGP_MODE and node.is_in_announced_space()):
+                bgp_subnets_left_before = node.count_bgp_subnets_left()
+                node.set_scanned()
+                self._pass_up_bgp_subnets_change(node.count_bgp_subnets_left() - bgp_subnets_left_before, len(self.stack))
+                return prefix
+            return None
+
+        if node.is_bgp_prefix():
+            deepest_bgp = prefix.length
+        if self.probe_limits.is_limited(prefix.length):
+            self.limited_frames.append(len(self.stack))
+        self.stack.append(Frame(node, prefix, scanning_mode, self._search_order(node, prefix, len(self.stack), logger), deepest_bgp))
+        return None
+
+    def _search_order(self, node, prefix: Prefix, depth: int, logger) -> list:
+        """Draws the child order of the node at the given stack depth like
+        get_new_parameters_with_mode does, finishing the children that were scanned already.
+        The first child to descend into is last."""
+        first_child_index = random.randint(0, 1)
+        search_order = []
+        only_second_child_has_bgp = True
+        for slice_index, child_index in enumerate((first_child_index, 1 - first_child_index)):
+            child = node.get_child(prefix, child_index)
+            if isinstance(child, Leaf):
+                continue
+            if child.was_scanned():
+                logger.debug('finishing after child has been scanned')
+                bgp_subnets_left_before = node.count_bgp_subnets_left()
+                finish_child(node, prefix, child_index, self.root.finished_ranges, self.address_bits)
+                self._pass_up_bgp_subnets_change(node.count_bgp_subnets_left() - bgp_subnets_left_before, depth)
+                continue
+            child_has_bgp = child.has_bgp_subnet() or child.is_in_announced_space()
+            if (slice_index == 0 and child_has_bgp) or (slice_index == 1 and not child_has_bgp):
+                only_second_child_has_bgp = False
+            search_order.append(child_index)
+
+        if only_second_child_has_bgp:
+            search_order.reverse()
+        # pending is consumed from the end
+        search_order.reverse()
+        return search_order
+
+    def _charge_limited_frames(self, deepest_bgp: int):
+        for stack_index in self.limited_frames:
+            frame = self.stack[stack_index]
+            frame.node.set_child_scanned(deepest_bgp >= frame.prefix.length)
+
+        for stack_index in self.limited_frames:
+            frame = self.stack[stack_index]
+            if frame.node.get_scanning_mode(frame.prefix) in (ScanningMode.FINISHED_SCANNING, ScanningMode.BGP_PREFIX_MODE):
+                self._truncate(stack_index)
+                break
+
+    def _restart_at_limited_frame(self, logger):
+        # the random walk draws a new path from the root for every subnet, inside a limited
+        # subtree that path decides which of its subnets are sampled before the limit is hit
+        if not self.limited_frames:
+            return
+        depth = self.limited_frames[0]
+        frame = self.stack[depth]
+        self._truncate(depth + 1)
+        # the child descended into last is only finished if it returned itself
+        frame.current = None
+        frame.pending = self._search_order(frame.node, frame.prefix, depth, logger)
+
+    def _pass_up_bgp_subnets_change(self, delta: int, depth: int):
+        if delta != 0:
+            for frame in self.stack[:depth]:
+                frame.node.child_bgp_subnets_changed(delta)
+
+    def _truncate(self, depth: int):
+        del self.stack[depth:]
+        while self.limited_frames and self.limited_frames[-1] >= depth:
+            self.limited_frames.pop()
@@ -18,18 +18,39 @@
 
 import ipaddress
 import datetime
+import time
 from root_element import Root
 from typing import List
 
 
 class DomainState:
-    def __init__(self, domain: str, nameserver_ip: str, identifier: int):
+    def __init__(self, domain: str, nameserver_ip: str, identifier: int, vp=None):
         self.domain = domain
         self.nameserver_ip = ipaddress.ip_address(nameserver_ip)
         self.identifier = identifier
+        # scamper instance this state queries from, None if all vantage points are queried together
+        self.vp = vp
+        self.key = identifier if vp is None else (identifier, vp.shortname)
         self.temp_errors = 0
         self.perm_error = False
         self.state = None
+        # FrontierCursor over state, only set with the 'frontier' next subnet selection
+        self.frontier = None
+        self.queries_in_flight = 0
+        # for the per-domain budgets
+        self.queries_sent = 0
+        self.admitted = time.time()
+        # the scan was cut short by a budget, so its scope map is incomplete
+        self.budget_exhausted = False
+        # no further subnets are handed out, the domain is done once the queries in flight are answered
+        self.scan_finished = False
+        # scope map bookkeeping, only used with the scope map cache (see ScopeMapCache)
+        self.scope_map_key = None
+        self.observed_scope_map = None
+        self.predicted_scope_map = None
+        self.scope_map_confirmations = 0
+        # blocks marked from a confirmed prediction without being probed, written as inferred results
+        self.inferred_scope_blocks = []
 
 
 class QueryRequest:
@@ -38,6 +59,8 @@ class QueryRequest:
         self.source_prefix_length = source_prefix_length
         self.family = family
         self.domain_state = domain_state
+        # correlation id of the query, assigned by the Controller when it is sent
+        self.query_id = None
 
     def is_nil(self) -> bool:
         return self.ip_address_client is None
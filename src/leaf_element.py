@@ -17,50 +17,39 @@
 # -----------------------------------------------------------------------------
 
 from trie_element import TrieElement
-from utils import ScanningMode, PrefixType
+from utils import ScanningMode, Prefix
 
 class Leaf(TrieElement):
-    def __init__(self, scans_announced, scans_unannounced, which_kind_of_prefix: int, has_bgp_subnet: bool, value: int, is_announced: bool, leaf_scanned):
-        self.leaf_scanned = 0
-        self.scans_announced = scans_announced
-        self.scans_unannounced = scans_unannounced
-        self.which_kind_of_prefix = which_kind_of_prefix
-        self.has_bgp_subnet = has_bgp_subnet
-        self.value = value  # 0 or 1
-        self.is_announced = is_announced
-
-    def get_value(self) -> int:
-        return self.value
+    """Takes the place of a finished subtree. A finished subtree needs no state, so all of
+    them share the FINISHED_LEAF instance."""
+    __slots__ = ()
+
+    def __reduce__(self):
+        # unpickles as the shared instance
+        return 'FINISHED_LEAF'
 
     def was_scanned(self) -> bool:
-        return self.leaf_scanned >= 1
+        return False
 
     def set_scanned(self):
-        self.leaf_scanned += 1
-        if self.which_kind_of_prefix == PrefixType.BGPANNOUNCED:
-            self.scans_announced += 1
-        else:
-            self.scans_unannounced += 1
+        raise RuntimeError("Leaf cannot be scanned")
 
     def set_child_scanned(self, is_bgp_announced: bool):
-        if is_bgp_announced or self.which_kind_of_prefix == PrefixType.BGPANNOUNCED:
-            self.scans_announced += 1
-        else:
-            self.scans_unannounced += 1
+        raise RuntimeError("Leaf cannot be scanned")
 
-    def get_scanning_mode(self, _: list[int]) -> int:
+    def get_scanning_mode(self, _: Prefix) -> int:
         return ScanningMode.FINISHED_SCANNING
 
     def has_bgp_subnet(self) -> bool:
-        return self.has_bgp_subnet
+        return False
 
     def is_bgp_prefix(self) -> bool:
-        return self.which_kind_of_prefix == PrefixType.BGPANNOUNCED
+        return False
 
     def is_in_announced_space(self) -> bool:
-        return self.is_announced
+        return False
 
-    def handle_response(self, _: list[int], __: int):
+    def handle_response(self, _: Prefix, __: int):
         return self
 
     def finish_this_trie_element(self):
@@ -69,16 +58,16 @@ class Leaf(TrieElement):
     def finish_child_element(self, _: int):
         raise RuntimeError("Leaf cannot finish child element")
 
-    def how_many_scans_and_bgp_scans_inside_this_prefix(self) -> tuple[int, int]:
-        return self.scans_unannounced, self.scans_announced
-
-    def get_new_parameters(self, _: list[int]) -> tuple[list[int] | None, bool]:
+    def get_new_parameters(self, _: Prefix) -> tuple[Prefix | None, bool]:
         return None, False
 
-    def any_not_finished_bgp_subnets_left(self, _: list[int]) -> bool:
+    def any_not_finished_bgp_subnets_left(self, _: Prefix) -> bool:
         return False
 
-    def get_child(self, _: list[int], __: int):
+    def count_bgp_subnets_left(self) -> int:
+        return 0
+
+    def get_child(self, _: Prefix, __: int):
         return None
 
     def mark_as_in_response(self) -> bool:
@@ -86,3 +75,6 @@ class Leaf(TrieElement):
 
     def is_marked_in_response(self) -> bool:
         return True
+
+
+FINISHED_LEAF = Leaf()
@@ -0,0 +1,90 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+
+import collections
+import time
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(float(self.burst), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, cost: int, now: float) -> bool:
+        self.refill(now)
+        # a query to all vantage points may cost more than the burst, the bucket then goes into debt
+        if self.tokens <= 0:
+            return False
+        self.tokens -= cost
+        return True
+
+    def delay(self) -> float:
+        return max(0.0, -self.tokens) / self.rate
+
+
+class NameserverRateLimiter:
+    """Token bucket per authoritative nameserver IP over the queries sent to it.
+
+    A query costs one token per vantage point it is sent from. Queries without a token wait in
+    a FIFO queue of their nameserver until release hands them out again.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.deferred = {}
+
+    def acquire(self, nameserver_ip, cost: int) -> bool:
+        if nameserver_ip in self.deferred:
+            # keep the order of the waiting queries
+            return False
+        bucket = self.buckets.get(nameserver_ip)
+        if bucket is None:
+            bucket = self.buckets[nameserver_ip] = TokenBucket(self.rate, self.burst)
+        return bucket.try_acquire(cost, time.monotonic())
+
+    def defer(self, nameserver_ip, item, cost: int):
+        self.deferred.setdefault(nameserver_ip, collections.deque()).append((item, cost))
+
+    def release(self) -> list:
+        now = time.monotonic()
+        released = []
+        for nameserver_ip in list(self.deferred):
+            bucket = self.buckets[nameserver_ip]
+            waiting = self.deferred[nameserver_ip]
+            while waiting and bucket.try_acquire(waiting[0][1], now):
+                released.append(waiting.popleft()[0])
+            if not waiting:
+                del self.deferred[nameserver_ip]
+        return released
+
+    def next_release_delay(self) -> float | None:
+        """Seconds until the next deferred query can be released, None if no query waits."""
+        if not self.deferred:
+            return None
+        return min(self.buckets[nameserver_ip].delay() for nameserver_ip in self.deferred)
@@ -17,32 +17,33 @@
 # -----------------------------------------------------------------------------
 
 from trie_element import TrieElement
-from leaf_element import Leaf
+from leaf_element import Leaf, FINISHED_LEAF
 from utils import *
-from typing import List
-from bisect import bisect_left
 
 import logging
 
 class Node(TrieElement):
-    def __init__(self, prefix_up_to_parent: list[int], this_value: int, kind_of_net_parent: int, is_announced: bool, config):
-        prefix_including_value = prefix_up_to_parent + [this_value]
+    # Static BGP facts live in the shared source prefix index, a node only adds the per-domain scan state
+    __slots__ = ('value', 'skeleton_row', 'is_announced', 'children', 'config', 'node_scans',
+                 'scans_announced', 'scans_unannounced', 'counter_returned_as_scope', 'bgp_subnets_left')
 
-        if is_bgp_announced(prefix_including_value, config.get_config_address_family() == 6, config):
-            kind_of_prefix = PrefixType.BGPANNOUNCED
-        else:
-            kind_of_prefix = PrefixType.UNANNOUNCED
-
-        self.which_kind_of_prefix = kind_of_prefix
+    def __init__(self, this_value: int, skeleton_row: int, is_announced: bool, config):
         self.value = this_value
-        self._has_bgp_subnet = has_bgp_subnet(prefix_including_value, config)
+        # row of this prefix in the source prefix index, -1 if no source prefix is at or below it
+        self.skeleton_row = skeleton_row
         self.children = [None, None]  # Represents the two possible children
-        self.is_announced = is_announced or kind_of_prefix == PrefixType.BGPANNOUNCED
         self.config = config
+        self.is_announced = is_announced or self.is_bgp_prefix()
         self.node_scans = 0
         self.scans_announced = 0
         self.scans_unannounced = 0
         self.counter_returned_as_scope = 0
+        # BGP prefixes at or below this node that were neither scanned nor dropped with a finished subtree
+        self.bgp_subnets_left = config.get_source_prefix_index().subtree_prefixes_row(skeleton_row)
+
+    @property
+    def which_kind_of_prefix(self) -> PrefixType:
+        return PrefixType.BGPANNOUNCED if self.is_bgp_prefix() else PrefixType.UNANNOUNCED
 
     def get_value(self) -> int:
         return self.value
@@ -51,42 +52,43 @@ class Node(TrieElement):
         return self.node_scans >= 1
 
     def set_scanned(self):
+        if self.node_scans == 0 and self.is_bgp_prefix():
+            self.bgp_subnets_left -= 1
         self.node_scans += 1
-        if self.which_kind_of_prefix == PrefixType.BGPANNOUNCED:
+        if self.is_bgp_prefix():
             self.scans_announced += 1
         else:
             self.scans_unannounced += 1
 
     def set_child_scanned(self, is_bgp_announced: bool):
-        if is_bgp_announced or self.which_kind_of_prefix == PrefixType.BGPANNOUNCED:
+        if is_bgp_announced or self.is_bgp_prefix():
             self.scans_announced += 1
         else:
             self.scans_unannounced += 1
 
     def has_bgp_subnet(self) -> bool:
-        return self._has_bgp_subnet
+        return self.skeleton_row >= 0
 
     def is_bgp_prefix(self) -> bool:
-        return self.which_kind_of_prefix == PrefixType.BGPANNOUNCED
+        return self.config.get_source_prefix_index().is_announced_row(self.skeleton_row)
 
     def is_in_announced_space(self) -> bool:
         return self.is_announced
 
     def finish_this_trie_element(self) -> Leaf:
-        return Leaf(
-            scans_announced=self.scans_announced,
-            scans_unannounced=self.scans_unannounced,
-            value=self.value,
-            has_bgp_subnet=self.has_bgp_subnet,
-            which_kind_of_prefix=self.which_kind_of_prefix,
-            is_announced=self.is_announced,
-            leaf_scanned=self.node_scans
-        )
+        return FINISHED_LEAF
 
     def finish_child_element(self, index: int):
         if self.children[index]:
+            self.bgp_subnets_left -= self.children[index].count_bgp_subnets_left()
             self.children[index] = self.children[index].finish_this_trie_element()
 
+    def count_bgp_subnets_left(self) -> int:
+        return self.bgp_subnets_left
+
+    def child_bgp_subnets_changed(self, delta: int):
+        self.bgp_subnets_left += delta
+
     def mark_as_in_response(self) -> bool:
         self.counter_returned_as_scope += 1
         return self.counter_returned_as_scope >= 1
@@ -94,29 +96,19 @@ class Node(TrieElement):
     def is_marked_in_response(self) -> bool:
         return self.counter_returned_as_scope >= 1
 
-    def any_not_finished_bgp_subnets_left(self, prefix_up_to_this: List[int]) -> bool:
-        if self.which_kind_of_prefix == PrefixType.BGPANNOUNCED and not self.was_scanned():
-            return True
-        elif not self.has_bgp_subnet:
-            return False
-        if len(prefix_up_to_this) == self.config.get_config_spl():
-            return False
-        for index in range(len(self.children)):
-            if self.children[index]:
-                new_prefix = prefix_up_to_this + [index]
-                if self.children[index].any_not_finished_bgp_subnets_left(new_prefix):
-                    return True
-        return False
-
-    def get_child(self, current_prefix: List[int], index_value: int) -> 'Node':
+    def any_not_finished_bgp_subnets_left(self, prefix_up_to_this: Prefix) -> bool:
+        return self.bgp_subnets_left > 0
+
+    def get_child(self, current_prefix: Prefix, index_value: int) -> 'Node':
         if self.children[index_value] is None:
-            self.children[index_value] = Node(current_prefix, index_value, self.which_kind_of_prefix, self.is_announced, self.config)
+            skeleton_row = self.config.get_source_prefix_index().child_row(self.skeleton_row, index_value)
+            self.children[index_value] = Node(index_value, skeleton_row, self.is_announced, self.config)
         return self.children[index_value]
 
-    def get_scanning_mode(self, current_prefix_up_to_this: List[int]) -> int:
-        depth = len(current_prefix_up_to_this)
+    def get_scanning_mode(self, current_prefix_up_to_this: Prefix) -> int:
+        depth = current_prefix_up_to_this.length
         # if self.which_kind_of_prefix == PrefixType.SPECIAL and max_special_prefix_scans <= self.scans_unannounced:
-        #     logging.debug(f"trie: finish scanning special prefix {convert_ip_from_field_to_net_ip(current_prefix_up_to_this, ipv6_scan)}/{depth}")
+        #     logging.debug(f"trie: finish scanning special prefix {convert_prefix_to_net_ip(current_prefix_up_to_this, ipv6_scan)}/{depth}")
         #     return FINISHED_SCANNING
 
         total_unannounced_limit_hit = self.scans_unannounced + self.scans_announced >= 0 # self.config.get_total_notrouted_limit()
@@ -126,48 +118,19 @@ class Node(TrieElement):
             if self.any_not_finished_bgp_subnets_left(current_prefix_up_to_this) and self.config.scan_all_bgp:
                 return ScanningMode.BGP_PREFIX_MODE
             else:
-                self.logger.debug(f"trie: finish scanning as marked in response {convert_ip_from_field_to_net_ip(current_prefix_up_to_this, self.config.get_config_address_family() == 6)}/{depth}")
+                logging.getLogger(__name__).debug(f"trie: finish scanning as marked in response {convert_prefix_to_net_ip(current_prefix_up_to_this, self.config.get_config_is_ipv6())}/{depth}")
                 return ScanningMode.FINISHED_SCANNING
 
-        # no_limits = (self.config.get_config_prefix_limits()[PrefixType.BGPANNOUNCED][depth] == 0 and
-        #              self.config.get_config_prefix_limits()[PrefixType.UNANNOUNCED][depth] == 0 and
-        #              self.config.get_config_prefix_limits()[PrefixType.TOTAL][depth] == 0)
-
-        no_limits = self.config.get_config_prefix_limits().get(depth, 0) == 0
-        if no_limits:
+        probe_limits = self.config.get_probe_limits()
+        if not probe_limits.is_limited(depth):
             return default_mode
 
-        # total_limit_hit = self.config.get_config_prefix_limits()[TOTAL][depth] and self.config.get_config_prefix_limits()[TOTAL][depth] <= self.scans_unannounced + self.scans_announced
-        # announced_limit_hit = self.config.get_config_prefix_limits()[BGPANNOUNCED][depth] and self.config.get_config_prefix_limits()[BGPANNOUNCED][depth] <= self.scans_announced
-        # unannounced_limit_hit = self.config.get_config_prefix_limits()[UNANNOUNCED][depth] and self.config.get_config_prefix_limits()[UNANNOUNCED][depth] <= self.scans_unannounced
-        announced_limit_hit = self.config.get_config_prefix_limits().get(depth, 0) and self.config.get_config_prefix_limits().get(depth, 0) <= self.scans_announced
-
-        # if total_limit_hit or announced_limit_hit or unannounced_limit_hit:
-        if announced_limit_hit:
+        if probe_limits.limit_hit(depth, self.scans_announced, self.scans_unannounced):
             bgp_left = self.any_not_finished_bgp_subnets_left(current_prefix_up_to_this)
-            # if total_limit_hit or announced_limit_hit:
             if bgp_left and self.config.scan_all_bgp:
                 return ScanningMode.BGP_PREFIX_MODE
             else:
-                logging.getLogger(__name__).debug(f"trie: finish scanning - limit hit {announced_limit_hit} --- {convert_ip_from_field_to_net_ip(current_prefix_up_to_this, self.config.get_config_address_family() == 6)}/{depth}")
+                logging.getLogger(__name__).debug(f"trie: finish scanning - limit hit --- {convert_prefix_to_net_ip(current_prefix_up_to_this, self.config.get_config_is_ipv6())}/{depth}")
                 return ScanningMode.FINISHED_SCANNING
-            # else:
-            #     return BGP_MODE
         else:
             return default_mode
-
-
-def is_bgp_announced(prefix: List[int], is_ipv6: bool, config) -> bool:
-    prefix_lengths = config.get_source_prefixes().get(convert_ip_from_short_field_to_key_int(prefix, is_ipv6), [])
-    return len(prefix) in prefix_lengths
-
-
-def has_bgp_subnet(prefix: List[int], config) -> bool:
-    start_key = convert_ip_from_short_field_to_key_int(prefix, config.get_config_address_family() == 6)
-    end_key = calculate_biggest_key_in_subnet(prefix, config.get_config_address_family() == 6)
-
-    index = bisect_left(config.get_source_prefix_list(), start_key)
-    if index == len(config.get_source_prefix_list()):
-        return False
-
-    return start_key <= config.get_source_prefix_list()[index] <= end_key
\ No newline at end of file
@@ -0,0 +1,330 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+from utils import ScanningMode, Prefix, ROOT_PREFIX, convert_prefix_to_net_ip
+from leaf_element import FINISHED_LEAF
+from finished_ranges import FinishedRanges
+from prefix_index import ROOT as SKELETON_ROOT
+
+import logging
+import random
+
+
+class PatriciaNode:
+    __slots__ = ('prefix', 'skeleton_row', 'is_announced', 'children', 'node_scans', 'scans_announced',
+                 'scans_unannounced', 'counter_returned_as_scope', 'bgp_subnets_left')
+
+    def __init__(self, prefix: Prefix, skeleton_row: int, is_announced: bool, bgp_subnets_left: int):
+        self.prefix = prefix
+        self.skeleton_row = skeleton_row
+        self.is_announced = is_announced
+        self.children = [None, None]
+        self.node_scans = 0
+        self.scans_announced = 0
+        self.scans_unannounced = 0
+        self.counter_returned_as_scope = 0
+        self.bgp_subnets_left = bgp_subnets_left
+
+
+class PatriciaRoot:
+    """Path-compressed trie backend for sparse source address spaces.
+
+    Behaves like Root, but a node outside the announced space whose prefix index row has a
+    single child is not created: its parent links straight to the next node that branches,
+    is a BGP prefix, sits at a depth with a probe limit or at the source prefix length. Such
+    a skipped node would only pass the walk on to its one child with BGP prefixes, so the trie
+    holds nodes for the branching points only. A response scope that ends on a skipped node
+    splits the edge and creates the node. Unlike Root, the walk does not draw a random child
+    order at skipped nodes, so the query order differs from the other backends.
+
+    Inside the announced space, a subtree without BGP prefixes that the walk enters for the
+    first time is sampled without creating its nodes: they all offer both children, so the
+    walk only draws one random bit per level. The scanned subnet and the nodes at limited
+    depths are linked to the parent by sampled edges, whose nodes are created one at a time
+    when a later walk or response passes through them. The walk draws the same bits as with
+    all nodes created, so this does not change the query order.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.index = config.get_source_prefix_index()
+        self.address_bits = config.get_config_address_bits()
+        self.spl = config.get_config_spl()
+        self.probe_limits = config.get_probe_limits()
+        self.scope_zero_observed = 0
+        self.root = PatriciaNode(ROOT_PREFIX, SKELETON_ROOT if len(self.index) > 0 else -1, False,
+                                 self.index.subtree_prefixes_row(SKELETON_ROOT))
+        self.finished_ranges = FinishedRanges(self.address_bits)
+
+    def _is_skipped(self, skeleton_row: int, depth: int) -> bool:
+        if depth >= self.spl or self.probe_limits.is_limited(depth) or self.index.is_announced_row(skeleton_row):
+            return False
+        return (self.index.child_row(skeleton_row, 0) >= 0) != (self.index.child_row(skeleton_row, 1) >= 0)
+
+    def get_child(self, node: PatriciaNode, index: int):
+        if node.children[index] is None:
+            prefix = node.prefix.child(index, self.address_bits)
+            skeleton_row = self.index.child_row(node.skeleton_row, index)
+            is_announced = node.is_announced or self.index.is_announced_row(skeleton_row)
+            if not is_announced:
+                if skeleton_row < 0:
+                    # neither announced nor leading to a BGP prefix, the walk never scans here
+                    node.children[index] = FINISHED_LEAF
+                    return FINISHED_LEAF
+                while self._is_skipped(skeleton_row, prefix.length):
+                    bit = 0 if self.index.child_row(skeleton_row, 0) >= 0 else 1
+                    skeleton_row = self.index.child_row(skeleton_row, bit)
+                    prefix = prefix.child(bit, self.address_bits)
+                is_announced = self.index.is_announced_row(skeleton_row)
+            node.children[index] = PatriciaNode(prefix, skeleton_row, is_announced, self.index.subtree_prefixes_row(skeleton_row))
+        return node.children[index]
+
+    def is_sampled_edge(self, node: PatriciaNode, child: PatriciaNode) -> bool:
+        # skipped nodes are never announced, so an announced node only gets compressed edges
+        # from _sample_subtree
+        return node.is_announced and child.prefix.length > node.prefix.length + 1
+
+    def split_edge(self, node: PatriciaNode, index: int, length: int) -> PatriciaNode:
+        """Creates the node at the given length on the compressed edge to the child at index."""
+        child = node.children[index]
+        split_prefix = child.prefix.truncate(length, self.address_bits)
+        split = PatriciaNode(split_prefix, self.index.find(split_prefix), node.is_announced, child.bgp_subnets_left)
+        split.children[child.prefix.bit_at(length, self.address_bits)] = child
+        node.children[index] = split
+        return split
+
+    def finish_child_element(self, node: PatriciaNode, index: int):
+        child = node.children[index]
+        if child is not None and child is not FINISHED_LEAF:
+            node.bgp_subnets_left -= child.bgp_subnets_left
+            self.finished_ranges.add(node.prefix.child(index, self.address_bits))
+        node.children[index] = FINISHED_LEAF
+
+    def was_scanned(self, node: PatriciaNode) -> bool:
+        return node.node_scans >= 1
+
+    def set_scanned(self, node: PatriciaNode):
+        if node.node_scans == 0 and self.is_bgp_prefix(node):
+            node.bgp_subnets_left -= 1
+        node.node_scans += 1
+        if self.is_bgp_prefix(node):
+            node.scans_announced += 1
+        else:
+            node.scans_unannounced += 1
+
+    def set_child_scanned(self, node: PatriciaNode, is_bgp_announced: bool):
+        if node is self.root:
+            return
+        if is_bgp_announced or self.is_bgp_prefix(node):
+            node.scans_announced += 1
+        else:
+            node.scans_unannounced += 1
+
+    def is_bgp_prefix(self, node: PatriciaNode) -> bool:
+        return node is not self.root and self.index.is_announced_row(node.skeleton_row)
+
+    def has_bgp_subnet(self, node: PatriciaNode) -> bool:
+        return node.skeleton_row >= 0
+
+    def get_scanning_mode(self, node: PatriciaNode) -> ScanningMode:
+        if node is self.root:
+            return ScanningMode.SAMPLE_MODE
+        depth = node.prefix.length
+        default_mode = ScanningMode.BGP_MODE
+
+        if node.counter_returned_as_scope >= 1:
+            if node.bgp_subnets_left > 0 and self.config.scan_all_bgp:
+                return ScanningMode.BGP_PREFIX_MODE
+            else:
+                logging.getLogger(__name__).debug(f"trie: finish scanning as marked in response {convert_prefix_to_net_ip(node.prefix, self.config.get_config_is_ipv6())}/{depth}")
+                return ScanningMode.FINISHED_SCANNING
+
+        if not self.probe_limits.is_limited(depth):
+            return default_mode
+
+        if self.probe_limits.limit_hit(depth, node.scans_announced, node.scans_unannounced):
+            if node.bgp_subnets_left > 0 and self.config.scan_all_bgp:
+                return ScanningMode.BGP_PREFIX_MODE
+            else:
+                logging.getLogger(__name__).debug(f"trie: finish scanning - limit hit --- {convert_prefix_to_net_ip(node.prefix, self.config.get_config_is_ipv6())}/{depth}")
+                return ScanningMode.FINISHED_SCANNING
+        else:
+            return default_mode
+
+    def root_handle_response(self, shortened_last_client_ip: Prefix) -> bool:
+        if shortened_last_client_ip.length > 0:
+            if self.finished_ranges.covers(shortened_last_client_ip):
+                return False
+            return self._handle_response(self.root, shortened_last_client_ip)
+        else:
+            self.scope_zero_observed += 1
+            max_num_scope_zeros = 0
+            return max_num_scope_zeros > 0 and self.scope_zero_observed >= max_num_scope_zeros
+
+    def _handle_response(self, node: PatriciaNode, shortened_last_client_ip: Prefix) -> bool:
+        if node.prefix.length == shortened_last_client_ip.length:
+            node.counter_returned_as_scope += 1
+            return True
+        index = shortened_last_client_ip.bit_at(node.prefix.length, self.address_bits)
+        child = self.get_child(node, index)
+        if child is FINISHED_LEAF:
+            return shortened_last_client_ip.length == node.prefix.length + 1
+
+        common_length = min(child.prefix.length, shortened_last_client_ip.length)
+        if shortened_last_client_ip.truncate(common_length, self.address_bits) != child.prefix.truncate(common_length, self.address_bits):
+            if not node.is_announced:
+                # leaves the compressed edge into space without BGP prefixes, which is never scanned
+                return False
+            # leaves a sampled edge into announced space, split the edge where the two part
+            split_length = node.prefix.length + 1
+            while shortened_last_client_ip.bit_at(split_length, self.address_bits) == child.prefix.bit_at(split_length, self.address_bits):
+                split_length += 1
+            child = self.split_edge(node, index, split_length)
+        elif shortened_last_client_ip.length < child.prefix.length:
+            # the scope ends on a skipped node or inside a sampled edge, split the edge there
+            child = self.split_edge(node, index, shortened_last_client_ip.length)
+
+        if self._handle_response(child, shortened_last_client_ip):
+            return self.get_scanning_mode(node) == ScanningMode.FINISHED_SCANNING
+        return False
+
+    def get_new_parameters(self, logger) -> Prefix | None:
+        prefix, _ = self._get_new_parameters_with_mode(self.root, ScanningMode.BGP_MODE, logger)
+        return prefix
+
+    def _get_new_parameters_with_mode(self, node: PatriciaNode, scanning_mode: ScanningMode, logger):
+        current_prefix_slice = node.prefix
+        node_scanning_mode = self.get_scanning_mode(node)
+
+        if node_scanning_mode == ScanningMode.FINISHED_SCANNING:
+            logger.debug('finished scanning mode')
+            return None, False
+
+        if node_scanning_mode.value > scanning_mode.value:
+            scanning_mode = node_scanning_mode
+
+        if scanning_mode == ScanningMode.BGP_PREFIX_MODE:
+            logger.debug('BGP prefix mode')
+            return None, False
+
+        if scanning_mode == ScanningMode.BGP_MODE and not self.has_bgp_subnet(node) and not node.is_announced:
+            logger.debug('BGP Mode without bgp prefixes left')
+            return None, False
+
+        # Depth to scan with is reached
+        if current_prefix_slice.length == self.spl:
+            if self.was_scanned(node):
+                logger.debug('was scanned')
+                return None, False
+            elif scanning_mode == ScanningMode.SAMPLE_MODE or (scanning_mode == ScanningMode.BGP_MODE and node.is_announced):
+                self.set_scanned(node)
+                return current_prefix_slice, self.is_bgp_prefix(node)
+            else:
+                return None, False
+
+        first_child_index = random.randint(0, 1)
+        second_child_index = 1 - first_child_index
+        search_order = [None, None]
+        child_available = False
+        only_second_child_has_bgp = True
+
+        for slice_index, child_index in enumerate((first_child_index, second_child_index)):
+            if node.children[child_index] is None and node.is_announced and self.index.child_row(node.skeleton_row, child_index) < 0:
+                # announced and without BGP prefixes, sampled by _sample_subtree
+                if slice_index == 0:
+                    only_second_child_has_bgp = False
+                search_order[slice_index] = child_index
+                child_available = True
+                continue
+            child = self.get_child(node, child_index)
+            if child is FINISHED_LEAF:
+                continue
+            if self.is_sampled_edge(node, child):
+                child = self.split_edge(node, child_index, node.prefix.length + 1)
+            if scanning_mode == ScanningMode.BGP_PREFIX_MODE and not self.is_bgp_prefix(child) and not self.has_bgp_subnet(child):
+                logger.debug('finishing child as it has no BGP')
+                self.finish_child_element(node, child_index)
+            elif self.was_scanned(child):
+                logger.debug('finishing after child has been scanned')
+                self.finish_child_element(node, child_index)
+            else:
+                child_has_bgp = self.has_bgp_subnet(child) or child.is_announced
+                if (slice_index == 0 and child_has_bgp) or (slice_index == 1 and not child_has_bgp):
+                    only_second_child_has_bgp = False
+                search_order[slice_index] = child_index
+                child_available = True
+
+        if child_available:
+            if only_second_child_has_bgp:
+                search_order = [search_order[1], search_order[0]]
+
+            for child_index in search_order:
+                if child_index is None:
+                    continue
+                child = node.children[child_index]
+                if child is None:
+                    new_prefix, isannounced = self._sample_subtree(node, child_index), False
+                    child = node.children[child_index]
+                else:
+                    bgp_subnets_left_before = child.bgp_subnets_left
+                    new_prefix, isannounced = self._get_new_parameters_with_mode(child, scanning_mode, logger)
+                    node.bgp_subnets_left += child.bgp_subnets_left - bgp_subnets_left_before
+                if new_prefix is not None:
+                    if self.probe_limits.is_limited(current_prefix_slice.length):
+                        self.set_child_scanned(node, isannounced)
+                    if self.was_scanned(child) and not self.is_sampled_edge(node, child):
+                        # the child returned itself, nothing is left to do below it
+                        self.finish_child_element(node, child_index)
+                    return new_prefix, isannounced or self.is_bgp_prefix(node)
+                else:
+                    logger.debug(f"trie: finish child because it told us no more scans to do {convert_prefix_to_net_ip(child.prefix, self.config.get_config_is_ipv6())}/{child.prefix.length} scanning mode {scanning_mode}")
+                    self.finish_child_element(node, child_index)
+
+        if self.is_bgp_prefix(node):
+            self.set_scanned(node)
+            return current_prefix_slice, True
+
+        return None, False
+
+    def _sample_subtree(self, node: PatriciaNode, index: int) -> Prefix:
+        """Walks into the announced child at index, below which nothing was created yet and no
+        BGP prefix lies. Every node there offers both children, so the walk follows the first
+        child it draws down to the source prefix length. Only the nodes at limited depths,
+        which count the scans, and the scanned subnet are created."""
+        parent = node
+        prefix = node.prefix.child(index, self.address_bits)
+        limited_nodes = []
+        while prefix.length < self.spl:
+            if self.probe_limits.is_limited(prefix.length):
+                limited_node = PatriciaNode(prefix, -1, True, 0)
+                parent.children[prefix.bit_at(parent.prefix.length, self.address_bits)] = limited_node
+                parent = limited_node
+                limited_nodes.append(limited_node)
+            prefix = prefix.child(random.randint(0, 1), self.address_bits)
+        subnet = PatriciaNode(prefix, -1, True, 0)
+        parent.children[prefix.bit_at(parent.prefix.length, self.address_bits)] = subnet
+        self.set_scanned(subnet)
+        for limited_node in reversed(limited_nodes):
+            self.set_child_scanned(limited_node, False)
+        if self.is_sampled_edge(parent, subnet):
+            # the node above the subnet is not created, the finished range stands in for it
+            self.finished_ranges.add(prefix)
+        elif parent is not node:
+            # a scanned child is finished by its parent, the walk does so for the children of node
+            self.finish_child_element(parent, prefix.bit_at(parent.prefix.length, self.address_bits))
+        return prefix
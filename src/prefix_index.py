@@ -0,0 +1,108 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+from array import array
+from utils import Prefix
+
+# Row 0 is the root. It is never anybody's child, so a child slot of 0 means "no child".
+ROOT = 0
+NO_CHILD = 0
+
+FLAG_ANNOUNCED = 1
+
+
+class PrefixIndex:
+    """Binary radix index over the source prefixes, built once at config load.
+
+    Every row lies on the path to at least one source prefix, so reaching the row of a
+    prefix already tells that a source prefix is at or below it. All lookups walk at most
+    prefix length rows and allocate nothing. The index is shared by all domain tries and
+    must not be changed after it has been built.
+
+    The rows also serve as the read-only skeleton of every domain trie: a trie node only
+    keeps the row of its prefix (see child_row) and reads its static BGP facts from here.
+    """
+
+    def __init__(self, address_bits: int):
+        self.address_bits = address_bits
+        self.children = (array('i', [NO_CHILD]), array('i', [NO_CHILD]))
+        self.flags = bytearray(1)
+        # number of source prefixes at or below a row that are not longer than the counted length
+        self.subtree_prefixes = array('I', [0])
+        self.num_prefixes = 0
+
+    @classmethod
+    def from_source_prefixes(cls, source_prefixes: dict, address_bits: int, max_counted_length: int) -> 'PrefixIndex':
+        index = cls(address_bits)
+        prefixes = sorted({(network, length) for network, lengths in source_prefixes.items() for length in lengths})
+        # Rows are numbered depth by depth in prefix order, the same as prefix_loader.build_prefix_index
+        rows = [ROOT] * len(prefixes)
+        for network, length in prefixes:
+            if length <= max_counted_length:
+                index.subtree_prefixes[ROOT] += 1
+            if length == 0:
+                index.flags[ROOT] |= FLAG_ANNOUNCED
+        for depth in range(1, max((length for _, length in prefixes), default=0) + 1):
+            previous_key = None
+            for position, (network, length) in enumerate(prefixes):
+                if length < depth:
+                    continue
+                key = network >> (address_bits - depth)
+                if key != previous_key:
+                    row = index._append_row()
+                    index.children[key & 1][rows[position]] = row
+                    previous_key = key
+                rows[position] = row
+                if length <= max_counted_length:
+                    index.subtree_prefixes[row] += 1
+                if length == depth:
+                    index.flags[row] |= FLAG_ANNOUNCED
+        index.num_prefixes = len(prefixes)
+        return index
+
+    def _append_row(self) -> int:
+        self.children[0].append(NO_CHILD)
+        self.children[1].append(NO_CHILD)
+        self.flags.append(0)
+        self.subtree_prefixes.append(0)
+        return len(self.flags) - 1
+
+    def __len__(self) -> int:
+        return self.num_prefixes
+
+    def find(self, prefix: Prefix) -> int:
+        """Returns the row of the prefix, or -1 if no source prefix is at or below it."""
+        row = ROOT
+        for depth in range(prefix.length):
+            row = self.children[(prefix.network >> (self.address_bits - depth - 1)) & 1][row]
+            if row == NO_CHILD:
+                return -1
+        return row
+
+    def child_row(self, row: int, bit: int) -> int:
+        """Steps from the row of a prefix to the row of its child, -1 if there is none."""
+        if row < 0:
+            return -1
+        child = self.children[bit][row]
+        return -1 if child == NO_CHILD else child
+
+    def subtree_prefixes_row(self, row: int) -> int:
+        return self.subtree_prefixes[row] if row >= 0 else 0
+
+    def is_announced_row(self, row: int) -> bool:
+        return row >= 0 and bool(self.flags[row] & FLAG_ANNOUNCED)
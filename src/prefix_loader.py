@@ -0,0 +1,236 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+from array import array
+from typing import NamedTuple
+from prefix_index import PrefixIndex, FLAG_ANNOUNCED
+
+import gzip
+import io
+import ipaddress
+import socket
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ADDRESS_BITS = {
+    1: 32,
+    2: 128,
+}
+SOCKET_FAMILIES = {
+    1: socket.AF_INET,
+    2: socket.AF_INET6,
+}
+
+
+def bulk_ingest_available() -> bool:
+    return np is not None
+
+
+def open_prefix_list(fpath: str):
+    """Opens a prefix list for reading text, decompressing .gz and .zst files on the fly."""
+    if fpath.endswith('.gz'):
+        return gzip.open(fpath, 'rt')
+    if fpath.endswith('.zst'):
+        if zstandard is None:
+            raise ValueError("reading zstd-compressed prefix lists requires the 'zstandard' package")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(fpath, 'rb'), closefd=True))
+    return open(fpath, 'r')
+
+
+class SourcePrefixArrays(NamedTuple):
+    """Source prefixes as parallel arrays, sorted by network and length and free of duplicates.
+
+    Networks are left-aligned in 128 bits and split into two uint64 words, so an IPv4 network
+    sits in the upper half of high and low is zero.
+    """
+    high: 'np.ndarray'
+    low: 'np.ndarray'
+    lengths: 'np.ndarray'
+    address_bits: int
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+
+def _invalid_prefix(line: str, address_family: int) -> ValueError:
+    """Builds the error for a line the fast paths rejected, with the reason ipaddress gives."""
+    try:
+        network = ipaddress.ip_network(line, strict=True)
+    except ValueError as e:
+        return ValueError("Invalid prefix '{}' configured: {}.".format(line, e))
+    if ADDRESS_BITS[address_family] != network.max_prefixlen:
+        return ValueError("Invalid prefix in 'source_address_space': {} is not of configured address family.".format(line))
+    return ValueError("Invalid prefix '{}' configured: only the prefix length notation is supported.".format(line))
+
+
+def _parse_canonical_ipv4(lines: list):
+    """Parses dotted quads with a length, one per line, without looking at single lines.
+
+    Returns the networks and lengths, or None if any line is not in that form.
+    """
+    text = '\n'.join(lines) + '\n'
+    data = np.frombuffer(text.encode('ascii', errors='replace'), dtype=np.uint8)
+    is_digit = (data >= ord('0')) & (data <= ord('9'))
+    separators = np.flatnonzero(~is_digit)
+    kinds = data[separators]
+    if not np.all((kinds == ord('.')) | (kinds == ord('/')) | (kinds == ord('\n'))):
+        return None
+    # five fields of one to three digits per line, in the order . . . / \n
+    if len(separators) != 5 * len(lines) or not np.array_equal(kinds.reshape(-1, 5), np.tile(np.frombuffer(b'.../\n', dtype=np.uint8), (len(lines), 1))):
+        return None
+    field_starts = np.concatenate(([0], separators[:-1] + 1))
+    field_widths = separators - field_starts
+    if np.any((field_widths < 1) | (field_widths > 3)):
+        return None
+    if np.any((data[field_starts] == ord('0')) & (field_widths > 1)):
+        return None
+    fields = np.array(text.translate(str.maketrans('./\n', '   ')).split(), dtype=np.int64).reshape(-1, 5)
+    if np.any(fields[:, :4] > 255):
+        return None
+    networks = (fields[:, 0] << 24) | (fields[:, 1] << 16) | (fields[:, 2] << 8) | fields[:, 3]
+    return networks.astype(np.uint64), fields[:, 4]
+
+
+def _parse_lines(lines: list, address_family: int):
+    """Parses one line at a time with inet_pton, for IPv6 and IPv4 lists in any other notation."""
+    socket_family = SOCKET_FAMILIES[address_family]
+    address_bits = ADDRESS_BITS[address_family]
+    packed = []
+    lengths = []
+    for line in lines:
+        address, separator, length = line.partition('/')
+        try:
+            # int() would also take whitespace, signs and underscores, which ipaddress rejects
+            if separator and not (length.isascii() and length.isdigit()):
+                raise ValueError(length)
+            packed.append(socket.inet_pton(socket_family, address))
+            lengths.append(int(length) if separator else address_bits)
+        except (OSError, ValueError):
+            raise _invalid_prefix(line, address_family) from None
+    if address_family == 1:
+        networks = np.frombuffer(b''.join(packed), dtype='>u4').astype(np.uint64)
+        return networks, np.array(lengths, dtype=np.int64)
+    words = np.frombuffer(b''.join(packed), dtype='>u8').reshape(-1, 2).astype(np.uint64)
+    return (words[:, 0], words[:, 1]), np.array(lengths, dtype=np.int64)
+
+
+def _host_mask(host_bits):
+    """Masks of the lowest host_bits bits of a uint64 word, host_bits between 0 and 64."""
+    return np.where(host_bits >= 64, np.uint64(0xFFFFFFFFFFFFFFFF),
+                    (np.uint64(1) << np.minimum(host_bits, 63).astype(np.uint64)) - np.uint64(1))
+
+
+def parse_prefixes(lines: list, address_family: int) -> SourcePrefixArrays:
+    """Parses, validates, sorts and deduplicates prefixes with array operations.
+
+    Raises ValueError naming the first invalid line, with the message the per-prefix parsing
+    of the configurator would log.
+    """
+    address_bits = ADDRESS_BITS[address_family]
+    parsed = None
+    if address_family == 1 and lines and all(type(line) == str for line in lines):
+        parsed = _parse_canonical_ipv4(lines)
+    if parsed is None:
+        # like the per-prefix parsing, blank lines and surrounding whitespace are invalid
+        lines = [str(line) for line in lines]
+        parsed = _parse_lines(lines, address_family)
+    networks, lengths = parsed
+    if address_family == 1:
+        high = networks << np.uint64(32)
+        low = np.zeros(len(lengths), dtype=np.uint64)
+    else:
+        high, low = networks
+
+    invalid = (lengths < 0) | (lengths > address_bits)
+    bounded_lengths = np.clip(lengths, 0, address_bits)
+    # host bits left of bit 64 are checked in high, the others in low
+    high_host_bits = (64 - np.minimum(bounded_lengths, 64)).astype(np.int64)
+    low_host_bits = (128 - np.maximum(bounded_lengths, 64)).astype(np.int64)
+    invalid |= (high & _host_mask(high_host_bits)) != 0
+    invalid |= (low & _host_mask(low_host_bits)) != 0
+    if np.any(invalid):
+        raise _invalid_prefix(lines[int(np.flatnonzero(invalid)[0])], address_family)
+
+    lengths = bounded_lengths.astype(np.uint8)
+    order = np.lexsort((lengths, low, high))
+    high, low, lengths = high[order], low[order], lengths[order]
+    if len(lengths) > 1:
+        unique = np.concatenate(([True], (high[1:] != high[:-1]) | (low[1:] != low[:-1]) | (lengths[1:] != lengths[:-1])))
+        high, low, lengths = high[unique], low[unique], lengths[unique]
+    return SourcePrefixArrays(high, low, lengths, address_bits)
+
+
+def build_prefix_index(source_prefixes: SourcePrefixArrays, max_counted_length: int) -> PrefixIndex:
+    """Builds the same PrefixIndex as PrefixIndex.from_source_prefixes, one depth at a time.
+
+    The prefixes are sorted, so the prefixes truncated to a depth are sorted as well and the
+    distinct truncations are the index rows of that depth, in row order.
+    """
+    high, low, lengths = source_prefixes.high, source_prefixes.low, source_prefixes.lengths
+    num_rows = 1
+    child_rows = ([], [])
+    flags = [np.array([FLAG_ANNOUNCED if len(lengths) and lengths[0] == 0 else 0], dtype=np.uint8)]
+    counted = lengths <= max_counted_length
+    subtree_prefixes = [np.array([np.count_nonzero(counted)], dtype=np.int64)]
+    # row of every prefix at the previous depth, all prefixes start at the root
+    rows = np.zeros(len(lengths), dtype=np.int64)
+
+    for depth in range(1, int(lengths.max()) + 1 if len(lengths) else 0):
+        below = np.flatnonzero(lengths >= depth)
+        if depth <= 64:
+            keys = (high[below] >> np.uint64(64 - depth),)
+            bits = keys[0] & np.uint64(1)
+        else:
+            keys = (high[below], low[below] >> np.uint64(128 - depth))
+            bits = keys[1] & np.uint64(1)
+        first = np.ones(len(below), dtype=bool)
+        first[1:] = False
+        for key in keys:
+            first[1:] |= key[1:] != key[:-1]
+        group = np.cumsum(first) - 1
+        num_groups = int(group[-1]) + 1
+        new_rows = num_rows + group
+
+        parents = rows[below][first]
+        for bit in (0, 1):
+            child_rows[bit].append((parents[bits[first] == bit], new_rows[first][bits[first] == bit]))
+        level_flags = np.zeros(num_groups, dtype=np.uint8)
+        level_flags[group[lengths[below] == depth]] = FLAG_ANNOUNCED
+        flags.append(level_flags)
+        subtree_prefixes.append(np.bincount(group, weights=counted[below], minlength=num_groups).astype(np.int64))
+        rows[below] = new_rows
+        num_rows += num_groups
+
+    index = PrefixIndex(source_prefixes.address_bits)
+    for bit in (0, 1):
+        column = np.zeros(num_rows, dtype=np.intc)
+        for parents, new_rows in child_rows[bit]:
+            column[parents] = new_rows
+        index.children[bit][:] = array('i', column.tobytes())
+    index.flags = bytearray(np.concatenate(flags).tobytes())
+    index.subtree_prefixes = array('I', np.concatenate(subtree_prefixes).astype(np.uintc).tobytes())
+    index.num_prefixes = len(lengths)
+    return index
@@ -0,0 +1,43 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+
+class ProbeLimits:
+    """Per-prefix probe limits, compiled at config load into arrays indexed by prefix length.
+
+    A limit of 0 means the length is not limited. Announced scans are those with a BGP prefix
+    between the limited prefix and the scanned subnet, all others are unannounced. Only
+    prefixes at a limited length keep counts, see set_child_scanned.
+    """
+    __slots__ = ('announced', 'unannounced')
+
+    def __init__(self, address_bits: int, announced: dict, unannounced: dict):
+        self.announced = [0] * (address_bits + 1)
+        self.unannounced = [0] * (address_bits + 1)
+        for depth, limit in announced.items():
+            self.announced[depth] = limit
+        for depth, limit in unannounced.items():
+            self.unannounced[depth] = limit
+
+    def is_limited(self, depth: int) -> bool:
+        return self.announced[depth] > 0 or self.unannounced[depth] > 0
+
+    def limit_hit(self, depth: int, scans_announced: int, scans_unannounced: int) -> bool:
+        announced_limit = self.announced[depth]
+        unannounced_limit = self.unannounced[depth]
+        return (announced_limit > 0 and announced_limit <= scans_announced) or (unannounced_limit > 0 and unannounced_limit <= scans_unannounced)
@@ -0,0 +1,71 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nameservers (registered_domain TEXT PRIMARY KEY, ns_names TEXT NOT NULL, expires REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS addresses (ns_name TEXT PRIMARY KEY, addresses TEXT NOT NULL, expires REAL NOT NULL);
+"""
+
+
+class ResolutionCache:
+    """SQLite cache of the NS names of registered domains and of the addresses of NS names.
+
+    An entry expires after the TTL of its answer records, at most after max_age seconds, or
+    always after max_age seconds if use_ttl is false. Empty answers are not cached.
+    """
+
+    def __init__(self, fpath: str, max_age: int, use_ttl: bool):
+        self.max_age = max_age
+        self.use_ttl = use_ttl
+        # the resolver may run in the domain stream thread, but only ever in one thread at a time
+        self.connection = sqlite3.connect(fpath, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        now = time.time()
+        self.connection.execute("DELETE FROM nameservers WHERE expires <= ?", (now,))
+        self.connection.execute("DELETE FROM addresses WHERE expires <= ?", (now,))
+        self.connection.commit()
+
+    def expires(self, ttl: int | None) -> float:
+        if self.use_ttl and ttl is not None:
+            return time.time() + min(ttl, self.max_age)
+        return time.time() + self.max_age
+
+    def _get(self, query: str, key: str) -> list | None:
+        row = self.connection.execute(query, (key, time.time())).fetchone()
+        return None if row is None else row[0].split("\n")
+
+    def get_nameservers(self, registered_domain: str) -> list | None:
+        return self._get("SELECT ns_names FROM nameservers WHERE registered_domain = ? AND expires > ?", registered_domain)
+
+    def get_addresses(self, ns_name: str) -> list | None:
+        return self._get("SELECT addresses FROM addresses WHERE ns_name = ? AND expires > ?", ns_name)
+
+    def put_nameservers(self, registered_domain: str, ns_names, ttl: int | None):
+        if ns_names:
+            self.connection.execute("INSERT OR REPLACE INTO nameservers VALUES (?, ?, ?)", (registered_domain, "\n".join(sorted(ns_names)), self.expires(ttl)))
+
+    def put_addresses(self, ns_name: str, addresses, ttl: int | None):
+        if addresses:
+            self.connection.execute("INSERT OR REPLACE INTO addresses VALUES (?, ?, ?)", (ns_name, "\n".join(sorted(addresses)), self.expires(ttl)))
+
+    def commit(self):
+        self.connection.commit()
@@ -16,10 +16,11 @@
 # limitations under the License.
 # -----------------------------------------------------------------------------
 
-from utils import ScanningMode, convert_ip_from_field_to_net_ip
+from utils import ScanningMode, Prefix, ROOT_PREFIX, convert_prefix_to_net_ip
 from node_element import Node
-from leaf_element import Leaf
-from typing import List
+from leaf_element import Leaf, FINISHED_LEAF
+from prefix_index import ROOT as SKELETON_ROOT
+from finished_ranges import FinishedRanges
 
 import random
 
@@ -30,6 +31,9 @@ class Root:
         self.root_is_scanned = False
         self.childs = [None, None]
         self.config = config
+        self.bgp_subnets_left = config.get_source_prefix_index().subtree_prefixes_row(SKELETON_ROOT)
+        # address ranges of the finished subtrees, responses inside them are dropped right away
+        self.finished_ranges = FinishedRanges(config.get_config_address_bits())
 
     def get_value(self):
         raise NotImplementedError("Root has no value")
@@ -42,14 +46,22 @@ class Root:
 
     def finish_child_element(self, index):
         if self.childs[index]:
+            self.bgp_subnets_left -= self.childs[index].count_bgp_subnets_left()
             self.childs[index] = self.childs[index].finish_this_trie_element()
 
+    def count_bgp_subnets_left(self):
+        return self.bgp_subnets_left
+
+    def child_bgp_subnets_changed(self, delta):
+        self.bgp_subnets_left += delta
+
     def has_bgp_subnet(self):
-        return len(self.config.get_source_prefix_list()) > 0
+        return len(self.config.get_source_prefix_index()) > 0
 
     def get_child(self, prefix_up_to_parent, index):
         if self.childs[index] is None:
-            self.childs[index] = Node([], index, ScanningMode.SAMPLE_MODE, False, self.config)
+            skeleton_row = self.config.get_source_prefix_index().child_row(SKELETON_ROOT, index)
+            self.childs[index] = Node(index, skeleton_row, False, self.config)
         return self.childs[index]
 
     def get_scanning_mode(self, current_prefix_up_to_this):
@@ -62,52 +74,65 @@ class Root:
         return False
 
     def any_not_finished_bgp_subnets_left(self, prefix_up_to_this):
-        for child in self.childs:
-            if child is not None:
-                if child.any_not_finished_bgp_subnets_left(prefix_up_to_this):
-                    return True
-        return False
+        return self.bgp_subnets_left > 0
 
     def set_child_scanned(self, _):
         pass
 
-    def root_handle_response(self, shortened_last_client_ip: List[int]) -> bool:
-        if len(shortened_last_client_ip) > 0:
-            return handle_response(self, shortened_last_client_ip, 0)
+    def get_new_parameters(self, logger) -> Prefix | None:
+        return get_new_parameters(self, ROOT_PREFIX, self.config, logger)
+
+    def root_handle_response(self, shortened_last_client_ip: Prefix) -> bool:
+        if shortened_last_client_ip.length > 0:
+            if self.finished_ranges.covers(shortened_last_client_ip):
+                return False
+            return handle_response(self, shortened_last_client_ip, 0, self.config.get_config_address_bits())
         else:
             self.scope_zero_observed += 1
             max_num_scope_zeros = 0
             return max_num_scope_zeros > 0 and self.scope_zero_observed >= max_num_scope_zeros
 
 
-def handle_response(current_node, shortened_last_client_ip, depth):
+def handle_response(current_node, shortened_last_client_ip: Prefix, depth: int, address_bits: int):
     if current_node is None:
         # found leaf node -> we do not care anymore about results there
         return False
-    if len(shortened_last_client_ip) == depth:
+    if shortened_last_client_ip.length == depth:
         return current_node.mark_as_in_response()
     else:  # we have not reached the responsible node that represents the received lastClientIP/scopePrefixLength
-        child_node = current_node.get_child(shortened_last_client_ip[:depth], shortened_last_client_ip[depth])
-        if handle_response(child_node, shortened_last_client_ip, depth + 1):
-            return current_node.get_scanning_mode(shortened_last_client_ip[:depth]) == ScanningMode.FINISHED_SCANNING
+        prefix_up_to_this = shortened_last_client_ip.truncate(depth, address_bits)
+        child_node = current_node.get_child(prefix_up_to_this, shortened_last_client_ip.bit_at(depth, address_bits))
+        if handle_response(child_node, shortened_last_client_ip, depth + 1, address_bits):
+            return current_node.get_scanning_mode(prefix_up_to_this) == ScanningMode.FINISHED_SCANNING
         else:
             return False
 
 
-def get_new_parameters(node_element, prefix_up_to_parent, config, logger):
-    prefix, _ = get_new_parameters_with_mode(node_element, prefix_up_to_parent, ScanningMode.BGP_MODE, config, logger)
+def get_new_parameters(root, prefix_up_to_parent, config, logger):
+    prefix, _ = get_new_parameters_with_mode(root, prefix_up_to_parent, ScanningMode.BGP_MODE, root.finished_ranges, config, logger)
     return prefix
 
 
-def get_new_parameters_with_mode(node_element, prefix_up_to_parent, scanning_mode, config, logger):
-    current_prefix_slice = list(prefix_up_to_parent)  # Copy the prefix
+def finish_child(node_element, prefix_up_to_this: Prefix, index: int, finished_ranges: FinishedRanges, address_bits: int):
+    node_element.finish_child_element(index)
+    finished_ranges.add(prefix_up_to_this.child(index, address_bits))
+
+
+def is_collapsible(child, child_prefix: Prefix, finished_ranges: FinishedRanges) -> bool:
+    """Every subtree below the child is finished and no BGP prefix in it waits for its own scan."""
+    return FINISHED_LEAF in child.children and child.count_bgp_subnets_left() == 0 and finished_ranges.covers(child_prefix)
+
+
+def get_new_parameters_with_mode(node_element, prefix_up_to_parent: Prefix, scanning_mode, finished_ranges: FinishedRanges, config, logger):
     if isinstance(node_element, Node):
-        current_prefix_slice.append(node_element.get_value())
+        current_prefix_slice = prefix_up_to_parent.child(node_element.get_value(), config.get_config_address_bits())
     elif isinstance(node_element, Leaf):
         logger.debug('Hit Leaf')
         return None, False
+    else:
+        current_prefix_slice = prefix_up_to_parent
 
-    length_of_current_prefix = len(current_prefix_slice)
+    length_of_current_prefix = current_prefix_slice.length
     node_scanning_mode = node_element.get_scanning_mode(current_prefix_slice)
 
     if node_scanning_mode == ScanningMode.FINISHED_SCANNING:
@@ -156,11 +181,11 @@ def get_new_parameters_with_mode(node_element, prefix_up_to_parent, scanning_mod
         else:
             if scanning_mode == ScanningMode.BGP_PREFIX_MODE and not search_order[slice_index].is_bgp_prefix() and not search_order[slice_index].has_bgp_subnet():
                 logger.debug('finishing child as it has no BGP')
-                node_element.finish_child_element(child_index)
+                finish_child(node_element, current_prefix_slice, child_index, finished_ranges, config.get_config_address_bits())
                 search_order[slice_index] = None
             elif search_order[slice_index].was_scanned():
                 logger.debug('finishing after child has been scanned')
-                node_element.finish_child_element(child_index)
+                finish_child(node_element, current_prefix_slice, child_index, finished_ranges, config.get_config_address_bits())
                 search_order[slice_index] = None
             else:
                 first_element_check = slice_index == 0 and (search_order[slice_index].has_bgp_subnet() or search_order[slice_index].is_in_announced_space())
@@ -176,16 +201,27 @@ def get_new_parameters_with_mode(node_element, prefix_up_to_parent, scanning_mod
         for index, child in enumerate(search_order):
             if child is None:
                 continue
-            child_prefix, isannounced = get_new_parameters_with_mode(child, current_prefix_slice, scanning_mode, config, logger)
+            bgp_subnets_left_before = child.count_bgp_subnets_left()
+            child_prefix, isannounced = get_new_parameters_with_mode(child, current_prefix_slice, scanning_mode, finished_ranges, config, logger)
+            node_element.child_bgp_subnets_changed(child.count_bgp_subnets_left() - bgp_subnets_left_before)
             if child_prefix is not None:
-                node_element.set_child_scanned(isannounced)
+                if node_element.config.get_probe_limits().is_limited(length_of_current_prefix):
+                    node_element.set_child_scanned(isannounced)
+                child_index = child.get_value()
+                if child.was_scanned():
+                    # the child returned itself, nothing is left to do below it
+                    finish_child(node_element, current_prefix_slice, child_index, finished_ranges, config.get_config_address_bits())
+                elif is_collapsible(child, current_prefix_slice.child(child_index, config.get_config_address_bits()), finished_ranges):
+                    # the returned subnet finished the last open subtree below the child
+                    logger.debug('finishing child after its last subtree was finished')
+                    node_element.finish_child_element(child_index)
                 return child_prefix, isannounced or node_element.is_bgp_prefix()
             else:
-                logger.debug(f"trie: finish child because it told us no more scans to do {convert_ip_from_field_to_net_ip(current_prefix_slice + [child.get_value()], config.get_config_address_family() == 6)}/{length_of_current_prefix+1} scanning mode {scanning_mode}")
+                logger.debug(f"trie: finish child because it told us no more scans to do {convert_prefix_to_net_ip(current_prefix_slice.child(child.get_value(), config.get_config_address_bits()), config.get_config_is_ipv6())}/{length_of_current_prefix+1} scanning mode {scanning_mode}")
                 if index == 0:
-                    node_element.finish_child_element(first_child_index)
+                    finish_child(node_element, current_prefix_slice, first_child_index, finished_ranges, config.get_config_address_bits())
                 else:
-                    node_element.finish_child_element(second_child_index)
+                    finish_child(node_element, current_prefix_slice, second_child_index, finished_ranges, config.get_config_address_bits())
 
     if node_element.is_bgp_prefix():
         node_element.set_scanned()
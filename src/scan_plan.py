@@ -0,0 +1,113 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+from utils import Prefix, ROOT_PREFIX
+from prefix_index import ROOT as SKELETON_ROOT
+
+import random
+
+
+class PlanFrame:
+    __slots__ = ('row', 'prefix', 'is_announced', 'pending', 'deepest_bgp', 'scans_announced', 'scans_unannounced')
+
+    def __init__(self, row: int, prefix: Prefix, is_announced: bool, pending: list, deepest_bgp: int):
+        self.row = row
+        self.prefix = prefix
+        self.is_announced = is_announced
+        # child indexes still to visit, the next one is at the end
+        self.pending = pending
+        # depth of the deepest BGP prefix on the path from the root down to this frame (-1 if none)
+        self.deepest_bgp = deepest_bgp
+        self.scans_announced = 0
+        self.scans_unannounced = 0
+
+
+class ScanPlan:
+    """Streams the subnets of a domain straight from the source prefix index, for scans that
+    ignore the response scope.
+
+    Without responses, the subnets a trie walk returns only depend on the source prefixes and
+    the probe limits, so no trie is built. The plan walks the index depth first with a random
+    child order at every prefix and returns the same kinds of subnets as a trie walk in BGP
+    mode: subnets at the source prefix length inside announced space, and BGP prefixes shorter
+    than that once their subtree is done. A probe limit is counted and enforced like in the
+    trie. The stack holds the path to the last returned subnet only, so the memory needed
+    per domain is bounded by the source prefix length, not by the size of the source space.
+    Unlike the random walk, a subtree is finished before its sibling is started.
+    """
+
+    def __init__(self, config):
+        self.index = config.get_source_prefix_index()
+        self.address_bits = config.get_config_address_bits()
+        self.spl = config.get_config_spl()
+        self.probe_limits = config.get_probe_limits()
+        self.stack = []
+        self.started = False
+
+    def root_handle_response(self, shortened_last_client_ip: Prefix) -> bool:
+        # the plan does not depend on responses
+        return False
+
+    def get_new_parameters(self, logger) -> Prefix | None:
+        if not self.started:
+            self.started = True
+            self._push(SKELETON_ROOT, ROOT_PREFIX, False, -1)
+
+        while self.stack:
+            frame = self.stack[-1]
+            if frame.pending:
+                child_index = frame.pending.pop()
+                row = self.index.child_row(frame.row, child_index)
+                is_bgp_prefix = self.index.is_announced_row(row)
+                is_announced = frame.is_announced or is_bgp_prefix
+                if row < 0 and not is_announced:
+                    continue
+                prefix = frame.prefix.child(child_index, self.address_bits)
+                deepest_bgp = prefix.length if is_bgp_prefix else frame.deepest_bgp
+                if prefix.length < self.spl:
+                    self._push(row, prefix, is_announced, deepest_bgp)
+                elif is_announced:
+                    self._charge_limited_frames(deepest_bgp)
+                    return prefix
+            else:
+                self.stack.pop()
+                if frame.prefix.length > 0 and self.index.is_announced_row(frame.row):
+                    self._charge_limited_frames(frame.prefix.length)
+                    return frame.prefix
+
+        logger.debug('scan plan exhausted')
+        return None
+
+    def _push(self, row: int, prefix: Prefix, is_announced: bool, deepest_bgp: int):
+        first_child_index = random.randint(0, 1)
+        self.stack.append(PlanFrame(row, prefix, is_announced, [1 - first_child_index, first_child_index], deepest_bgp))
+
+    def _charge_limited_frames(self, deepest_bgp: int):
+        # like set_child_scanned, a subnet only counts towards a limit if a BGP prefix lies between
+        # the limited prefix and the subnet
+        for position, frame in enumerate(self.stack):
+            depth = frame.prefix.length
+            if not self.probe_limits.is_limited(depth):
+                continue
+            if deepest_bgp >= depth:
+                frame.scans_announced += 1
+            else:
+                frame.scans_unannounced += 1
+            if self.probe_limits.limit_hit(depth, frame.scans_announced, frame.scans_unannounced):
+                del self.stack[position:]
+                return
@@ -0,0 +1,106 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+from utils import Prefix
+from helpers import DomainState, QueryResponse
+
+import collections
+
+
+class ScopeMap:
+    """Scope blocks returned while scanning one domain, i.e. the client subnets shortened to
+    the response scope, for all scopes shorter than the queried source prefix length."""
+
+    def __init__(self, address_bits: int):
+        self.address_bits = address_bits
+        self.blocks = set()
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+    def add(self, query_prefix: Prefix, scope_prefix: Prefix):
+        if 0 < scope_prefix.length < query_prefix.length:
+            self.blocks.add(scope_prefix)
+
+    def predicted_scope_length(self, query_prefix: Prefix) -> int:
+        for length in range(query_prefix.length - 1, 0, -1):
+            if query_prefix.truncate(length, self.address_bits) in self.blocks:
+                return length
+        return query_prefix.length
+
+
+class ScopeMapCache:
+    """Scope maps of completed domain scans, keyed by nameserver IP (and optionally the NSIDs).
+
+    A new domain on a known nameserver compares its first responses with the cached map. Once
+    enough of them agree, all cached blocks are handed to the domain's trie as if they had been
+    returned, so they are not probed again. A single disagreeing response drops the prediction
+    and the domain is scanned in full.
+
+    The cache is saved with every checkpoint, so it keeps the maps of the max_size most recently
+    used keys only.
+    """
+
+    def __init__(self, address_bits: int, confirmation_probes: int, key_by_nsid: bool, max_size: int):
+        self.address_bits = address_bits
+        self.confirmation_probes = confirmation_probes
+        self.key_by_nsid = key_by_nsid
+        self.max_size = max_size
+        self.scope_maps = collections.OrderedDict()
+
+    def key(self, domain_state: DomainState, query_response: QueryResponse):
+        if self.key_by_nsid:
+            return domain_state.nameserver_ip, tuple(sorted({inst_resp.nsid for inst_resp in query_response.ins_responses}))
+        return domain_state.nameserver_ip
+
+    def observe_response(self, domain_state: DomainState, query_response: QueryResponse, query_prefix: Prefix, scope_prefix: Prefix, trie, logger):
+        if domain_state.observed_scope_map is None:
+            domain_state.observed_scope_map = ScopeMap(self.address_bits)
+            domain_state.scope_map_key = self.key(domain_state, query_response)
+            domain_state.predicted_scope_map = self.scope_maps.get(domain_state.scope_map_key)
+            if domain_state.predicted_scope_map is not None:
+                self.scope_maps.move_to_end(domain_state.scope_map_key)
+                logger.debug(f'scope map: predicting {len(domain_state.predicted_scope_map)} scope blocks for {domain_state.domain}')
+        domain_state.observed_scope_map.add(query_prefix, scope_prefix)
+
+        predicted_scope_map = domain_state.predicted_scope_map
+        if predicted_scope_map is None:
+            return
+        if predicted_scope_map.predicted_scope_length(query_prefix) != scope_prefix.length:
+            logger.debug(f'scope map: {domain_state.domain} diverges from the cached map, falling back to a full scan')
+            domain_state.predicted_scope_map = None
+            return
+
+        domain_state.scope_map_confirmations += 1
+        if domain_state.scope_map_confirmations >= self.confirmation_probes:
+            logger.debug(f'scope map: confirmed for {domain_state.domain}, marking {len(predicted_scope_map)} scope blocks')
+            for block in predicted_scope_map.blocks:
+                trie.root_handle_response(block)
+                if block not in domain_state.observed_scope_map.blocks:
+                    domain_state.inferred_scope_blocks.append(block)
+                    domain_state.observed_scope_map.blocks.add(block)
+            domain_state.predicted_scope_map = None
+
+    def store(self, domain_state: DomainState):
+        # only complete scans predict the scope maps of later domains
+        if domain_state.observed_scope_map is None or domain_state.perm_error or domain_state.temp_errors > 0 or domain_state.budget_exhausted:
+            return
+        self.scope_maps[domain_state.scope_map_key] = domain_state.observed_scope_map
+        self.scope_maps.move_to_end(domain_state.scope_map_key)
+        if len(self.scope_maps) > self.max_size:
+            self.scope_maps.popitem(last=False)
@@ -17,12 +17,18 @@
 # -----------------------------------------------------------------------------
 
 class TrieElement:
+    __slots__ = ()
+
     def finish_this_trie_element(self):
         pass
     def finish_child_element(self, index):
         pass
     def any_not_finished_bgp_subnets_left(self, prefix_up_to_this):
         pass
+    def count_bgp_subnets_left(self):
+        pass
+    def child_bgp_subnets_changed(self, delta):
+        pass
     def has_bgp_subnet(self):
         pass
     def get_child(self, prefix_up_to_parent, index):
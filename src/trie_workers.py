@@ -0,0 +1,153 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+
+from helpers import DomainState, QueryRequest, QueryResponse, InstQueryResponse, IPGeneratorRequest, DomainScanFinished
+
+import copy
+import logging
+import multiprocessing
+import signal
+
+START = 0
+RESPONSE = 1
+ADOPT = 2
+SNAPSHOT = 'snapshot'
+STOP = 'stop'
+
+
+def worker_copy(domain_state: DomainState) -> DomainState:
+    # the scamper instance stays with the controller, the domain key already names it
+    domain_copy = copy.copy(domain_state)
+    domain_copy.vp = None
+    return domain_copy
+
+
+def run_trie_worker(connection, config, logger_name: str, trie_request):
+    # the controller writes the checkpoint on an interrupt, which needs the tries of the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logger = logging.getLogger(logger_name)
+    domain_states = {}
+    while True:
+        request = connection.recv()
+        if request == STOP:
+            return
+        if request == SNAPSHOT:
+            connection.send(domain_states)
+            continue
+        connection.send([result for result in (handle_message(domain_states, message, config, logger, trie_request) for message in request) if result is not None])
+
+
+def handle_message(domain_states: dict, message: tuple, config, logger, trie_request):
+    kind, key = message[0], message[1]
+    if kind == ADOPT:
+        domain_states[key] = message[2]
+        return None
+    if kind == START:
+        domain_state = domain_states[key] = message[2]
+        last_scan = None
+    else:
+        domain_state = domain_states[key]
+        _, _, client_ip, source_prefix_length, scopes = message
+        domain_state.queries_in_flight -= 1
+        query_request = QueryRequest(client_ip, source_prefix_length, config.get_config_address_family(), domain_state)
+        last_scan = QueryResponse(query_request, [InstQueryResponse([], scope, error, None, [], '') for scope, error in scopes])
+
+    # same window filling as Controller.fill_query_window
+    subnets = []
+    result = trie_request(IPGeneratorRequest(domain_state, last_scan), config, logger)
+    while isinstance(result, QueryRequest):
+        domain_state.queries_in_flight += 1
+        domain_state.queries_sent += 1
+        subnets.append((str(result.ip_address_client), result.source_prefix_length))
+        if domain_state.queries_in_flight >= config.get_config_max_queries_in_flight_per_domain():
+            break
+        result = trie_request(IPGeneratorRequest(domain_state, None), config, logger)
+
+    finished = isinstance(result, DomainScanFinished)
+    if finished:
+        del domain_states[key]
+    return key, subnets, finished
+
+
+class TrieWorkerPool:
+    """Processes that own the tries of the scanned domains, sharded by domain.
+
+    The controller queues a message per new domain and per completed query and exchanges
+    all queued messages once per batch of scamper responses. A worker answers every message
+    with the next subnets of the domain and whether the domain is finished, so the trie work
+    of a batch runs on all workers in parallel.
+    """
+
+    def __init__(self, num_workers: int, config, logger, trie_request):
+        self.connections = []
+        self.processes = []
+        for worker in range(num_workers):
+            controller_end, worker_end = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=run_trie_worker, args=(worker_end, config, logger.name, trie_request),
+                                              name=f'trie-worker-{worker}', daemon=True)
+            process.start()
+            worker_end.close()
+            self.connections.append(controller_end)
+            self.processes.append(process)
+        self.outboxes = [[] for _ in range(num_workers)]
+
+    def outbox(self, domain_state: DomainState) -> list:
+        return self.outboxes[domain_state.identifier % len(self.outboxes)]
+
+    def request(self, domain_state: DomainState, last_scan: QueryResponse):
+        if last_scan is None:
+            self.outbox(domain_state).append((START, domain_state.key, worker_copy(domain_state)))
+        else:
+            scopes = tuple((inst_resp.scope_prefix_length, inst_resp.error) for inst_resp in last_scan.ins_responses)
+            self.outbox(domain_state).append((RESPONSE, domain_state.key, str(last_scan.request.ip_address_client),
+                                              last_scan.request.source_prefix_length, scopes))
+
+    def adopt(self, domain_state: DomainState):
+        """Hands a domain restored from a checkpoint to its worker."""
+        self.outbox(domain_state).append((ADOPT, domain_state.key, worker_copy(domain_state)))
+
+    def has_pending(self) -> bool:
+        return any(self.outboxes)
+
+    def exchange(self) -> list:
+        """Sends the queued messages and returns the (domain key, subnets, finished) answers."""
+        busy = []
+        for connection, outbox in zip(self.connections, self.outboxes):
+            if outbox:
+                connection.send(outbox)
+                busy.append(connection)
+        self.outboxes = [[] for _ in self.connections]
+        results = []
+        for connection in busy:
+            results.extend(connection.recv())
+        return results
+
+    def snapshot(self) -> dict:
+        for connection in self.connections:
+            connection.send(SNAPSHOT)
+        domain_states = {}
+        for connection in self.connections:
+            domain_states.update(connection.recv())
+        return domain_states
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(STOP)
+        for process in self.processes:
+            process.join()
@@ -18,6 +18,7 @@
 
 import ipaddress
 from enum import Enum
+from typing import NamedTuple
 
 class PrefixType(Enum):
     UNANNOUNCED = 0
@@ -33,73 +34,40 @@ class ScanningMode(Enum):
 def bytes_for_ip_version(is_ipv6: bool) -> int:
     return 16 if is_ipv6 else 4
 
-def convert_ip_from_net_ip_to_field(ip: ipaddress.ip_address) -> list[int]:
-    ip_bytes = ip.packed
-    as_field = []
+def bits_for_ip_version(is_ipv6: bool) -> int:
+    return bytes_for_ip_version(is_ipv6) * 8
 
-    for byte in ip_bytes:
-        as_field.extend(1 if byte & (1 << j) else 0 for j in range(7, -1, -1))
+def netmask(length: int, address_bits: int) -> int:
+    return ((1 << length) - 1) << (address_bits - length)
 
-    return as_field
+class Prefix(NamedTuple):
+    # network is the full-width integer of the network address (host bits are zero)
+    network: int
+    length: int
 
-def convert_ip_from_field_to_net_ip(ip_as_field: list[int], is_ipv6: bool) -> str:
-    ip_bytes = bytes_for_ip_version(is_ipv6)
-    while len(ip_as_field) < ip_bytes * 8:
-        ip_as_field.append(0)
+    def child(self, bit: int, address_bits: int) -> 'Prefix':
+        return Prefix(self.network | (bit << (address_bits - self.length - 1)), self.length + 1)
 
-    bytes_of_ip = bytearray(ip_bytes)
+    def truncate(self, length: int, address_bits: int) -> 'Prefix':
+        return Prefix(self.network & netmask(length, address_bits), length)
 
-    for i in range(ip_bytes):
-        x = 0
-        for j in range(8):
-            x = (x << 1) + ip_as_field[i * 8 + j]
-        bytes_of_ip[i] = x
+    def bit_at(self, depth: int, address_bits: int) -> int:
+        return (self.network >> (address_bits - depth - 1)) & 1
 
-    return str(ipaddress.ip_address(int.from_bytes(bytes_of_ip, byteorder='big')))
+    def last_address(self, address_bits: int) -> int:
+        return self.network | ((1 << (address_bits - self.length)) - 1)
 
-def convert_ip_from_string_to_key_int(ip_as_string: str) -> int:
-    ip_obj = ipaddress.ip_address(ip_as_string)
-    ip_as_int = 0
-    for i, byte_value in enumerate(ip_obj.packed[:8]):
-        ip_as_int = (ip_as_int << 8) + byte_value
-    return ip_as_int
+ROOT_PREFIX = Prefix(0, 0)
 
-def convert_ip_from_short_field_to_key_int(ip_as_short_field: list[int], is_ipv6: bool) -> int:
-    ip_as_int = 0
-    for bit in ip_as_short_field:
-        ip_as_int = (ip_as_int << 1) + bit
+def convert_ip_from_net_ip_to_prefix(ip: ipaddress.ip_address, length: int) -> Prefix:
+    return Prefix(int(ip) & netmask(length, ip.max_prefixlen), length)
 
-    ip_bytes = bytes_for_ip_version(is_ipv6) // 2 if is_ipv6 else bytes_for_ip_version(is_ipv6)
-    for _ in range(ip_bytes * 8 - len(ip_as_short_field)):
-        ip_as_int <<= 1
+def convert_prefix_to_net_ip(prefix: Prefix, is_ipv6: bool) -> str:
+    if is_ipv6:
+        return str(ipaddress.IPv6Address(prefix.network))
+    return str(ipaddress.IPv4Address(prefix.network))
 
-    return ip_as_int
-
-def convert_ip_from_short_field_to_ip_network(ip_as_short_field: list[int], is_ipv6: bool) -> ipaddress.ip_address:
-    ip_int = convert_ip_from_short_field_to_key_int(ip_as_short_field, is_ipv6)
-    return ipaddress.ip_network((ip_int, len(ip_as_short_field)))
-
-
-def calculate_biggest_key_in_subnet(ip_as_short_field: list[int], is_ipv6: bool) -> int:
-    ip_as_int = 0
-    for bit in ip_as_short_field:
-        ip_as_int = (ip_as_int << 1) + bit
-
-    ip_bytes = bytes_for_ip_version(is_ipv6) // 2 if is_ipv6 else bytes_for_ip_version(is_ipv6)
-    for _ in range(ip_bytes * 8 - len(ip_as_short_field)):
-        ip_as_int = (ip_as_int << 1) | 1
-
-    return ip_as_int
-
-
-def first_bits_of_ip_as_field(scope: int, ip: list[int]) -> list[int]:
-    return ip[:scope]
-
-def ensure_concatenating_with_zeros(ip: str, scope: int, is_ipv6: bool) -> str:
-    ip_obj = ipaddress.ip_address(ip)
-    ip_bytes = bytes_for_ip_version(is_ipv6)
-
-    mask = (1 << (ip_bytes * 8)) - (1 << (ip_bytes * 8 - scope))
-    masked_ip = int(ip_obj) & mask
-
-    return str(ipaddress.ip_address(masked_ip))
+def convert_prefix_to_ip_network(prefix: Prefix, is_ipv6: bool) -> ipaddress.ip_network:
+    if is_ipv6:
+        return ipaddress.IPv6Network((prefix.network, prefix.length))
+    return ipaddress.IPv4Network((prefix.network, prefix.length))
@@ -0,0 +1,159 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+
+import collections
+import importlib
+import logging
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+
+class FakeAddr(str):
+    def is_linklocal(self): return False
+    def is_reserved(self): return False
+    def is_rfc1918(self): return False
+
+
+class FakeInst:
+    def __init__(self, name):
+        self.name = name
+        self.outstanding = 0
+        self.max_outstanding = 0
+        self.sent = 0
+
+    def done(self):
+        pass
+
+
+class FakeHost:
+    def __init__(self, qname, qtype, inst, answers):
+        self.qname = qname
+        self.qtype = qtype
+        self.inst = inst
+        self.rcode = 0
+        self.answers = answers
+        self.ancount = len(answers)
+
+    def ans_nses(self):
+        return self.answers if self.qtype == "NS" else []
+
+    def ans_addrs(self):
+        return [FakeAddr(i) for i in self.answers] if self.qtype == "A" else []
+
+    def ans(self, rrtypes=None):
+        return [types.SimpleNamespace(ttl=300) for _ in self.answers]
+
+
+class FakeCtrl:
+    """Answers the queries in the order they were sent, those of the VPs in 'slow_vps' only when
+    no other answer is waiting. Queries for names in 'dropped' are never answered, a poll without
+    anything to answer times out."""
+
+    vp_names = ["vp1"]
+    slow_vps = set()
+    answers = {}
+    dropped = set()
+    instances_created = []
+
+    def __init__(self, morecb=None, param=None, mux=None):
+        self.morecb = morecb
+        self.param = param
+        self.insts = []
+        self.queue = collections.deque()
+        self.unanswered = []
+        self.started = False
+        FakeCtrl.instances_created.append(self)
+
+    def vps(self):
+        return [FakeInst(i_name) for i_name in FakeCtrl.vp_names]
+
+    def add_vps(self, vp):
+        self.insts.append(vp)
+
+    def instances(self):
+        return self.insts
+
+    def do_dns(self, name, qtype=None, rd=None, wait_timeout=None, inst=None, sync=None):
+        inst.outstanding += 1
+        inst.sent += 1
+        inst.max_outstanding = max(inst.max_outstanding, inst.outstanding)
+        host = FakeHost(name, qtype, inst, FakeCtrl.answers.get((name, qtype), []))
+        (self.unanswered if name in FakeCtrl.dropped else self.queue).append(host)
+
+    def deliver_late_answers(self):
+        for i_host in self.unanswered:
+            i_host.inst.outstanding += 1
+        self.queue.extend(self.unanswered)
+        self.unanswered = []
+
+    def poll(self, timeout=None):
+        if not self.started:
+            self.started = True
+            for i_inst in self.insts:
+                self.morecb(self, i_inst, self.param)
+        if not self.queue:
+            # scamper gives up on the unanswered queries when they time out
+            for i_host in self.unanswered:
+                i_host.inst.outstanding -= 1
+            return None
+        host = next((i_host for i_host in self.queue if i_host.inst.name not in FakeCtrl.slow_vps), self.queue[0])
+        self.queue.remove(host)
+        host.inst.outstanding -= 1
+        if host.inst.outstanding == 0:
+            self.morecb(self, host.inst, self.param)
+        return host
+
+    def done(self):
+        pass
+
+
+class FakePublicSuffixList:
+    def __init__(self, f):
+        pass
+
+    def privateparts(self, name):
+        return (".".join(name.split(".")[-2:]),)
+
+
+@pytest.fixture
+def resolver_module(monkeypatch, tmp_path):
+    monkeypatch.setitem(sys.modules, "scamper", types.SimpleNamespace(ScamperCtrl=FakeCtrl))
+    monkeypatch.setitem(sys.modules, "publicsuffixlist", types.SimpleNamespace(PublicSuffixList=FakePublicSuffixList))
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "public_suffix_list.dat").write_bytes(b"")
+    FakeCtrl.vp_names = ["vp1"]
+    FakeCtrl.slow_vps = set()
+    FakeCtrl.answers = {}
+    FakeCtrl.dropped = set()
+    FakeCtrl.instances_created = []
+    sys.modules.pop("ecsplorerauthnsresolver", None)
+    yield importlib.import_module("ecsplorerauthnsresolver")
+    sys.modules.pop("ecsplorerauthnsresolver", None)
+
+
+@pytest.fixture
+def new_resolver(resolver_module):
+    def new_resolver(queries_in_flight_per_vp):
+        return resolver_module.ECSplorerAuthNSResolver(logging.getLogger("test"), None, FakeCtrl.vp_names, None, None, queries_in_flight_per_vp)
+    return new_resolver
@@ -0,0 +1,57 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+
+import pytest
+
+from conftest import FakeCtrl
+
+
+@pytest.mark.parametrize("late_answers", [False, True])
+def test_poll_timeout_does_not_leak_into_next_chunk(new_resolver, late_answers):
+    FakeCtrl.answers = {
+        ("b.com", "NS"): ["ns.b.com"],
+        ("ns.b.com", "A"): ["192.0.2.2"],
+    }
+    FakeCtrl.dropped = {"a1.com", "a2.com"}
+    resolver = new_resolver(2)
+
+    # both window slots of the VP are taken by queries that are never answered
+    assert resolver.resolve_domains(["a1.com", "a2.com"]) == set()
+
+    if late_answers:
+        resolver.ctrl.deliver_late_answers()
+    assert resolver.resolve_domains(["b.com"]) == {("b.com", "ns.b.com", "192.0.2.2")}
+    assert len(FakeCtrl.instances_created) == 1
+    assert list(resolver.state["in_flight"].values()) == [0]
+    assert resolver.state["pending"] == {}
+
+
+@pytest.mark.parametrize("queries_in_flight_per_vp", [0, 4])
+def test_ns_name_that_is_also_a_queried_domain(new_resolver, queries_in_flight_per_vp):
+    # dns.com is queried for its NS RRs and, as the nameserver of x.com, for its address at the same time
+    FakeCtrl.answers = {
+        ("x.com", "NS"): ["dns.com"],
+        ("dns.com", "NS"): [],
+        ("dns.com", "A"): ["192.0.2.1"],
+    }
+    resolver = new_resolver(queries_in_flight_per_vp)
+
+    assert resolver.resolve_domains(["x.com", "dns.com"]) == {("x.com", "dns.com", "192.0.2.1")}
+    assert resolver.state["pending"] == {}
+    assert list(resolver.state["in_flight"].values()) == [0]
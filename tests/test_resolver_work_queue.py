@@ -0,0 +1,60 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) 2025 Patrick Sattler
+#
+# This file is part of ECSplorer for Ark.
+#
+# This code is licensed under the Mozilla Public License, version 2.0 (MPL 2.0).
+# You may not use this file except in compliance with the License.
+# You can obtain a copy of the License at:
+#
+#    https://www.mozilla.org/en-US/MPL/2.0/
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -----------------------------------------------------------------------------
+
+
+import pytest
+
+from conftest import FakeCtrl
+
+
+def answer_domains(domains):
+    for i_index, i_domain in enumerate(domains):
+        FakeCtrl.answers[(i_domain, "NS")] = ["ns.{}".format(i_domain)]
+        FakeCtrl.answers[("ns.{}".format(i_domain), "A")] = ["192.0.2.{}".format(i_index + 1)]
+    return {(i_domain, "ns.{}".format(i_domain), "192.0.2.{}".format(i_index + 1)) for i_index, i_domain in enumerate(domains)}
+
+
+@pytest.mark.parametrize("queries_in_flight_per_vp", [0, 3])
+def test_work_queue_is_shared_by_the_vps_within_their_windows(new_resolver, queries_in_flight_per_vp):
+    FakeCtrl.vp_names = ["fast", "slow"]
+    FakeCtrl.slow_vps = {"slow"}
+    domains = ["d{}.com".format(i) for i in range(30)]
+    expected = answer_domains(domains)
+    resolver = new_resolver(queries_in_flight_per_vp)
+
+    assert resolver.resolve_domains(domains) == expected
+    fast, slow = resolver.ctrl.instances()
+    # the fast VP takes over the work the slow one does not get to
+    assert fast.sent > slow.sent > 0
+    assert fast.sent + slow.sent == 2 * len(domains)
+    for i_vp_inst in (fast, slow):
+        assert i_vp_inst.max_outstanding <= max(queries_in_flight_per_vp, 1)
+    assert list(resolver.state["in_flight"].values()) == [0, 0]
+
+
+@pytest.mark.parametrize("queries_in_flight_per_vp", [0, 2])
+def test_queued_names_survive_a_poll_timeout(new_resolver, queries_in_flight_per_vp):
+    domains = ["b.com", "c.com", "d.com"]
+    expected = answer_domains(domains)
+    FakeCtrl.dropped = {"a1.com", "a2.com"}
+    resolver = new_resolver(queries_in_flight_per_vp)
+
+    # the dropped names are queried first, the others wait in the work queue behind them
+    assert resolver.resolve_domains(["a1.com", "a2.com"] + domains) == expected
+    assert resolver.state["pending"] == {}
+    assert list(resolver.state["in_flight"].values()) == [0]